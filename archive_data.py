@@ -0,0 +1,45 @@
+import os
+import sys
+import argparse
+
+from utils.archive import archive_month, archive_old_months, find_archivable_months, retention_days
+from utils.config import read_config
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "Data")
+CONFIG_FILE = os.path.join(BASE_DIR, "statistics.configuration.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将已结束的 YYYY.mm 月份目录打包为压缩归档")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--retention-days", type=int, default=None,
+                        help="月份结束后保留多少天再归档（默认读取配置 archiveRetentionDays）")
+    parser.add_argument("--month", action="append", help="强制归档指定月份 YYYY.mm，可重复")
+    parser.add_argument("--dry-run", action="store_true", help="只列出将被归档的月份")
+    args = parser.parse_args()
+
+    retention = args.retention_days if args.retention_days is not None else retention_days(read_config(CONFIG_FILE))
+
+    if args.month:
+        missing = False
+        for month in args.month:
+            if not os.path.isdir(os.path.join(args.data_dir, month)):
+                print(f"{month}: no such month directory in {args.data_dir}")
+                missing = True
+                continue
+            print(f"{month}: {archive_month(args.data_dir, month)} files")
+        if missing:
+            sys.exit(1)
+        return
+
+    if args.dry_run:
+        for month in find_archivable_months(args.data_dir, retention):
+            print(month)
+        return
+
+    archive_old_months(args.data_dir, retention, log=print)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,18 @@ REM 设置程序目录（自动获取批处理文件所在目录）
 REM %~dp0 返回批处理文件所在目录（带尾部反斜杠）
 set "PROGRAM_DIR=%~dp0"
 set "PY_FILE=app_tracker.py"
+set "TRAY_FILE=tray_client.py"
+
+REM SHOW_TRAY=1：tracker 以无界面服务模式运行，托盘由独立的 tray_client.py 显示
+REM SHOW_TRAY=0：只启动 tracker，不显示托盘
+if not defined SHOW_TRAY set "SHOW_TRAY=1"
 
 REM 切换到程序目录
 cd /d "%PROGRAM_DIR%"
 
+REM 托盘客户端单独启动，不阻塞 tracker
+if "%SHOW_TRAY%"=="1" start "" pythonw "%PROGRAM_DIR%%TRAY_FILE%"
+
 REM 尝试PATH中的 pythonw
-pythonw "%PROGRAM_DIR%%PY_FILE%" >nul 2>&1
+pythonw "%PROGRAM_DIR%%PY_FILE%" --no-tray >nul 2>&1
 if not errorlevel 1 exit /b 0
@@ -0,0 +1,361 @@
+import os
+import sys
+import json
+import time
+import signal
+import hashlib
+import argparse
+import datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from utils import aggregates
+from utils import daybin
+from utils import report
+from utils import schema
+from utils import timeline
+from utils.categories import CategoryRules
+from utils.config import read_config
+from utils.datastore import day_fingerprint, fingerprint_key, list_dates, month_of
+from utils.hosts import get_host_dir, list_hosts
+from utils.search import SearchIndex
+
+# 派生数据的格式变化后（分类规则、时段桶大小、报告格式等），按当前配置重新计算 Data 目录下所有历史日期的派生数据
+# 用法：python backfill_data.py [--data-dir Data] [--workers N] [--chunk-size 32] [--steps ...] [--force] [--dry-run]
+#
+# 步骤（--steps，默认全部）：
+#   categories  按当前 categoryRules 重算各分类时长，写回数据文件
+#   timelines   把时段统计聚合到配置的 timelineBucketMinutes（只能变粗，更细的桶无法从已有数据推出）
+#   reports     重新生成 YYYYMMDD.report.txt
+#   binary      重新生成二进制每日数据 YYYYMMDD.data.bin（见 utils/daybin.py；配置 binaryDayFiles 为 false 时默认不做）
+#   aggregates  更新每周 / 每月的物化汇总（见 utils/aggregates.py）
+#   search      更新标题检索索引（见 utils/search.py）
+# 前四步逐天进行，按 --chunk-size 分块交给进程池，只处理月份目录中的散文件（归档中的日期只读，
+# 参与汇总和索引）；当天的数据文件由 tracker 写入，不在此处理。汇总按周期分块并行更新，检索索引只能单线程写入。
+#
+# 处理过的日期记录在 Data/backfill.state.json（数据文件的版本标识、内容摘要和派生格式版本），
+# 再次运行时跳过版本标识未变的日期；只有 mtime 变化、内容未变的文件按摘要跳过。
+# 每个文件都以原子替换方式写入，状态文件在每个分块完成后写出，因此可以随时中断（Ctrl+C），
+# 重新运行即从中断处继续。汇总和检索索引本身按数据文件版本增量更新，同样可以中断后继续。
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "Data")
+CONFIG_FILE = os.path.join(BASE_DIR, "statistics.configuration.json")
+STATE_FILE_NAME = "backfill.state.json"
+DATA_SUFFIX = ".data.json"
+REPORT_SUFFIX = ".report.txt"
+
+BACKFILL_VERSION = 1  # 派生数据的格式变化时加一，所有日期都会重新处理
+DAY_STEPS = ("categories", "timelines", "reports", "binary")
+STEPS = DAY_STEPS + ("aggregates", "search")
+DEFAULT_CHUNK_SIZE = 32
+PROGRESS_INTERVAL = 1.0
+STATE_SAVE_INTERVAL = 2.0
+
+# 子进程中的状态，由 _init_worker 设置
+_worker = {}
+
+
+def load_bucket_minutes(config):
+    minutes = config.get("timelineBucketMinutes", timeline.DEFAULT_BUCKET_MINUTES)
+    return minutes if timeline.valid_bucket_minutes(minutes) else timeline.DEFAULT_BUCKET_MINUTES
+
+
+def derived_version(rules, bucket_minutes, steps):
+    """派生结果的版本：格式版本、分类规则、桶大小与所做的步骤，任何一项变化时重新处理"""
+    return f"{BACKFILL_VERSION}:{rules.version}:{bucket_minutes}:{','.join(s for s in DAY_STEPS if s in steps)}"
+
+
+def format_timestamp(ts):
+    return datetime.datetime.fromtimestamp(ts).strftime(schema.TIMESTAMP_FORMAT)
+
+
+def load_state(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def save_state(path, state):
+    schema.write_atomic(path, json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+# --- 子进程 ---
+
+
+def _init_worker(config, steps):
+    # Ctrl+C 由主进程处理：取消尚未开始的分块并写出状态，子进程只需完成手头的文件
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker["rules"] = CategoryRules.from_config(config)
+    _worker["bucket_minutes"] = load_bucket_minutes(config)
+    _worker["steps"] = steps
+
+
+def backfill_day(host_dir, date_str, known_hash):
+    """重算一天的派生数据；返回 (状态, 读取的字节数, 版本标识, 内容摘要)，状态为
+    "updated"（数据文件有改动）、"checked"（只重新生成了报告或二进制文件）、"unchanged"（内容摘要未变）"""
+    steps = _worker["steps"]
+    subdir = os.path.join(host_dir, month_of(date_str))
+    path = os.path.join(subdir, f"{date_str}{DATA_SUFFIX}")
+    with open(path, "rb") as f:
+        raw = f.read()
+    size = len(raw)
+    digest = hashlib.sha1(raw).hexdigest()
+    if digest == known_hash and ("binary" not in steps or daybin.is_fresh(path)):
+        return "unchanged", size, fingerprint_key(day_fingerprint(host_dir, date_str)), digest
+
+    day = schema.decode_day(raw)
+    changed = False
+    if "categories" in steps:
+        totals = _worker["rules"].categorize(day)
+        if day.get("categories") != totals:
+            day["categories"] = totals
+            changed = True
+    if "timelines" in steps:
+        minutes = _worker["bucket_minutes"]
+        day_timeline = day.get("timeline")
+        if timeline.is_timeline(day_timeline) and day_timeline["bucket_minutes"] < minutes \
+                and minutes % day_timeline["bucket_minutes"] == 0:
+            day["timeline"] = timeline.resample(day_timeline, minutes)
+            changed = True
+    if changed:
+        raw = schema.encode_day(day)
+        schema.write_atomic(path, raw)
+        digest = hashlib.sha1(raw).hexdigest()
+    if "reports" in steps:
+        text = report.render(day, report.session_timestamps(day), day.get("focus"), format_timestamp)
+        if text is not None:
+            schema.write_atomic(os.path.join(subdir, f"{date_str}{REPORT_SUFFIX}"), text.encode("utf-8"))
+    if "binary" in steps:
+        try:
+            content = daybin.encode(day)
+        except ValueError:
+            content = None  # 时长不是整数（例如手工编辑过的文件），只保留 JSON
+        if content is not None:
+            daybin.write(daybin.binary_path(path), content, path)
+    status = "updated" if changed else "checked"
+    return status, size, fingerprint_key(day_fingerprint(host_dir, date_str)), digest
+
+
+def backfill_chunk(tasks):
+    """处理一个分块 [(状态键, 主机目录, 日期, 已知摘要), ...]，单个日期的错误不影响其余日期"""
+    results = []
+    for key, host_dir, date_str, known_hash in tasks:
+        try:
+            results.append((key, *backfill_day(host_dir, date_str, known_hash)))
+        except (OSError, schema.SchemaError) as e:
+            results.append((key, "error", 0, None, str(e)))
+    return results
+
+
+def update_aggregate_chunk(data_dir, tasks):
+    """更新一个分块的周期汇总 [(主机, 周期, 周期内任一日期), ...]"""
+    count = 0
+    for host, period, date_str in tasks:
+        try:
+            aggregates.update_aggregate(data_dir, host, period, date_str, category_rules=_worker["rules"])
+            count += 1
+        except OSError:
+            continue
+    return count
+
+
+# --- 调度 ---
+
+
+class Progress:
+    """按固定间隔打印进度与吞吐量"""
+
+    def __init__(self, label, total, log):
+        self.label = label
+        self.total = total
+        self.log = log
+        self.done = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._last_print = None
+
+    def advance(self, count, nbytes=0, final=False):
+        self.done += count
+        self.bytes += nbytes
+        now = time.monotonic()
+        if not final and self._last_print is not None and now - self._last_print < PROGRESS_INTERVAL:
+            return
+        self._last_print = now
+        elapsed = max(now - self.started, 1e-9)
+        rate = self.done / elapsed
+        line = f"{self.label}: {self.done}/{self.total} ({self.done * 100 // max(self.total, 1)}%), {rate:.1f}/s"
+        if self.bytes:
+            line += f", {self.bytes / elapsed / 1e6:.1f} MB/s"
+        if not final and rate > 0:
+            line += f", ETA {int((self.total - self.done) / rate)}s"
+        self.log(line)
+
+
+def run_chunks(executor, fn, chunks, on_result, max_pending):
+    """分块提交到进程池，同时在途的分块不超过 max_pending（中断时只需等待这些分块）"""
+    pending = set()
+    chunks = iter(chunks)
+    try:
+        while True:
+            while len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.add(executor.submit(fn, *chunk))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                on_result(future.result())
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        raise
+
+
+def split(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def collect_days(data_dir, hosts, state, version, from_str, to_str, force):
+    """返回 (需要处理的 [(状态键, 主机目录, 日期, 已知摘要)], 版本标识未变而跳过的天数, 所有日期 {主机: [日期]})"""
+    today = datetime.datetime.now().strftime("%Y%m%d")
+    days = state.get("days") if state.get("version") == version and not force else None
+    days = days if isinstance(days, dict) else {}
+    tasks = []
+    skipped = 0
+    all_dates = {}
+    for host in hosts:
+        host_dir = get_host_dir(data_dir, host)
+        dates = [d for d in list_dates(host_dir) if from_str <= d <= to_str]
+        all_dates[host] = dates
+        for date_str in sorted(dates):
+            if date_str >= today:
+                continue
+            path = os.path.join(host_dir, month_of(date_str), f"{date_str}{DATA_SUFFIX}")
+            if not os.path.exists(path):
+                continue  # 已归档
+            key = f"{host}/{date_str}"
+            entry = days.get(key)
+            if entry is not None and entry.get("fingerprint") == fingerprint_key(day_fingerprint(host_dir, date_str)):
+                skipped += 1
+                continue
+            tasks.append((key, host_dir, date_str, entry.get("hash") if entry else None))
+    return tasks, skipped, all_dates
+
+
+def backfill(data_dir, config, steps=STEPS, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, hosts=None,
+             from_str="00000000", to_str="99999999", force=False, dry_run=False, log=print):
+    """返回各状态的天数；中断时写出已完成的部分后抛出 KeyboardInterrupt"""
+    rules = CategoryRules.from_config(config)
+    version = derived_version(rules, load_bucket_minutes(config), steps)
+    state_path = os.path.join(data_dir, STATE_FILE_NAME)
+    state = load_state(state_path)
+    hosts = hosts or list_hosts(data_dir)
+    workers = workers or os.cpu_count() or 1
+    counts = {"skipped": 0, "updated": 0, "checked": 0, "unchanged": 0, "error": 0}
+
+    tasks, skipped, all_dates = collect_days(data_dir, hosts, state, version, from_str, to_str, force)
+    if not any(s in steps for s in DAY_STEPS):
+        tasks, skipped = [], 0  # 只更新汇总或索引，不涉及状态文件
+    counts["skipped"] = skipped
+    log(f"{sum(len(d) for d in all_dates.values())} days on {len(hosts)} host(s), "
+        f"{len(tasks)} to process, {skipped} up to date")
+    if dry_run:
+        for key, _, _, _ in tasks:
+            log(f"process    {key}")
+        return counts
+
+    if state.get("version") != version or force or not isinstance(state.get("days"), dict):
+        state = {"version": version, "days": {}}
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config, tuple(steps)))
+    try:
+        if tasks:
+            progress = Progress("days", len(tasks), log)
+            last_save = [time.monotonic()]
+
+            def on_days(results):
+                nbytes = 0
+                for key, status, size, fp, detail in results:
+                    counts[status] += 1
+                    nbytes += size
+                    if status == "error":
+                        log(f"error      {key}: {detail}")
+                        continue
+                    state["days"][key] = {"fingerprint": fp, "hash": detail}
+                if time.monotonic() - last_save[0] >= STATE_SAVE_INTERVAL:
+                    save_state(state_path, state)
+                    last_save[0] = time.monotonic()
+                progress.advance(len(results), nbytes)
+
+            try:
+                run_chunks(executor, backfill_chunk, [(chunk,) for chunk in split(tasks, chunk_size)],
+                           on_days, workers * 2)
+            finally:
+                save_state(state_path, state)
+            progress.advance(0, final=True)
+
+        if "aggregates" in steps:
+            periods = sorted({(host, period, aggregates.period_range(period, d)[0]): d
+                              for host, dates in all_dates.items() for d in dates
+                              for period in aggregates.PERIODS}.items())
+            period_tasks = [(host, period, d) for (host, period, _), d in periods]
+            progress = Progress("aggregates", len(period_tasks), log)
+            # 周期文件比天少得多，分块小一些以便各进程负载均衡
+            run_chunks(executor, update_aggregate_chunk,
+                       [(data_dir, chunk) for chunk in split(period_tasks, max(1, chunk_size // 8))],
+                       progress.advance, workers * 2)
+            progress.advance(0, final=True)
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    if "search" in steps:
+        started = time.monotonic()
+        indexed = SearchIndex(data_dir).update(hosts, log=log)
+        log(f"search: {indexed} days indexed in {time.monotonic() - started:.1f}s")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按当前配置重新计算所有历史日期的派生数据")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--config", default=CONFIG_FILE)
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每个分块的天数")
+    parser.add_argument("--steps", default=None, help=f"逗号分隔，可选 {', '.join(STEPS)}（默认全部）")
+    parser.add_argument("--host", action="append", help="只处理指定主机，可重复")
+    parser.add_argument("--from", dest="from_str", default="00000000", help="起始日期 YYYYMMDD")
+    parser.add_argument("--to", dest="to_str", default="99999999", help="结束日期 YYYYMMDD")
+    parser.add_argument("--force", action="store_true", help="忽略状态文件，重新处理所有日期")
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要处理的日期")
+    args = parser.parse_args()
+
+    config = read_config(args.config)
+    if args.steps is None:
+        steps = tuple(s for s in STEPS if s != "binary" or config.get("binaryDayFiles", True))
+    else:
+        steps = tuple(s for s in args.steps.split(",") if s)
+    unknown = [s for s in steps if s not in STEPS]
+    if unknown:
+        parser.error(f"unknown steps: {', '.join(unknown)}")
+
+    started = time.monotonic()
+    try:
+        counts = backfill(args.data_dir, config, steps, args.workers, max(1, args.chunk_size),
+                          args.host, args.from_str, args.to_str, args.force, args.dry_run)
+    except KeyboardInterrupt:
+        print("interrupted; progress saved, run again to resume", file=sys.stderr)
+        sys.exit(130)
+    print(f"updated: {counts['updated']}, regenerated: {counts['checked']}, unchanged: {counts['unchanged']}, "
+          f"skipped: {counts['skipped']}, errors: {counts['error']} in {time.monotonic() - started:.1f}s"
+          + (" (dry run)" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import importlib
+
+from probes.replay import StaticProbe
+
+# 无界面地加载 tracker：使用固定返回值的 StaticProbe 代替平台探测后端，
+# 只测量统计与持久化的真实代码路径（tracker_core 不依赖 win32 / AppKit，可在 Linux 上导入）
+
+
+def import_tracker(data_dir, probe=None, fresh=False):
+    """导入 tracker_core，并把数据目录指向 data_dir、探测后端替换为 probe（默认 StaticProbe）；
+    fresh=True 时重新加载模块，闲置状态机、采样间隔等全局状态从头开始（同一进程内对比多次运行用）"""
+    tracker = importlib.import_module("tracker_core")
+    if fresh:
+        tracker = importlib.reload(tracker)
+    tracker.configure(probe or StaticProbe(), data_dir)
+    return tracker
@@ -0,0 +1,405 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import datetime
+import tempfile
+import threading
+import statistics
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# 基准测试：tracker 热路径、持久化与 API
+# 用法：python -m benchmarks.run_benchmarks [--quick] [--output result.json] [--compare baseline.json]
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.platform_stubs import import_tracker  # noqa: E402
+from benchmarks.workload import PRESETS, generate_day, generate_history  # noqa: E402
+from probes.replay import ReplayProbe, StaticProbe  # noqa: E402
+from utils import daybin  # noqa: E402
+from utils import sampling  # noqa: E402
+from utils import schema  # noqa: E402
+from utils.views import ViewCache  # noqa: E402
+
+
+def summarize(samples):
+    """把耗时样本（秒）汇总为毫秒统计"""
+    ordered = sorted(samples)
+    ms = lambda v: round(v * 1000, 4)
+    return {
+        "n": len(ordered),
+        "mean_ms": ms(statistics.fmean(ordered)),
+        "median_ms": ms(statistics.median(ordered)),
+        "p95_ms": ms(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]),
+        "min_ms": ms(ordered[0]),
+        "max_ms": ms(ordered[-1]),
+    }
+
+
+def measure(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+# --- tracker 持久化 ---
+
+
+def bench_tracker(work_dir, repeat, presets):
+    results = {}
+    tracker = import_tracker(os.path.join(work_dir, "tracker"))
+    today = tracker.current_date_str
+    for preset in presets:
+        n_apps, n_titles = PRESETS[preset]
+        tracker.stats_data = generate_day(today, n_apps, n_titles)
+        results[f"save_data[{preset}]"] = measure(tracker.save_data, repeat)
+        results[f"generate_report[{preset}]"] = measure(tracker.generate_report, repeat)
+        results[f"load_data[{preset}]"] = measure(tracker.load_data, repeat)
+        size = os.path.getsize(tracker.get_file_paths()["json"])
+        results[f"save_data[{preset}]"]["file_bytes"] = size
+        results[f"recover_journal[{preset}]"] = bench_recovery(tracker, repeat)
+    return results
+
+
+def bench_recovery(tracker, repeat, ticks=30):
+    """异常退出后的启动恢复：在快照上重放最后一次快照之后 ticks 次采样的日志（含恢复后的保存，不含 load_data）"""
+    app_name = next(iter(tracker.stats_data["apps"]))
+    samples = []
+    for _ in range(repeat + 1):
+        # 准备：打开日志并保存快照，之后记账 ticks 秒即"崩溃"（不保存、不关闭日志）
+        tracker.recover_journal(tracker.load_data())
+        with tracker.data_lock:
+            for _ in range(ticks):
+                tracker.credit_active(app_name, "journal tail", 1, 0)
+                tracker.journal.tick(tracker.now(), None)
+            tracker.journal.close(remove=False)
+        snapshot_segment = tracker.load_data()
+        started = time.perf_counter()
+        tracker.recover_journal(snapshot_segment)
+        samples.append(time.perf_counter() - started)
+        with tracker.data_lock:
+            tracker.journal.close(remove=False)
+    tracker.journal.close()
+    tracker.journal = None
+    return summarize(samples[1:])
+
+
+def bench_schema(repeat, presets):
+    """数据文件编解码：各编解码实现的读写，以及当前版本与旧版本文件的读取"""
+    results = {}
+    active = schema.codec
+    try:
+        for preset in presets:
+            n_apps, n_titles = PRESETS[preset]
+            day = schema.migrate(generate_day("20250101", n_apps, n_titles))
+            legacy = dict(day, sessions=[[1735700000 + i * 7200, 1735703600 + i * 7200] for i in range(3)])
+            legacy.pop(schema.SCHEMA_KEY)
+            for name in schema.CODECS:
+                schema.use_codec(name)
+                raw = schema.encode_day(day)
+                legacy_raw = schema.dumps(legacy)
+                results[f"encode_day[{name},{preset}]"] = measure(lambda: schema.encode_day(day), repeat)
+                results[f"decode_day[{name},{preset}]"] = measure(lambda: schema.decode_day(raw), repeat)
+                results[f"decode_day[{name},{preset},legacy]"] = measure(lambda: schema.decode_day(legacy_raw), repeat)
+    finally:
+        schema.use_codec(active)
+    return results
+
+
+def bench_replay(work_dir, hours):
+    """用 StaticProbe 的虚拟时钟驱动完整的 monitor_loop（采样、记账、每 30 秒保存）"""
+    tracker = import_tracker(os.path.join(work_dir, "replay"), StaticProbe(duration=hours * 3600))
+    tracker.stats_data = tracker.new_day_data()
+    tracker.recover_journal(None)  # 与实际运行一样逐秒写预写日志
+    tracker.running = True
+    started = time.perf_counter()
+    tracker.monitor_loop()
+    elapsed = time.perf_counter() - started
+    tracker.journal.close()
+    tracker.journal = None
+    ticks = hours * 3600
+    return {f"monitor_loop[replay {hours}h]": {
+        "n": ticks,
+        "mean_ms": round(elapsed / ticks * 1000, 4),
+        "total_s": round(elapsed, 3),
+        "speedup": round(ticks / elapsed, 1),
+    }}
+
+
+def _run_sampling(work_dir, events, config, on_battery=False):
+    """用全新的 tracker 状态回放 events，返回 (统计数据, 唤醒次数, 闲置期间的唤醒次数, 完整采样次数, 耗时)"""
+    probe = ReplayProbe(events)
+    probe.battery = on_battery
+    counts = {"sleep": 0, "idle_sleep": 0, "sample": 0}
+    advance, read_window = probe.sleep, probe.get_active_window_info
+
+    def sleep(seconds):
+        counts["sleep"] += 1
+        counts["idle_sleep"] += tracker.is_idle_status
+        advance(seconds)
+
+    def get_active_window_info():
+        counts["sample"] += 1
+        return read_window()
+
+    probe.sleep, probe.get_active_window_info = sleep, get_active_window_info
+    tracker = import_tracker(work_dir, probe, fresh=True)
+    tracker.CONFIG_FILE = os.path.join(work_dir, "statistics.configuration.json")
+    with open(tracker.CONFIG_FILE, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    tracker.stats_data = tracker.new_day_data()
+    tracker.running = True
+    started = time.perf_counter()
+    tracker.monitor_loop()
+    elapsed = time.perf_counter() - started
+    return tracker.stats_data, counts["sleep"], counts["idle_sleep"], counts["sample"], elapsed
+
+
+def bench_adaptive(work_dir, hours):
+    """自适应采样：每小时输入 20 分钟、只阅读不输入 20 分钟、离开 20 分钟，统计唤醒与完整采样次数
+    （固定每秒采样均为每小时 3600 次）。同时回放固定每秒采样作对比：各应用与闲置时长的差异不超过
+    每小时一个输入检查间隔加一个使用期间的采样间隔，另加结束时最后一个间隔（见 utils/sampling.py），闲置期间的唤醒次数不超过
+    每个检查间隔一次，使用电池时的唤醒次数少于接通电源时"""
+    start = datetime.datetime.combine(datetime.date.today(), datetime.time(8)).timestamp()  # 不跨零点
+    events = []
+    for hour in range(hours):
+        base = start + hour * 3600
+        events.extend((base + t, "Code.exe", "editor", 0.001) for t in range(0, 1200, 2))
+        events.append((base + 1200, "chrome.exe", "docs", 0.001))
+        events.append((base + 2400, "chrome.exe", "docs", 1200.0))  # 阅读结束后离开，闲置时间继续增长
+    events.append((start + hours * 3600, "Code.exe", "editor", 0.001))
+    # 阅读期间不判定为闲置（阈值 30 分钟），之后的 10 分钟离开再回来输入，覆盖闲置 -> 使用的转换
+    config = {"idleRules": [{"app": "chrome.exe", "threshold": 1800}]}
+    fixed = _run_sampling(os.path.join(work_dir, "fixed"), events,
+                          {**config, "samplingMaxIdleSeconds": 1, "samplingMaxActiveSeconds": 1})[0]
+    idle_hours = fixed["idle_seconds"] / 3600
+    results = {}
+    for on_battery in (False, True):
+        data, wakeups, idle_wakeups, samples, elapsed = _run_sampling(
+            os.path.join(work_dir, "adaptive-battery" if on_battery else "adaptive"), events, config, on_battery)
+        factor = sampling.DEFAULT_BATTERY_FACTOR if on_battery else 1
+        check = sampling.DEFAULT_INPUT_CHECK_SECONDS * factor
+        # 另加回放结束时最后一个尚未记账的间隔
+        tolerance = (hours * (check + sampling.DEFAULT_MAX_ACTIVE_INTERVAL * factor)
+                     + sampling.DEFAULT_MAX_IDLE_INTERVAL * factor)
+        for app in set(data["apps"]) | set(fixed["apps"]):
+            diff = data["apps"].get(app, {}).get("total", 0) - fixed["apps"].get(app, {}).get("total", 0)
+            if abs(diff) > tolerance:
+                raise AssertionError(f"adaptive sampling credits {app} {diff:+} s against fixed 1 s sampling")
+        if abs(data["idle_seconds"] - fixed["idle_seconds"]) > tolerance:
+            raise AssertionError("adaptive sampling idle seconds differ from fixed 1 s sampling beyond the bound")
+        idle_rate = idle_wakeups / idle_hours
+        if idle_rate > 3600 / check * 1.1:
+            raise AssertionError(f"{idle_rate:.0f} wakeups per idle hour, expected at most one per {check} s")
+        if on_battery and wakeups >= mains_wakeups:
+            raise AssertionError("running on battery does not reduce wakeups")
+        mains_wakeups = wakeups
+        results[f"monitor_loop[adaptive {hours}h{' battery' if on_battery else ''}]"] = {
+            "n": samples,
+            "mean_ms": round(elapsed / samples * 1000, 4),
+            "total_s": round(elapsed, 3),
+            "samples_per_hour": round(samples / hours, 1),
+            "wakeups_per_hour": round(wakeups / hours, 1),
+            "idle_wakeups_per_hour": round(idle_rate, 1),
+            "fixed_per_hour": 3600,
+        }
+    return results
+
+
+def bench_trace(work_dir, trace_path):
+    """回放一份录制的轨迹（tracker --record 或 JSON Lines），作为真实负载驱动 monitor_loop"""
+    probe = ReplayProbe.from_file(trace_path)
+    tracker = import_tracker(os.path.join(work_dir, "trace"), probe)
+    tracker.stats_data = tracker.new_day_data()
+    tracker.running = True
+    started = time.perf_counter()
+    tracker.monitor_loop()
+    elapsed = time.perf_counter() - started
+    ticks = len(probe.events) if probe.exact else int(probe.end - probe.events[0][0]) + 1
+    return {f"monitor_loop[trace {os.path.basename(trace_path)}]": {
+        "n": ticks,
+        "mean_ms": round(elapsed / ticks * 1000, 4),
+        "total_s": round(elapsed, 3),
+        "ticks_per_s": round(ticks / elapsed, 1),
+    }}
+
+
+# --- API ---
+
+
+class _Server:
+    """在后台线程中以与 server.py 主程序相同的方式启动 HTTP 服务"""
+
+    def __init__(self, script_dir):
+        import server
+        server.SCRIPT_DIR = script_dir
+        # 基准测试的并发客户端都来自本机地址，不参与限流
+        server.RATE_LIMITER = None
+        self.module = server
+        self.httpd = server.StatsServer(("127.0.0.1", 0), server.StatsHandler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def get(self, path):
+        with urllib.request.urlopen(self.base_url + path, timeout=30) as resp:
+            return resp.read()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def bench_api(work_dir, repeat, years, clients, requests_per_client):
+    results = {}
+    script_dir = os.path.join(work_dir, "server")
+    data_dir = os.path.join(script_dir, "Data")
+    dates = generate_history(data_dir, int(365 * years), n_apps=25, n_titles=150)
+
+    srv = _Server(script_dir)
+    try:
+        results[f"api_dates[{years}y]"] = measure(lambda: srv.get("/api/dates"), repeat)
+        results[f"api_dates[{years}y]"]["dates"] = len(dates)
+
+        sample_dates = dates[:30]
+        results["api_data[sequential]"] = measure(lambda: srv.get(f"/api/data/{sample_dates[0]}"), repeat)
+        results["api_data[top_apps=8,top_titles=5]"] = measure(
+            lambda: srv.get(f"/api/data/{sample_dates[0]}?top_apps=8&top_titles=5"), repeat)
+
+        def client(idx):
+            samples = []
+            for i in range(requests_per_client):
+                date_str = sample_dates[(idx + i) % len(sample_dates)]
+                started = time.perf_counter()
+                srv.get(f"/api/data/{date_str}")
+                samples.append(time.perf_counter() - started)
+            return samples
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            all_samples = [s for samples in pool.map(client, range(clients)) for s in samples]
+        elapsed = time.perf_counter() - started
+        key = f"api_data[concurrent={clients}]"
+        results[key] = summarize(all_samples)
+        results[key]["throughput_rps"] = round(len(all_samples) / elapsed, 1)
+
+        # 视图缓存未命中时的筛选查询：解析整个 JSON 并排序，对比直接查询 mmap 的二进制文件（见 utils/daybin.py）
+        date_str = sample_dates[0]
+        query = f"/api/data/{date_str}?top_apps=8&top_titles=5"
+
+        def uncached():
+            srv.module.VIEW_CACHE = ViewCache()
+            return srv.get(query)
+
+        expected = uncached()
+        json_path = os.path.join(data_dir, f"{date_str[:4]}.{date_str[4:6]}", f"{date_str}.data.json")
+        results["api_data[top_apps=8,top_titles=5,uncached]"] = measure(uncached, repeat)
+        results["api_data[top_apps=8,top_titles=5,uncached]"]["file_bytes"] = os.path.getsize(json_path)
+        with open(json_path, "rb") as f:
+            daybin.write(daybin.binary_path(json_path), daybin.encode(schema.decode_day(f.read())), json_path)
+        if uncached() != expected:
+            raise AssertionError("binary day query differs from the JSON view")
+        results["api_data[top_apps=8,top_titles=5,binary]"] = measure(uncached, repeat)
+        results["api_data[top_apps=8,top_titles=5,binary]"]["file_bytes"] = os.path.getsize(daybin.binary_path(json_path))
+    finally:
+        srv.close()
+    return results
+
+
+# --- 输出 ---
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(current, baseline_path):
+    """打印与基线结果的对比（mean 的比值，<1 表示变快）"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    print(f"{'case':45s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for case, stats in current.items():
+        if case in baseline:
+            old, new = baseline[case]["mean_ms"], stats["mean_ms"]
+            ratio = new / old if old else float("nan")
+            print(f"{case:45s} {old:10.3f} {new:10.3f} {ratio:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Statistics 基准测试")
+    parser.add_argument("--quick", action="store_true", help="减少重复次数和历史规模")
+    parser.add_argument("--repeat", type=int, default=None)
+    parser.add_argument("--years", type=float, default=None, help="/api/dates 测试的历史年数（默认 5）")
+    parser.add_argument("--clients", type=int, default=8, help="并发客户端数量")
+    parser.add_argument("--requests", type=int, default=None, help="每个并发客户端的请求数")
+    parser.add_argument("--presets", default="small,real,heavy", help="tracker 测试的数据规模")
+    parser.add_argument("--only", choices=("tracker", "api"), help="只运行某一组")
+    parser.add_argument("--trace", help="额外回放一份录制的轨迹文件（tracker --record 生成）")
+    parser.add_argument("--output", help="把结果写入 JSON 文件（默认输出到 stdout）")
+    parser.add_argument("--compare", help="与之前保存的结果对比")
+    parser.add_argument("--keep", action="store_true", help="保留临时数据目录")
+    args = parser.parse_args()
+
+    repeat = args.repeat or (5 if args.quick else 30)
+    years = args.years or (1 if args.quick else 5)
+    requests_per_client = args.requests or (10 if args.quick else 50)
+    presets = [p for p in args.presets.split(",") if p in PRESETS]
+
+    work_dir = tempfile.mkdtemp(prefix="statistics-bench-")
+    results = {}
+    try:
+        if args.only in (None, "tracker"):
+            results.update(bench_tracker(work_dir, repeat, presets))
+            results.update(bench_schema(repeat, presets))
+            results.update(bench_replay(work_dir, 1 if args.quick else 8))
+            results.update(bench_adaptive(work_dir, 1 if args.quick else 8))
+            if args.trace:
+                results.update(bench_trace(work_dir, args.trace))
+        if args.only in (None, "api"):
+            results.update(bench_api(work_dir, repeat, years, args.clients, requests_per_client))
+    finally:
+        if args.keep:
+            print(f"work dir: {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "host": socket.gethostname(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+    text = json.dumps(output, ensure_ascii=False, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+import random
+import datetime
+
+from utils import schema
+from utils.categories import DEFAULT_RULES, CategoryRules
+from utils import timeline
+
+# 合成工作负载：生成与 Data/2026.01 中真实文件形状相近的每日数据
+# （少数浏览器/IDE 应用占据大部分时长和标题，长尾应用只有少量标题）
+
+APP_NAMES = [
+    "msedge.exe", "chrome.exe", "Cursor.exe", "Code.exe", "explorer.exe", "Weixin.exe",
+    "哔哩哔哩.exe", "Doubao.exe", "SearchHost.exe", "WindowsTerminal.exe", "QQMusic.exe",
+    "vlc.exe", "Notepad.exe", "ShellExperienceHost.exe", "Taskmgr.exe", "steam.exe",
+]
+
+TITLE_WORDS = [
+    "个人", "Microsoft​ Edge", "文件资源管理器", "Statistics", "daily.html", "app_tracker.py",
+    "server.py", "新建标签页", "搜索", "GitHub", "Releases", "BOSS直聘", "豆包", "微信",
+    "设置", "下载", "report", "data.json", "Cursor", "Visual Studio Code", "和另外 2 个页面",
+]
+
+PRESETS = {
+    # (应用数, 每个主要应用的标题数)
+    "small": (10, 20),
+    "real": (25, 150),
+    "heavy": (60, 2000),
+}
+
+
+def app_name(i):
+    if i < len(APP_NAMES):
+        return APP_NAMES[i]
+    return f"SyntheticApp{i:03d}.exe"
+
+
+def make_title(rng, app, j):
+    words = rng.sample(TITLE_WORDS, 3)
+    return f"{words[0]} {j} - {words[1]} - {words[2]} - {app[:-4]}"
+
+
+def generate_day(date_str, n_apps, n_titles, seed=0):
+    """生成一天的数据；第 i 个应用约有 n_titles / (i + 1) 个标题，时长服从长尾分布"""
+    rng = random.Random(f"{seed}:{date_str}:{n_apps}:{n_titles}")
+    day = datetime.datetime.strptime(date_str, "%Y%m%d")
+    apps = {}
+    for i in range(n_apps):
+        name = app_name(i)
+        count = max(1, n_titles // (i + 1))
+        titles = {}
+        for j in range(count):
+            titles[make_title(rng, name, j)] = max(1, int(rng.paretovariate(1.2) * 5))
+        apps[name] = {"total": sum(titles.values()), "titles": titles}
+
+    sessions = []
+    start = day.replace(hour=9) + datetime.timedelta(minutes=rng.randint(0, 60))
+    for _ in range(rng.randint(1, 3)):
+        end = start + datetime.timedelta(minutes=rng.randint(30, 240))
+        sessions.append({
+            "start": start.strftime("%Y-%m-%d %H:%M:%S"),
+            "end": end.strftime("%Y-%m-%d %H:%M:%S")
+        })
+        start = end + datetime.timedelta(minutes=rng.randint(5, 90))
+
+    # 时段统计：每个应用的时长分摊到 9 点到 18 点之间的若干小时
+    idle_seconds = rng.randint(0, 7200)
+    day_timeline = timeline.empty_timeline()
+    for name, info in apps.items():
+        hours = rng.sample(range(9, 19), rng.randint(1, 5))
+        for k, hour in enumerate(hours):
+            share = info["total"] // len(hours) + (info["total"] % len(hours) if k == 0 else 0)
+            timeline.add_active(day_timeline, hour, name, share)
+            day_timeline["switches"][hour] += rng.randint(0, 5)
+    for hour in range(9, 19):
+        timeline.add_idle(day_timeline, hour, idle_seconds // 10)
+
+    day_data = {"sessions": sessions, "idle_seconds": idle_seconds, "apps": apps, "timeline": day_timeline}
+    day_data["categories"] = CategoryRules(DEFAULT_RULES).categorize(day_data)
+    return day_data
+
+
+def write_day(data_dir, date_str, data):
+    month_dir = os.path.join(data_dir, f"{date_str[:4]}.{date_str[4:6]}")
+    os.makedirs(month_dir, exist_ok=True)
+    path = os.path.join(month_dir, f"{date_str}.data.json")
+    with open(path, "wb") as f:
+        f.write(schema.encode_day(data))
+    return path
+
+
+def generate_history(data_dir, days, end_date=None, n_apps=25, n_titles=150, coverage=0.85, seed=0):
+    """生成 days 天的历史数据（按 coverage 比例随机跳过一些日期，模拟关机的日子）"""
+    if end_date is None:
+        end_date = datetime.date.today()
+    rng = random.Random(seed)
+    written = []
+    for i in range(days):
+        date_str = (end_date - datetime.timedelta(days=i)).strftime("%Y%m%d")
+        if rng.random() > coverage:
+            continue
+        write_day(data_dir, date_str, generate_day(date_str, n_apps, n_titles, seed))
+        written.append(date_str)
+    return written
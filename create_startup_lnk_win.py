@@ -1,8 +1,14 @@
+import argparse
 from pathlib import Path
 from utils.miscellaneous import get_startup_dir, get_pythonw_path, create_shortcut
 
 
 def main():
+    parser = argparse.ArgumentParser(description="创建开机自启动快捷方式")
+    parser.add_argument("--no-tray", action="store_true",
+                        help="tracker 以无界面服务模式启动，并为托盘客户端单独创建快捷方式")
+    args = parser.parse_args()
+
     script_dir = Path(__file__).resolve().parent
     startup_dir = get_startup_dir()
     startup_dir.mkdir(parents=True, exist_ok=True)
@@ -15,9 +21,18 @@ def main():
     link_path = startup_dir / "start_app_tracker.lnk"
     icon_path = script_dir / "statistics.ico"
     args_expr = f'Chr(34) & "{str(app_py)}" & Chr(34)'
+    if args.no_tray:
+        args_expr += ' & " --no-tray"'
     create_shortcut(link_path, pythonw, args_expr, script_dir, icon_path)
     print(str(link_path))
 
+    if args.no_tray:
+        tray_py = script_dir / "tray_client.py"
+        tray_link = startup_dir / "start_tray_client.lnk"
+        tray_args = f'Chr(34) & "{str(tray_py)}" & Chr(34)'
+        create_shortcut(tray_link, pythonw, tray_args, script_dir, icon_path)
+        print(str(tray_link))
+
 
 if __name__ == "__main__":
     main()
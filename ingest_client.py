@@ -0,0 +1,123 @@
+import os
+import re
+import json
+import socket
+import argparse
+import urllib.request
+
+from utils.config import read_config
+from utils.datastore import list_dates, month_of, read_day_bytes
+from utils.hosts import apply_ingest, encode_payload
+
+# 把本机 Data 目录中变化过的日期批量上报到汇总服务器的 /api/ingest
+# 使用 --local-data-dir 时直接写入本地目录（不经过网络），便于离线测试
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "Data")
+STATE_FILE = os.path.join(DATA_DIR, "ingest.state.json")
+CONFIG_FILE = os.path.join(BASE_DIR, "statistics.configuration.json")
+
+
+def default_host_name():
+    """本机主机名，去掉上报时不允许的字符"""
+    return re.sub(r"[^A-Za-z0-9._-]", "-", socket.gethostname())[:64] or "unknown"
+
+
+def day_fingerprint(data_dir, date_str):
+    """用文件的 mtime 和大小判断某天是否变化（已归档的日期视为不再变化）"""
+    path = os.path.join(data_dir, month_of(date_str), f"{date_str}.data.json")
+    if not os.path.exists(path):
+        return "archived"
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def load_state(path):
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            pass
+    return {}
+
+
+def save_state(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def collect_changed_days(data_dir, state, max_days=None):
+    """返回 [(date, fingerprint)]，只包含上次上报后变化过的日期"""
+    changed = []
+    for date_str in list_dates(data_dir)[:max_days]:
+        fp = day_fingerprint(data_dir, date_str)
+        if state.get(date_str) != fp:
+            changed.append((date_str, fp))
+    return changed
+
+
+def post_payload(server_url, body, token=None, timeout=30):
+    """通过 HTTP 发送一批数据；token 为服务器配置的 ingestToken"""
+    headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    req = urllib.request.Request(server_url.rstrip("/") + "/api/ingest", data=body, headers=headers, method="POST")
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def push(data_dir, host, send, state_path=None, batch_size=7, max_days=None):
+    """把变化过的日期分批打包并通过 send(body) 发送，成功后更新状态文件"""
+    state = load_state(state_path) if state_path else {}
+    changed = collect_changed_days(data_dir, state, max_days)
+    results = []
+    for i in range(0, len(changed), batch_size):
+        batch = changed[i:i + batch_size]
+        days = {}
+        for date_str, _ in batch:
+            raw = read_day_bytes(data_dir, date_str)
+            if raw is not None:
+                days[date_str] = json.loads(raw)
+        if not days:
+            continue
+        results.append(send(encode_payload(host, days)))
+        for date_str, fp in batch:
+            state[date_str] = fp
+        if state_path:
+            save_state(state_path, state)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上报本机统计数据到汇总服务器")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--server", help="汇总服务器地址，例如 http://192.168.1.10:8000")
+    target.add_argument("--local-data-dir", help="不经过网络，直接合并到指定的 Data 目录（测试用）")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="本机 Data 目录")
+    parser.add_argument("--host", default=default_host_name(), help="上报使用的主机名")
+    parser.add_argument("--state", default=STATE_FILE, help="记录已上报日期的状态文件")
+    parser.add_argument("--full", action="store_true", help="忽略状态文件，重新上报全部日期")
+    parser.add_argument("--days", type=int, default=None, help="只检查最近 N 天")
+    parser.add_argument("--batch-size", type=int, default=7)
+    parser.add_argument("--token", default=None,
+                        help="服务器配置的上报令牌（默认读取本机配置文件中的 ingestToken）")
+    args = parser.parse_args()
+
+    if args.full and os.path.exists(args.state):
+        os.remove(args.state)
+
+    if args.server:
+        token = args.token or read_config(CONFIG_FILE).get("ingestToken")
+        send = lambda body: post_payload(args.server, body, token)
+    else:
+        send = lambda body: apply_ingest(args.local_data_dir, body, "gzip")
+
+    for result in push(args.data_dir, args.host, send, args.state, args.batch_size, args.days):
+        print(f"{result['host']}: received {result['received']}, written {len(result['written'])}")
+
+
+if __name__ == "__main__":
+    main()
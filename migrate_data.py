@@ -0,0 +1,101 @@
+import os
+import argparse
+import zipfile
+
+from utils import schema
+from utils.archive import ARCHIVE_SUFFIX
+
+# 一次性把 Data 目录（包括 hosts/ 下的远端数据和月份归档）中的旧版本数据文件迁移为当前版本
+# 用法：python migrate_data.py [--data-dir Data] [--dry-run]
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "Data")
+DATA_SUFFIX = ".data.json"
+
+
+def classify(raw):
+    """返回 ("current" | "legacy", 迁移后的内容) 或 ("corrupt", 错误信息)"""
+    try:
+        data = schema.loads(raw)
+        if isinstance(data, dict) and data.get(schema.SCHEMA_KEY) == schema.SCHEMA_VERSION:
+            schema.validate(data)
+            return "current", None
+        data = schema.migrate(data)
+        schema.validate(data)
+        return "legacy", schema.encode_day(data)
+    except (ValueError, TypeError) as e:
+        return "corrupt", str(e)
+
+
+def migrate_file(path, dry_run, counts, log):
+    with open(path, "rb") as f:
+        status, result = classify(f.read())
+    counts[status] += 1
+    if status == "legacy":
+        log(f"migrate    {path}")
+        if not dry_run:
+            schema.write_atomic(path, result)
+    elif status == "corrupt":
+        log(f"quarantine {path}: {result}")
+        if not dry_run:
+            schema.quarantine(path)
+
+
+def migrate_archive(path, dry_run, counts, log):
+    """重写归档中需要迁移的成员；损坏的成员保持原样，只报告"""
+    replacements = {}
+    with zipfile.ZipFile(path, "r") as zf:
+        for name in zf.namelist():
+            if not name.endswith(DATA_SUFFIX):
+                continue
+            status, result = classify(zf.read(name))
+            counts[status] += 1
+            if status == "legacy":
+                replacements[name] = result
+                log(f"migrate    {path}:{name}")
+            elif status == "corrupt":
+                log(f"corrupt    {path}:{name}: {result} (left in place)")
+    if not replacements or dry_run:
+        return
+
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(path, "r") as old, \
+            zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for info in old.infolist():
+            if info.filename in replacements:
+                zf.writestr(info, replacements[info.filename])
+            else:
+                zf.writestr(info, old.read(info.filename))
+    with zipfile.ZipFile(tmp_path, "r") as zf:
+        bad = zf.testzip()
+        if bad is not None:
+            os.remove(tmp_path)
+            raise IOError(f"Archive verification failed on {bad}")
+    os.replace(tmp_path, path)
+
+
+def migrate_all(data_dir, dry_run=False, log=print):
+    counts = {"current": 0, "legacy": 0, "corrupt": 0}
+    for root, _, files in os.walk(data_dir):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if name.endswith(DATA_SUFFIX):
+                migrate_file(path, dry_run, counts, log)
+            elif name.endswith(ARCHIVE_SUFFIX):
+                migrate_archive(path, dry_run, counts, log)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"把数据文件迁移到 schema {schema.SCHEMA_VERSION}")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要迁移或隔离的文件")
+    args = parser.parse_args()
+
+    counts = migrate_all(args.data_dir, args.dry_run)
+    print(f"current: {counts['current']}, migrated: {counts['legacy']}, corrupt: {counts['corrupt']}"
+          + (" (dry run)" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    main()
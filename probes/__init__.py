@@ -0,0 +1,34 @@
+import sys
+
+# 平台探测后端；按需导入，避免在其他平台上导入 win32 / AppKit 等模块
+
+BACKENDS = ("windows", "macos", "linux", "replay")
+
+
+def default_backend():
+    """根据当前平台选择默认后端"""
+    if sys.platform == "win32":
+        return "windows"
+    if sys.platform == "darwin":
+        return "macos"
+    return "linux"
+
+
+def create_probe(name=None, replay_path=None):
+    """创建探测后端实例"""
+    name = name or default_backend()
+    if name == "windows":
+        from probes.windows import WindowsProbe
+        return WindowsProbe()
+    if name == "macos":
+        from probes.macos import MacProbe
+        return MacProbe()
+    if name == "linux":
+        from probes.linux import LinuxProbe
+        return LinuxProbe()
+    if name == "replay":
+        if not replay_path:
+            raise ValueError("replay backend requires a trace file")
+        from probes.replay import ReplayProbe
+        return ReplayProbe.from_file(replay_path)
+    raise ValueError(f"Unknown probe backend: {name}")
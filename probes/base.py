@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import subprocess
+
+
+class Probe:
+    """平台探测接口：闲置时间、前台窗口，以及 tracker 使用的时钟
+
+    monitor_loop 只通过 probe 读取时间和休眠，回放后端可以用虚拟时钟以远超实时的速度运行。
+    """
+
+    name = "base"
+    # 默认闲置白名单（配置文件中没有 idleExempt 时使用）
+    default_exempt = []
+    # 闲置规则中的应用名是否按双向子串匹配（默认不区分大小写的精确匹配，见 utils/idle_rules.py）
+    fuzzy_app_match = False
+    # 采样间隔拉长时是否在间隔中途读取闲置时间、发现输入后提前采样（逐点回放的轨迹在采样点之间没有数据）
+    polls_input = True
+
+    def start(self, log=None):
+        """开始采样前调用（打开连接、启动监听线程等）；log 为可选的日志回调，记录后端运行中的故障"""
+
+    def stop(self):
+        """停止采样后调用"""
+
+    @property
+    def finished(self):
+        """探测数据是否已耗尽（只有回放后端会返回 True）"""
+        return False
+
+    def now(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def get_idle_duration(self):
+        """获取系统闲置时间（秒）"""
+        raise NotImplementedError
+
+    def get_active_window_info(self):
+        """获取当前活动窗口的应用名称和标题，失败时返回 (None, None)"""
+        raise NotImplementedError
+
+    def on_battery(self):
+        """是否使用电池供电（自适应采样用）；默认通过可选依赖 psutil 查询，没有电池或无法判断时返回 False"""
+        try:
+            import psutil
+            battery = psutil.sensors_battery()
+        except Exception:
+            return False
+        return battery is not None and battery.power_plugged is False
+
+    def open_folder(self, path):
+        """打开数据文件夹"""
+        try:
+            if sys.platform == "win32":
+                os.startfile(path)
+            elif sys.platform == "darwin":
+                subprocess.run(["open", path], check=False)
+            else:
+                subprocess.run(["xdg-open", path], check=False)
+        except Exception:
+            pass
@@ -0,0 +1,484 @@
+import os
+import re
+import json
+import time
+import shutil
+import socket
+import struct
+import threading
+import subprocess
+
+from probes.base import Probe
+
+# Linux 后端：前台窗口由事件驱动，采样时只读取缓存，不再每秒启动子进程
+#
+# 前台窗口来源（按优先级）：
+#   1. Sway / i3 IPC（Wayland 合成器）：订阅 window 事件
+#   2. X11（需要 python-xlib）：监听根窗口 _NET_ACTIVE_WINDOW 与当前窗口标题的 PropertyNotify
+#   3. xprop 轮询（兜底，仅在以上都不可用时使用）
+# 事件线程退出（X 连接断开、合成器重启等）时立即清空缓存的前台窗口并记录日志，之后改用 xprop 轮询，
+# 同时按指数退避重新连接事件来源，成功后切回事件驱动
+# 闲置时间来源（按优先级）：
+#   1. X11 MIT-SCREEN-SAVER 扩展（需要 python-xlib）
+#   2. systemd-logind 会话的 IdleHint / IdleSinceHintMonotonic（需要 jeepney，精度取决于桌面环境）
+#   3. xprintidle（兜底）
+# 进程名从 /proc/<pid>/comm 读取，与 Windows 的 exe 名称对应
+# 供电状态从 /sys/class/power_supply 读取（与 psutil.sensors_battery 相同的来源）
+
+try:
+    from Xlib import X, Xatom, display as xdisplay
+    XLIB_AVAILABLE = True
+except ImportError:
+    XLIB_AVAILABLE = False
+
+try:
+    from jeepney import DBusAddress, Properties
+    from jeepney.io.blocking import open_dbus_connection
+    JEEPNEY_AVAILABLE = True
+except ImportError:
+    JEEPNEY_AVAILABLE = False
+
+
+def process_name(pid):
+    try:
+        with open(f"/proc/{pid}/comm", "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except (OSError, TypeError):
+        return None
+
+
+def _normalize(exe_name, title):
+    if title is None or not title.strip():
+        title = "Unknown Title"
+    return exe_name, title
+
+
+class _FocusSource:
+    """前台窗口来源：后台线程接收事件并更新缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = (None, None)
+        self._thread = None
+        self.error = None  # 事件线程退出的原因
+
+    def _set(self, exe_name, title):
+        with self._lock:
+            self._current = _normalize(exe_name, title) if exe_name or title else (None, None)
+
+    def get(self):
+        with self._lock:
+            return self._current
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        pass
+
+    @property
+    def alive(self):
+        """事件线程仍在运行（轮询来源没有线程，始终为 True）"""
+        return self._thread is None or self._thread.is_alive()
+
+    def _listen(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.error = e
+        finally:
+            # 不再收到事件，缓存的窗口不能继续计时
+            self._set(None, None)
+
+    def _run(self):
+        """接收事件直到连接断开；断开时抛出异常"""
+        raise NotImplementedError
+
+
+class X11FocusSource(_FocusSource):
+    """监听 _NET_ACTIVE_WINDOW 变化，以及当前窗口 _NET_WM_NAME / WM_NAME 的变化（例如浏览器切换标签页）"""
+
+    def __init__(self):
+        super().__init__()
+        self.display = xdisplay.Display()
+        self.root = self.display.screen().root
+        self.atom_active = self.display.intern_atom("_NET_ACTIVE_WINDOW")
+        self.atom_name = self.display.intern_atom("_NET_WM_NAME")
+        self.atom_pid = self.display.intern_atom("_NET_WM_PID")
+        self.atom_utf8 = self.display.intern_atom("UTF8_STRING")
+        self.window = None
+        self.root.change_attributes(event_mask=X.PropertyChangeMask)
+        self._refresh_active()
+
+    def _active_window(self):
+        prop = self.root.get_full_property(self.atom_active, X.AnyPropertyType)
+        if not prop or not len(prop.value) or not prop.value[0]:
+            return None
+        return self.display.create_resource_object("window", prop.value[0])
+
+    def _title(self, window):
+        prop = window.get_full_property(self.atom_name, self.atom_utf8)
+        if prop and prop.value:
+            value = prop.value
+            return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+        name = window.get_wm_name()
+        return name.decode("latin-1") if isinstance(name, bytes) else name
+
+    def _refresh_active(self):
+        try:
+            window = self._active_window()
+            if window is None:
+                self.window = None
+                self._set(None, None)
+                return
+            if self.window is None or window.id != self.window.id:
+                # 订阅新窗口的属性变化，以便感知标题变化
+                window.change_attributes(event_mask=X.PropertyChangeMask)
+                self.window = window
+            self._refresh_title()
+        except Exception:
+            self.window = None
+            self._set(None, None)
+
+    def _refresh_title(self):
+        window = self.window
+        pid_prop = window.get_full_property(self.atom_pid, X.AnyPropertyType)
+        pid = pid_prop.value[0] if pid_prop and len(pid_prop.value) else None
+        exe_name = process_name(pid) if pid else None
+        if exe_name is None:
+            wm_class = window.get_wm_class()
+            exe_name = wm_class[1] if wm_class else None
+        self._set(exe_name, self._title(window))
+
+    def _run(self):
+        while True:
+            event = self.display.next_event()  # 连接断开时抛出异常
+            if event.type != X.PropertyNotify:
+                continue
+            try:
+                if event.window.id == self.root.id and event.atom == self.atom_active:
+                    self._refresh_active()
+                elif self.window is not None and event.window.id == self.window.id \
+                        and event.atom in (self.atom_name, Xatom.WM_NAME):
+                    self._refresh_title()
+            except Exception:
+                self._refresh_active()
+
+    def stop(self):
+        try:
+            self.display.close()
+        except Exception:
+            pass
+
+
+class SwayFocusSource(_FocusSource):
+    """通过 i3 IPC 协议订阅 Sway / i3 的 window 事件"""
+
+    MAGIC = b"i3-ipc"
+    GET_TREE = 4
+    SUBSCRIBE = 2
+    EVENT_WINDOW = 0x80000003
+
+    def __init__(self, socket_path):
+        super().__init__()
+        self.socket_path = socket_path
+        self.sock = self._connect()
+        # 初始化当前焦点
+        tree = self._request(self.sock, self.GET_TREE, b"")
+        focused = self._find_focused(tree)
+        if focused:
+            self._update(focused)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _send(self, sock, msg_type, payload):
+        sock.sendall(self.MAGIC + struct.pack("=II", len(payload), msg_type) + payload)
+
+    def _recv(self, sock):
+        header = self._recv_exact(sock, 14)
+        length, msg_type = struct.unpack("=II", header[6:])
+        return msg_type, json.loads(self._recv_exact(sock, length))
+
+    @staticmethod
+    def _recv_exact(sock, n):
+        buf = b""
+        while len(buf) < n:
+            chunk = sock.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("IPC socket closed")
+            buf += chunk
+        return buf
+
+    def _request(self, sock, msg_type, payload):
+        self._send(sock, msg_type, payload)
+        return self._recv(sock)[1]
+
+    def _find_focused(self, node):
+        if node.get("focused") and node.get("type") in ("con", "floating_con"):
+            return node
+        for child in node.get("nodes", []) + node.get("floating_nodes", []):
+            found = self._find_focused(child)
+            if found:
+                return found
+        return None
+
+    def _update(self, container):
+        exe_name = process_name(container.get("pid"))
+        if exe_name is None:
+            exe_name = container.get("app_id") or (container.get("window_properties") or {}).get("class")
+        self._set(exe_name, container.get("name"))
+
+    def _run(self):
+        sock = self._connect()
+        try:
+            self._request(sock, self.SUBSCRIBE, b'["window"]')
+            while True:
+                msg_type, event = self._recv(sock)
+                if msg_type != self.EVENT_WINDOW:
+                    continue
+                container = event.get("container") or {}
+                if event.get("change") == "focus" or (event.get("change") == "title" and container.get("focused")):
+                    self._update(container)
+                elif event.get("change") == "close" and container.get("focused"):
+                    self._set(None, None)
+        finally:
+            sock.close()
+
+    def stop(self):
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+
+class XpropFocusSource(_FocusSource):
+    """兜底：每次采样调用 xprop 读取前台窗口"""
+
+    WINDOW_ID_PATTERN = re.compile(r"window id # (0x[0-9a-fA-F]+)")
+    PID_PATTERN = re.compile(r"_NET_WM_PID\(CARDINAL\) = (\d+)")
+    NAME_PATTERN = re.compile(r'_NET_WM_NAME\(UTF8_STRING\) = "(.*)"')
+
+    def start(self):
+        pass
+
+    def get(self):
+        try:
+            m = self.WINDOW_ID_PATTERN.search(_run(["xprop", "-root", "_NET_ACTIVE_WINDOW"]))
+            if not m or int(m.group(1), 16) == 0:
+                return None, None
+            props = _run(["xprop", "-id", m.group(1), "_NET_WM_PID", "_NET_WM_NAME"])
+            pid = self.PID_PATTERN.search(props)
+            name = self.NAME_PATTERN.search(props)
+            return _normalize(process_name(pid.group(1)) if pid else None, name.group(1) if name else "")
+        except Exception:
+            return None, None
+
+
+def _run(args):
+    result = subprocess.run(args, capture_output=True, text=True, timeout=1)
+    return result.stdout if result.returncode == 0 else ""
+
+
+# --- 闲置时间 ---
+
+
+class XScreenSaverIdle:
+    def __init__(self):
+        # 使用独立的连接，避免与事件线程共享 Display
+        self.display = xdisplay.Display()
+        if not self.display.has_extension("MIT-SCREEN-SAVER"):
+            self.display.close()
+            raise RuntimeError("MIT-SCREEN-SAVER extension not available")
+        self.root = self.display.screen().root
+
+    def get(self):
+        return self.root.screensaver_query_info().idle / 1000.0
+
+    def close(self):
+        self.display.close()
+
+
+class LogindIdle:
+    """systemd-logind 会话的 IdleHint；只有桌面环境上报闲置后才会变化"""
+
+    def __init__(self):
+        self.conn = open_dbus_connection(bus="SYSTEM")
+        self.session = DBusAddress(
+            "/org/freedesktop/login1/session/auto",
+            bus_name="org.freedesktop.login1",
+            interface="org.freedesktop.login1.Session"
+        )
+        self.get()  # 确认接口可用
+
+    def _property(self, name):
+        reply = self.conn.send_and_get_reply(Properties(self.session).get(name))
+        return reply.body[0][1]
+
+    def get(self):
+        if not self._property("IdleHint"):
+            return 0
+        since = self._property("IdleSinceHintMonotonic")
+        return max(0.0, time.monotonic() - since / 1_000_000) if since else 0
+
+    def close(self):
+        self.conn.close()
+
+
+class XprintidleIdle:
+    def get(self):
+        return int(_run(["xprintidle"]).strip() or 0) / 1000.0
+
+    def close(self):
+        pass
+
+
+POWER_SUPPLY_DIR = "/sys/class/power_supply"
+
+
+def _read_sysfs(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class LinuxProbe(Probe):
+    name = "linux"
+    default_exempt = ["vlc", "mpv", "totem", "chrome", "firefox", "spotify"]
+    FOCUS_RETRY_MIN = 2.0  # 事件来源断开后第一次重连的间隔（秒），之后每次失败翻倍
+    FOCUS_RETRY_MAX = 300.0
+
+    def __init__(self):
+        self.focus = None
+        self.idle = None
+        self.log = None
+        self._retry_at = None  # 下次尝试重新连接事件来源的时间（time.monotonic），None 表示不需要
+        self._retry_delay = None  # 当前的重连间隔，从未断开过时为 None
+        self._focus_since = None  # 当前事件来源开始运行的时间
+
+    def _write_log(self, message):
+        if self.log is not None:
+            self.log(message)
+
+    def _create_event_focus_source(self):
+        """事件驱动的前台窗口来源，都不可用时返回 None"""
+        sway_socket = os.environ.get("SWAYSOCK") or os.environ.get("I3SOCK")
+        if sway_socket and os.path.exists(sway_socket):
+            try:
+                return SwayFocusSource(sway_socket)
+            except Exception:
+                pass
+        if XLIB_AVAILABLE and os.environ.get("DISPLAY"):
+            try:
+                return X11FocusSource()
+            except Exception:
+                pass
+        return None
+
+    def _create_focus_source(self):
+        source = self._create_event_focus_source()
+        if source is None and shutil.which("xprop"):
+            source = XpropFocusSource()
+        return source
+
+    def _create_idle_source(self):
+        if XLIB_AVAILABLE and os.environ.get("DISPLAY"):
+            try:
+                return XScreenSaverIdle()
+            except Exception:
+                pass
+        if JEEPNEY_AVAILABLE:
+            try:
+                return LogindIdle()
+            except Exception:
+                pass
+        if shutil.which("xprintidle"):
+            return XprintidleIdle()
+        return None
+
+    def start(self, log=None):
+        self.log = log
+        self.focus = self._create_focus_source()
+        self._focus_since = time.monotonic()
+        if self.focus:
+            self.focus.start()
+        self.idle = self._create_idle_source()
+
+    def stop(self):
+        if self.focus:
+            self.focus.stop()
+        if self.idle:
+            self.idle.close()
+
+    def get_idle_duration(self):
+        """获取系统闲置时间（秒）"""
+        if self.idle is None:
+            return 0
+        try:
+            return self.idle.get()
+        except Exception:
+            return 0
+
+    def get_active_window_info(self):
+        """获取当前活动窗口的进程名和标题（读取事件线程维护的缓存）"""
+        if self.focus is not None and not self.focus.alive:
+            self._focus_lost()
+        if self._retry_at is not None and time.monotonic() >= self._retry_at:
+            self._reconnect_focus()
+        if self.focus is None:
+            return None, None
+        return self.focus.get()
+
+    def _focus_lost(self):
+        """事件线程已退出：改用 xprop 轮询，并安排重新连接"""
+        source = self.focus
+        source.stop()
+        self.focus = XpropFocusSource() if shutil.which("xprop") else None
+        # 重连后很快又断开时继续退避，第一次断开或稳定运行过一段时间后从最短间隔开始
+        if self._retry_delay is not None and time.monotonic() - self._focus_since < self.FOCUS_RETRY_MAX:
+            self._retry_delay = min(self._retry_delay * 2, self.FOCUS_RETRY_MAX)
+        else:
+            self._retry_delay = self.FOCUS_RETRY_MIN
+        self._retry_at = time.monotonic() + self._retry_delay
+        fallback = "polling with xprop" if self.focus else "no focus source left"
+        self._write_log(f"{type(source).__name__} stopped ({source.error or 'event stream ended'}), "
+                        f"{fallback}; reconnecting in {self._retry_delay:.0f}s")
+
+    def _reconnect_focus(self):
+        try:
+            source = self._create_event_focus_source()
+            if source is not None:
+                source.start()
+        except Exception:
+            source = None
+        if source is None:
+            self._retry_delay = min(self._retry_delay * 2, self.FOCUS_RETRY_MAX)
+            self._retry_at = time.monotonic() + self._retry_delay
+            return
+        if self.focus is not None:
+            self.focus.stop()
+        self.focus = source
+        self._focus_since = time.monotonic()
+        self._retry_at = None
+        self._write_log(f"Focus events restored via {type(source).__name__}")
+
+    def on_battery(self):
+        """有交流电源在线时返回 False；没有交流电源信息时看电池是否在放电"""
+        try:
+            names = os.listdir(POWER_SUPPLY_DIR)
+        except OSError:
+            return False
+        discharging = False
+        for name in names:
+            path = os.path.join(POWER_SUPPLY_DIR, name)
+            kind = _read_sysfs(os.path.join(path, "type"))
+            if kind == "Mains" and _read_sysfs(os.path.join(path, "online")) == "1":
+                return False
+            if kind == "Battery" and _read_sysfs(os.path.join(path, "status")) == "Discharging":
+                discharging = True
+        return discharging
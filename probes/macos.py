@@ -0,0 +1,120 @@
+import subprocess
+
+from probes.base import Probe
+
+# 尝试导入 macOS 特定的库
+try:
+    from AppKit import NSWorkspace
+    from Quartz import (
+        CGEventSourceSecondsSinceLastEventType,
+        kCGEventSourceStateHIDSystemState,
+        kCGAnyInputEventType
+    )
+    MACOS_AVAILABLE = True
+except ImportError:
+    MACOS_AVAILABLE = False
+
+# 使用 AppleScript 获取当前窗口标题
+WINDOW_TITLE_SCRIPT = '''
+tell application "System Events"
+    set frontApp to first application process whose frontmost is true
+    set appName to name of frontApp
+    try
+        set windowTitle to name of first window of frontApp
+    on error
+        set windowTitle to ""
+    end try
+    return windowTitle
+end tell
+'''
+
+
+class MacProbe(Probe):
+    name = "macos"
+    # 前台应用名（如 "Google Chrome"）与白名单中的名称（"Google Chrome.app"）不完全一致
+    fuzzy_app_match = True
+    # macOS 默认白名单应用（注意 macOS 应用名称格式不同）
+    default_exempt = [
+        "VLC.app",
+        "Google Chrome.app",
+        "Safari.app",
+        "Spotify.app",
+        "Music.app",
+        "TV.app",
+        "QuickTime Player.app"
+    ]
+
+    def get_idle_duration(self):
+        """获取系统闲置时间（秒）"""
+        if not MACOS_AVAILABLE:
+            return 0
+        try:
+            idle_time = CGEventSourceSecondsSinceLastEventType(
+                kCGEventSourceStateHIDSystemState,
+                kCGAnyInputEventType
+            )
+            return idle_time if idle_time is not None else 0
+        except Exception:
+            return 0
+
+    def get_active_window_info(self):
+        """获取当前活动窗口的应用名称和窗口标题"""
+        if not MACOS_AVAILABLE:
+            return None, None
+
+        try:
+            workspace = NSWorkspace.sharedWorkspace()
+            frontmost_app = workspace.frontmostApplication()
+
+            if not frontmost_app:
+                return None, None
+
+            # 获取应用名称（通常是 .app 的包名，需要提取）
+            app_name = frontmost_app.localizedName()
+            if not app_name:
+                app_name = frontmost_app.bundleIdentifier()
+                # 从 bundle identifier 提取名称（例如：com.google.Chrome -> Chrome）
+                if app_name and '.' in app_name:
+                    app_name = app_name.split('.')[-1]
+
+            try:
+                result = subprocess.run(
+                    ['osascript', '-e', WINDOW_TITLE_SCRIPT],
+                    capture_output=True,
+                    text=True,
+                    timeout=1
+                )
+                title = result.stdout.strip() if result.returncode == 0 else ""
+            except Exception:
+                title = ""
+
+            # 处理空标题的情况
+            if not title or not title.strip():
+                title = "Unknown Title"
+
+            # 将其转换为类似 Windows 的格式（例如：Chrome.app）
+            if app_name and not app_name.endswith('.app'):
+                app_name = f"{app_name}.app"
+
+            return app_name, title
+        except Exception:
+            # 如果获取失败，尝试使用 psutil 作为备用方案（只在这里用到，按需导入）
+            try:
+                import psutil
+                for proc in psutil.process_iter(['pid', 'name']):
+                    try:
+                        if proc.info['name']:
+                            # 简单的备用方案：返回进程名
+                            return proc.info['name'], "Unknown Title"
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        pass
+            except Exception:
+                pass
+            return None, None
+
+    def open_folder(self, path):
+        """打开数据文件夹（macOS 版本）"""
+        try:
+            subprocess.run(['open', path], check=False)
+        except Exception:
+            pass
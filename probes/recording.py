@@ -0,0 +1,51 @@
+from probes.base import Probe
+from utils.trace import TraceWriter
+
+# 录制后端：包装真实的探测后端，把每次采样的原始结果写入二进制轨迹（见 utils/trace.py），
+# 之后可以用 --replay 原样回放，复现闲置判定、白名单等现场问题
+
+
+class RecordingProbe(Probe):
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+        self.writer = None
+        self.name = inner.name
+        self.default_exempt = inner.default_exempt
+        self.fuzzy_app_match = inner.fuzzy_app_match
+        self.polls_input = inner.polls_input
+        self._last_idle = 0.0
+
+    def start(self, log=None):
+        self.inner.start(log=log)
+        self.writer = TraceWriter(self.path)
+
+    def stop(self):
+        self.inner.stop()
+        if self.writer:
+            self.writer.close()
+
+    @property
+    def finished(self):
+        return self.inner.finished
+
+    def now(self):
+        return self.inner.now()
+
+    def sleep(self, seconds):
+        self.inner.sleep(seconds)
+
+    def get_idle_duration(self):
+        self._last_idle = self.inner.get_idle_duration()
+        return self._last_idle
+
+    def get_active_window_info(self):
+        # monitor_loop 每次采样先读闲置时间再读窗口，此时记录一条完整的采样点
+        exe, title = self.inner.get_active_window_info()
+        if self.writer:
+            self.writer.record(self.inner.now(), exe, title, self._last_idle)
+        return exe, title
+
+    def open_folder(self, path):
+        self.inner.open_folder(path)
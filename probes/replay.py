@@ -0,0 +1,107 @@
+import json
+import time
+
+from probes.base import Probe
+from utils.trace import is_binary_trace, read_trace
+
+# 回放后端：按虚拟时钟回放记录下来的前台窗口轨迹，sleep() 只推进虚拟时间，
+# 因此可以用远超实时的速度驱动真实的 monitor_loop 统计与持久化流程
+#
+# 轨迹文件为 JSON Lines，每行一个采样点（按时间递增）：
+#   {"t": 1769342880.0, "exe": "msedge.exe", "title": "...", "idle": 0.0}
+# 采样点之间保持上一个采样点的状态；idle 为该时刻的系统闲置秒数，之后随时间线性增长
+#
+# tracker --record 录制的二进制轨迹（utils/trace.py）以逐点方式回放：每次 sleep() 直接跳到下一个
+# 采样点的时间戳，闲置时间取录制值，monitor_loop 对每个录制的采样点恰好处理一次
+
+
+def load_jsonl_trace(path):
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            e = json.loads(line)
+            events.append((float(e["t"]), e.get("exe"), e.get("title"), float(e.get("idle", 0))))
+    return events
+
+
+class ReplayProbe(Probe):
+    name = "replay"
+
+    def __init__(self, events, default_exempt=None, exact=False):
+        """events: [(timestamp, exe, title, idle_seconds), ...]，按时间递增
+
+        exact=True 时逐点回放（sleep 跳到下一个采样点），否则按 1 秒步长推进虚拟时钟
+        """
+        if not events:
+            raise ValueError("Empty trace")
+        self.events = events
+        self.exact = exact
+        self.index = 0  # 当前采样点；时钟只增不减，顺序推进即可
+        self.clock = events[0][0]
+        self.battery = False  # 回放时的供电状态（测试自适应采样用）
+        self.polls_input = not exact
+        self.end = events[-1][0]
+        if default_exempt is not None:
+            self.default_exempt = default_exempt
+
+    @classmethod
+    def from_file(cls, path):
+        if is_binary_trace(path):
+            return cls(read_trace(path), exact=True)
+        return cls(load_jsonl_trace(path))
+
+    @property
+    def finished(self):
+        if self.exact:
+            return self.index >= len(self.events)
+        return self.clock > self.end
+
+    def now(self):
+        return self.clock
+
+    def sleep(self, seconds):
+        if self.exact:
+            self.index += 1
+            if self.index < len(self.events):
+                self.clock = self.events[self.index][0]
+            return
+        self.clock += seconds
+
+    def _current(self):
+        if self.exact:
+            return self.events[min(self.index, len(self.events) - 1)]
+        events = self.events
+        last = len(events) - 1
+        while self.index < last and events[self.index + 1][0] <= self.clock:
+            self.index += 1
+        return events[self.index]
+
+    def get_idle_duration(self):
+        t, _, _, idle = self._current()
+        if idle <= 0:
+            return 0
+        if self.exact:
+            return idle
+        return idle + (self.clock - t)
+
+    def get_active_window_info(self):
+        _, exe, title = self._current()[:3]
+        return exe, title
+
+    def on_battery(self):
+        return self.battery
+
+    def open_folder(self, path):
+        pass
+
+
+class StaticProbe(ReplayProbe):
+    """始终返回同一个窗口的探测（基准测试与无界面运行时使用）"""
+
+    def __init__(self, exe="bench.exe", title="Benchmark Window", idle=0.0, start=None, duration=float("inf")):
+        start = time.time() if start is None else start
+        super().__init__([(start, exe, title, idle)])
+        self.end = start + duration
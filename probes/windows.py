@@ -0,0 +1,106 @@
+import os
+import ctypes
+from ctypes import wintypes
+
+from probes.base import Probe
+
+# 全部通过 ctypes 调用 Win32 API，不导入 pywin32 / psutil，减少启动时间和常驻内存
+
+# --- Windows API 定义 (用于检测闲置) ---
+
+
+class LASTINPUTINFO(ctypes.Structure):
+    _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+
+# --- Windows API 定义 (用于检测供电状态) ---
+
+
+class SYSTEM_POWER_STATUS(ctypes.Structure):
+    _fields_ = [("ACLineStatus", ctypes.c_ubyte), ("BatteryFlag", ctypes.c_ubyte),
+                ("BatteryLifePercent", ctypes.c_ubyte), ("SystemStatusFlag", ctypes.c_ubyte),
+                ("BatteryLifeTime", wintypes.DWORD), ("BatteryFullLifeTime", wintypes.DWORD)]
+
+
+# --- Windows API 定义 (用于获取前台窗口) ---
+
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+MAX_PATH_CHARS = 32768
+
+user32 = ctypes.windll.user32
+kernel32 = ctypes.windll.kernel32
+
+user32.GetForegroundWindow.restype = wintypes.HWND
+user32.GetWindowThreadProcessId.argtypes = (wintypes.HWND, ctypes.POINTER(wintypes.DWORD))
+user32.GetWindowThreadProcessId.restype = wintypes.DWORD
+user32.GetWindowTextLengthW.argtypes = (wintypes.HWND,)
+user32.GetWindowTextW.argtypes = (wintypes.HWND, wintypes.LPWSTR, ctypes.c_int)
+kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+kernel32.OpenProcess.restype = wintypes.HANDLE
+kernel32.QueryFullProcessImageNameW.argtypes = (
+    wintypes.HANDLE, wintypes.DWORD, wintypes.LPWSTR, ctypes.POINTER(wintypes.DWORD))
+kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+
+
+def process_name(pid):
+    """进程的 exe 文件名（与 psutil.Process(pid).name() 相同），无权限时返回 None"""
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return None
+    try:
+        size = wintypes.DWORD(MAX_PATH_CHARS)
+        buf = ctypes.create_unicode_buffer(MAX_PATH_CHARS)
+        if not kernel32.QueryFullProcessImageNameW(handle, 0, buf, ctypes.byref(size)):
+            return None
+        return os.path.basename(buf.value)
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+class WindowsProbe(Probe):
+    name = "windows"
+    default_exempt = ["vlc.exe", "chrome.exe", "msedge.exe", "QQMusic.exe", "xmp.exe", "哔哩哔哩.exe"]
+
+    def get_idle_duration(self):
+        """获取系统闲置时间（秒）"""
+        lii = LASTINPUTINFO()
+        lii.cbSize = ctypes.sizeof(LASTINPUTINFO)
+        if user32.GetLastInputInfo(ctypes.byref(lii)):
+            millis = kernel32.GetTickCount() - lii.dwTime
+            return millis / 1000.0
+        return 0
+
+    def get_active_window_info(self):
+        """获取当前活动窗口的 exe 名称和标题"""
+        try:
+            hwnd = user32.GetForegroundWindow()
+            if not hwnd:
+                return None, None
+
+            pid = wintypes.DWORD()
+            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+            exe_name = process_name(pid.value)
+            if exe_name is None:
+                return None, None
+            length = user32.GetWindowTextLengthW(hwnd)
+            buf = ctypes.create_unicode_buffer(length + 1)
+            user32.GetWindowTextW(hwnd, buf, length + 1)
+            title = buf.value
+
+            # 处理空标题的情况
+            if not title.strip():
+                title = "Unknown Title"
+
+            return exe_name, title
+        except Exception:
+            return None, None
+
+    def on_battery(self):
+        """ACLineStatus 为 0 表示使用电池（1 为接通电源，255 为未知）"""
+        status = SYSTEM_POWER_STATUS()
+        if not kernel32.GetSystemPowerStatus(ctypes.byref(status)):
+            return False
+        return status.ACLineStatus == 0
+
+    def open_folder(self, path):
+        os.startfile(path)
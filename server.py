@@ -1,23 +1,200 @@
 import http.server
 import socketserver
 import json
+import hashlib
+import hmac
+import ipaddress
 import os
 import re
 import sys
 import socket
 import logging
+import time
+import argparse
+import threading
 from urllib.parse import urlparse, parse_qs
 
+from utils import daybin
+from utils.aggregates import PERIODS, get_summary
+from utils.categories import CategoryRules
+from utils.config import read_config
+from utils.datastore import day_fingerprint
+from utils.focus import summarize as summarize_focus
+from utils.hosts import (
+    PayloadTooLarge, apply_ingest, empty_day, get_host_dir, iter_date_range, list_host_dates, list_hosts,
+    merged_day_fingerprint, read_merged_day, resolve_hosts, sum_days
+)
+from utils.metrics import Registry, read_textfile
+from utils.schema import SchemaError
+from utils.search import DEFAULT_LIMIT, SearchIndex
+from utils.tracker_metrics import metrics_file
+from utils.views import DayView, ViewCache, has_query, query_view
+
 PORT = 8000
+BIND_ADDRESS = "0.0.0.0"  # 默认允许局域网访问（多机汇总需要），只在本机使用时可用 --bind 127.0.0.1
 DIRECTORY = "."  # 将在 main 中更新为 Data 目录
 SCRIPT_DIR = None  # 将在 main 中设置
+MAX_INGEST_BYTES = 16 * 1024 * 1024  # 单次上报请求体上限
+MAX_RANGE_DAYS = 366  # /api/range 最多合并的天数
+_search_index = None  # 标题全文索引，第一次搜索时创建
+_category_rules = (None, None)  # (配置文件修改时间, 编译后的分类规则)，为没有分类统计的旧数据补算
+CONFIG_FILE_NAME = "statistics.configuration.json"
+
+# --- 连接与资源限制 ---
+SOCKET_TIMEOUT = 15.0  # 每个连接的读写超时（秒），半开连接不会一直占用处理线程
+MAX_CONNECTIONS = 32  # 同时处理的连接数上限，超出的连接在监听队列中等待
+QUEUE_TIMEOUT = 5.0  # 等待空闲处理线程的最长时间，超时返回 503
+REQUEST_QUEUE_SIZE = 64  # 监听队列长度
+MAX_RESPONSE_BYTES = 32 * 1024 * 1024  # 单个 JSON 响应上限，超出时返回 413 提示缩小查询
+RESPONSE_CHUNK_BYTES = 64 * 1024  # 已生成的响应体分块写出，每块单独受写超时限制（不是流式生成，不降低内存峰值）
+RATE_LIMIT_PER_SECOND = 20.0  # 每个客户端地址的平均请求速率，None 表示不限制
+RATE_LIMIT_BURST = 60  # 允许的突发请求数
+# 只提供这些静态文件，脚本目录中的其他文件（源码、配置、日志、数据）一律 404
+STATIC_FILES = ("/daily.html", "/weekly.html", "/statistics.ico")
+
+# --- 自监控指标 ---
+SERVER_METRICS = Registry()
+REQUEST_SECONDS = SERVER_METRICS.histogram(
+    "server_request_seconds", "HTTP request latency", ("route",))
+REQUESTS_TOTAL = SERVER_METRICS.counter(
+    "server_requests_total", "HTTP requests by route and status", ("route", "status"))
+VIEW_CACHE_HITS = SERVER_METRICS.counter(
+    "server_view_cache_hits_total", "Day view cache hits")
+VIEW_CACHE_MISSES = SERVER_METRICS.counter(
+    "server_view_cache_misses_total", "Day view cache misses")
+BINARY_DAY_READS = SERVER_METRICS.counter(
+    "server_binary_day_reads_total", "Day queries answered from binary day files")
+REJECTED_TOTAL = SERVER_METRICS.counter(
+    "server_rejected_total", "Connections or requests rejected by limits", ("reason",))
+VIEW_CACHE = ViewCache(hit_counter=VIEW_CACHE_HITS, miss_counter=VIEW_CACHE_MISSES)  # 每日数据的排序视图缓存
+
+
+class RateLimiter:
+    """按客户端地址的令牌桶限流"""
+
+    def __init__(self, rate, burst, max_clients=4096):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets = {}  # address -> [tokens, last_refill]
+
+    def allow(self, address):
+        """消耗一个令牌；令牌不足时返回需要等待的秒数，否则返回 0"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(address)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    # 丢弃已经回满的桶，它们与新建的桶等价
+                    self._buckets = {a: b for a, b in self._buckets.items()
+                                     if b[0] + (now - b[1]) * self.rate < self.burst}
+                bucket = self._buckets[address] = [self.burst, now]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                return (1 - bucket[0]) / self.rate
+            bucket[0] -= 1
+            return 0
+
+
+RATE_LIMITER = RateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST) if RATE_LIMIT_PER_SECOND else None
+
+
+class StatsServer(socketserver.ThreadingTCPServer):
+    """每个连接一个线程，同时处理的连接数不超过 MAX_CONNECTIONS
+
+    处理线程已满时接受循环最多等待 QUEUE_TIMEOUT 秒，其间新连接留在监听队列中；仍然没有空位则返回 503。
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+    def __init__(self, server_address, handler_class, max_connections=MAX_CONNECTIONS):
+        self._slots = threading.BoundedSemaphore(max_connections)
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(timeout=QUEUE_TIMEOUT):
+            REJECTED_TOTAL.labels("busy").inc()
+            try:
+                request.settimeout(1)
+                request.sendall(b"HTTP/1.0 503 Service Unavailable\r\nRetry-After: 1\r\n"
+                                b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+def get_data_dir():
+    """获取数据目录路径（使用 SCRIPT_DIR 或回退到 DIRECTORY）"""
+    if SCRIPT_DIR:
+        return os.path.join(SCRIPT_DIR, "Data")
+    return DIRECTORY
+
+
+def get_search_index():
+    global _search_index
+    if _search_index is None or _search_index.data_dir != get_data_dir():
+        _search_index = SearchIndex(get_data_dir())
+    return _search_index
+
+
+def config_path():
+    return os.path.join(SCRIPT_DIR or os.path.dirname(os.path.abspath(__file__)), CONFIG_FILE_NAME)
+
+
+def get_ingest_token():
+    """配置文件中的上报令牌 ingestToken，未配置时返回 None（此时只接受本机的上报）"""
+    token = read_config(config_path()).get("ingestToken")
+    return token if isinstance(token, str) and token else None
+
+
+def is_loopback(address):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    mapped = getattr(ip, "ipv4_mapped", None)
+    return (mapped or ip).is_loopback
+
+
+def get_category_rules():
+    """返回当前配置的分类规则，配置文件变化时重新编译"""
+    global _category_rules
+    path = config_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    cached_mtime, rules = _category_rules
+    if rules is None or cached_mtime != mtime:
+        rules = CategoryRules.from_config(read_config(path), log=logging.warning)
+        _category_rules = (mtime, rules)
+    return rules
+
 
 class StatsHandler(http.server.SimpleHTTPRequestHandler):
+    timeout = SOCKET_TIMEOUT  # StreamRequestHandler 会把它设置为连接的读写超时
+
     def end_headers(self):
         # 添加 CORS 头，允许跨域访问
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
         super().end_headers()
     
     def do_OPTIONS(self):
@@ -27,118 +204,303 @@ class StatsHandler(http.server.SimpleHTTPRequestHandler):
     
     def log_message(self, format, *args):
         logging.info("[%s] %s", self.address_string(), format % args)
-    
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def route_label(self):
+        """请求统计用的路由名（/api/data/YYYYMMDD 归为一类，静态文件归为 static）"""
+        path = urlparse(self.path).path
+        if path.startswith('/api/data/'):
+            return '/api/data'
+        if path.startswith('/api/focus/'):
+            return '/api/focus'
+        if path.startswith('/api/') or path == '/metrics':
+            return path
+        return 'static'
+
+    def timed(self, handler):
+        """执行请求处理并记录延迟和状态码"""
+        started = time.perf_counter()
+        self._status = 0
+        route = self.route_label()
+        try:
+            retry_after = RATE_LIMITER.allow(self.client_address[0]) if RATE_LIMITER else 0
+            if retry_after:
+                REJECTED_TOTAL.labels("rate_limited").inc()
+                self.send_response(429)
+                self.send_header('Retry-After', str(max(1, int(retry_after + 0.999))))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            handler()
+        finally:
+            REQUEST_SECONDS.labels(route).observe(time.perf_counter() - started)
+            REQUESTS_TOTAL.labels(route, str(self._status)).inc()
+
     def do_GET(self):
+        self.timed(self.handle_get)
+
+    def do_POST(self):
+        self.timed(self.handle_post)
+
+    def handle_metrics(self, query_params):
+        """API: Prometheus 文本格式的自监控指标（server 自身 + tracker 快照）"""
+        body = (SERVER_METRICS.render() + read_textfile(metrics_file(get_data_dir()))).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.write_body(body)
+
+    def write_body(self, body):
+        """分块写出已完整生成的响应体：每块受连接写超时限制，接收缓慢的客户端不会让一次写入无限阻塞。
+        响应体仍整体保存在内存中，峰值由 MAX_RESPONSE_BYTES 限制"""
+        view = memoryview(body)
+        for offset in range(0, len(view), RESPONSE_CHUNK_BYTES):
+            self.wfile.write(view[offset:offset + RESPONSE_CHUNK_BYTES])
+    
+    def send_json(self, status, obj, etag=False):
+        """发送 JSON 响应；etag=True 时附带 ETag，并对 If-None-Match 命中返回 304"""
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        if len(body) > MAX_RESPONSE_BYTES:
+            REJECTED_TOTAL.labels("too_large").inc()
+            status, etag = 413, False
+            body = json.dumps({"error": f"Response too large ({len(body)} bytes, max {MAX_RESPONSE_BYTES}). "
+                                        "Narrow the query with top_apps / top_titles / fields or a shorter range"}).encode('utf-8')
+        if etag:
+            tag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+            if self.headers.get('If-None-Match') == tag:
+                self.send_response(304)
+                self.send_header('ETag', tag)
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                return
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', tag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.write_body(body)
+
+    def handle_dates(self, query_params):
+        """API: 获取所有 .data.json 文件的日期列表（最近的日期在前）"""
+        hosts = resolve_hosts(get_data_dir(), query_params.get('host', [None])[0])
+        self.send_json(200, list_host_dates(get_data_dir(), hosts))
+
+    def handle_hosts(self, query_params):
+        """API: 获取所有主机名"""
+        self.send_json(200, list_hosts(get_data_dir()))
+
+    def day_view(self, date_str, query_params):
+        """按 ?host= 读取（并合并）某天的数据，返回缓存的排序视图；日期不存在时返回空数据的视图"""
+        data_dir = get_data_dir()
+        hosts = resolve_hosts(data_dir, query_params.get('host', [None])[0])
+        rules = get_category_rules()
+        # 先读月份目录中的散文件，已归档的月份从归档中随机读取；解析和排序结果按文件版本缓存
+        # （没有分类统计的旧数据在这里补算一次，分类规则变化时缓存随之失效）
+        view = VIEW_CACHE.get(
+            (tuple(hosts), date_str),
+            (merged_day_fingerprint(data_dir, hosts, date_str), rules.version),
+            lambda: read_merged_day(data_dir, hosts, date_str, rules)
+        )
+        if view is None:
+            # 日期不存在，返回空数据而不是错误
+            view = DayView(empty_day())
+        return view
+
+    def binary_day(self, date_str, query_params):
+        """只查询一个主机、且该天有与数据文件一致的二进制文件（见 utils/daybin.py）时返回打开的 BinaryDay，否则返回 None"""
+        data_dir = get_data_dir()
+        hosts = resolve_hosts(data_dir, query_params.get('host', [None])[0])
+        if len(hosts) != 1:
+            return None
+        fingerprint = day_fingerprint(get_host_dir(data_dir, hosts[0]), date_str)
+        if fingerprint is None:
+            return None
+        day = daybin.open_day(fingerprint)
+        # 没有分类统计的数据需要按当前规则补算，走 JSON 视图
+        if day is not None and "categories" not in day.data:
+            day.close()
+            return None
+        if day is not None:
+            BINARY_DAY_READS.inc()
+        return day
+
+    def handle_data(self, date_str, query_params):
+        """API: 获取指定日期的数据，?host= 可选择或合并多个主机"""
+        # 验证日期格式 (YYYYMMDD)
+        if not re.match(r'^\d{8}$', date_str):
+            self.send_json(400, {"error": "Invalid date format. Use YYYYMMDD"})
+            return
+        if has_query(query_params):
+            # 带筛选参数时优先直接在 mmap 的二进制文件上查询，不解析 JSON，也不占用视图缓存
+            day = self.binary_day(date_str, query_params)
+            if day is not None:
+                with day:
+                    result = query_view(day, query_params)
+                self.send_json(200, result, etag=True)
+                return
+        view = self.day_view(date_str, query_params)
+        if has_query(query_params):
+            self.send_json(200, query_view(view, query_params), etag=True)
+        else:
+            self.send_json(200, view.data, etag=True)
+
+    def handle_focus(self, date_str, query_params):
+        """API: 指定日期的专注统计（应用切换、连续使用段分布、各应用最长连续使用），?host= 同 /api/data/"""
+        if not re.match(r'^\d{8}$', date_str):
+            self.send_json(400, {"error": "Invalid date format. Use YYYYMMDD"})
+            return
+        day = self.binary_day(date_str, query_params)
+        if day is not None:
+            # 只解析 focus 和 timeline 两个字段
+            with day:
+                result = summarize_focus(day.data.get("focus"), day.data.get("timeline"))
+        else:
+            data = self.day_view(date_str, query_params).data
+            result = summarize_focus(data.get("focus"), data.get("timeline"))
+        self.send_json(200, result, etag=True)
+
+    def handle_search(self, query_params):
+        """API: 按窗口标题或应用名检索，?from=&to= 限定日期，?host= 同 /api/data/，?limit= 限定结果数"""
+        query = query_params.get('q', [''])[0].strip()
+        limit = query_params.get('limit', [str(DEFAULT_LIMIT)])[0]
+        if not limit.isdigit():
+            raise ValueError("'limit' must be a positive integer")
+        hosts = resolve_hosts(get_data_dir(), query_params.get('host', [None])[0])
+        index = get_search_index()
+        index.refresh()
+        self.send_json(200, index.search(
+            query,
+            query_params.get('from', [''])[0] or None,
+            query_params.get('to', [''])[0] or None,
+            hosts,
+            int(limit)
+        ), etag=True)
+
+    def handle_summary(self, query_params):
+        """API: 包含 date 的整周（周一至周日）或整月的物化汇总，?host= 同 /api/data/"""
+        period = query_params.get('period', ['week'])[0]
+        date_str = query_params.get('date', [''])[0]
+        if period not in PERIODS:
+            self.send_json(400, {"error": f"Invalid period. Use {' or '.join(PERIODS)}"})
+            return
+        if not re.match(r'^\d{8}$', date_str):
+            self.send_json(400, {"error": "Invalid date format. Use date=YYYYMMDD"})
+            return
+        hosts = resolve_hosts(get_data_dir(), query_params.get('host', [None])[0])
+        self.send_json(200, get_summary(get_data_dir(), hosts, period, date_str, get_category_rules()), etag=True)
+
+    def handle_range(self, query_params):
+        """API: 合并 [from, to] 区间内的数据，?host= 可选择或合并多个主机"""
+        from_str = query_params.get('from', [''])[0]
+        to_str = query_params.get('to', [''])[0]
+        if not (re.match(r'^\d{8}$', from_str) and re.match(r'^\d{8}$', to_str)):
+            self.send_json(400, {"error": "Invalid date format. Use from=YYYYMMDD&to=YYYYMMDD"})
+            return
+        hosts = resolve_hosts(get_data_dir(), query_params.get('host', [None])[0])
+        rules = get_category_rules()
+        days = []
+        found = []
+        for date_str in iter_date_range(from_str, to_str, MAX_RANGE_DAYS):
+            day = read_merged_day(get_data_dir(), hosts, date_str, rules)
+            if day is not None:
+                days.append(day)
+                found.append(date_str)
+        self.send_json(200, {"from": from_str, "to": to_str, "hosts": hosts, "dates": found, "data": sum_days(days)}, etag=True)
+
+    def handle_post(self):
+        try:
+            path = urlparse(self.path).path
+            if path != '/api/ingest':
+                self.send_json(404, {"error": "Not found"})
+                return
+            # API: 接收远端 tracker 上报的（压缩）每日数据
+            # 配置了 ingestToken 时要求 Authorization: Bearer <令牌>，否则只接受本机的上报
+            token = get_ingest_token()
+            if token is not None:
+                supplied = self.headers.get('Authorization', '')
+                if not hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {token}".encode('utf-8')):
+                    self.send_json(401, {"error": "Missing or invalid ingest token"})
+                    return
+            elif not is_loopback(self.client_address[0]):
+                self.send_json(403, {"error": "Set ingestToken in the server configuration to accept remote ingest"})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                self.send_json(400, {"error": "Invalid Content-Length"})
+                return
+            if length <= 0 or length > MAX_INGEST_BYTES:
+                self.send_json(413 if length > 0 else 400, {"error": f"Body must be 1..{MAX_INGEST_BYTES} bytes"})
+                return
+            body = self.rfile.read(length)
+            try:
+                result = apply_ingest(get_data_dir(), body, self.headers.get('Content-Encoding'))
+            except PayloadTooLarge as e:
+                REJECTED_TOTAL.labels("too_large").inc()
+                self.send_json(413, {"error": str(e)})
+                return
+            except (ValueError, OSError, EOFError) as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            logging.info("Ingested %s day(s) from %s, %s written", result["received"], result["host"], len(result["written"]))
+            self.send_json(200, result)
+        except Exception as e:
+            logging.exception("Unexpected error in do_POST")
+            self.send_json(500, {"error": str(e)})
+
+    def handle_get(self):
         try:
             # 解析路径和查询参数
             parsed_path = urlparse(self.path)
             path = parsed_path.path
             query_params = parse_qs(parsed_path.query)
-            
-            # API: 获取所有 .data.json 文件的日期列表
-            if path == '/api/dates':
+
+            api_routes = {
+                '/api/dates': self.handle_dates,
+                '/api/hosts': self.handle_hosts,
+                '/api/range': self.handle_range,
+                '/api/search': self.handle_search,
+                '/api/summary': self.handle_summary,
+                '/metrics': self.handle_metrics,
+            }
+            if path in api_routes or path.startswith(('/api/data/', '/api/focus/')):
                 try:
-                    # 获取数据目录路径（使用 SCRIPT_DIR 或回退到 DIRECTORY）
-                    if SCRIPT_DIR:
-                        data_dir = os.path.join(SCRIPT_DIR, "Data")
+                    if path.startswith('/api/data/'):
+                        self.handle_data(path.replace('/api/data/', '').rstrip('/'), query_params)
+                    elif path.startswith('/api/focus/'):
+                        self.handle_focus(path.replace('/api/focus/', '').rstrip('/'), query_params)
                     else:
-                        data_dir = DIRECTORY
-                    
-                    # 查找所有 YYYY.mm 格式的子目录中的 .data.json 文件
-                    dates = []
-                    if os.path.exists(data_dir):
-                        # 遍历 Data 目录下的所有子目录
-                        for item in os.listdir(data_dir):
-                            item_path = os.path.join(data_dir, item)
-                            # 只处理目录，且目录名符合 YYYY.mm 格式
-                            if os.path.isdir(item_path) and re.match(r'^\d{4}\.\d{2}$', item):
-                                # 在该子目录中查找 .data.json 文件
-                                try:
-                                    for f in os.listdir(item_path):
-                                        if f.endswith('.data.json'):
-                                            m = re.match(r"(\d{8})\.data\.json", f)
-                                            if m:
-                                                dates.append(m.group(1))
-                                except Exception as e:
-                                    # 如果某个子目录无法访问，跳过
-                                    logging.warning("Error accessing %s: %s", item_path, e)
-                                    continue
-                    dates.sort(reverse=True) # 最近的日期在前
-                    
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json; charset=utf-8')
-                    self.end_headers()
-                    self.wfile.write(json.dumps(dates, ensure_ascii=False).encode('utf-8'))
-                    return
+                        api_routes[path](query_params)
+                except (json.JSONDecodeError, SchemaError) as e:
+                    logging.exception("Error parsing data in %s", path)
+                    self.send_json(500, {"error": str(e)})
+                except ValueError as e:
+                    self.send_json(400, {"error": str(e)})
                 except Exception as e:
-                    logging.exception("Error in /api/dates")
-                    self.send_response(500)
-                    self.send_header('Content-type', 'application/json; charset=utf-8')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": str(e)}, ensure_ascii=False).encode('utf-8'))
-                    return
-            
-            # API: 获取指定日期的数据
-            elif path.startswith('/api/data/'):
-                date_str = path.replace('/api/data/', '').rstrip('/')
-                # 验证日期格式 (YYYYMMDD)
-                if not re.match(r'^\d{8}$', date_str):
-                    self.send_response(400)
-                    self.send_header('Content-type', 'application/json; charset=utf-8')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Invalid date format. Use YYYYMMDD"}, ensure_ascii=False).encode('utf-8'))
-                    return
-                
-                # 获取数据目录路径（使用 SCRIPT_DIR 或回退到 DIRECTORY）
-                if SCRIPT_DIR:
-                    data_dir = os.path.join(SCRIPT_DIR, "Data")
-                else:
-                    data_dir = DIRECTORY
-                
-                # 根据日期计算目录路径：YYYYMMDD -> YYYY.mm
-                year = date_str[:4]
-                month = date_str[4:6]
-                subdir = f"{year}.{month}"
-                file_path = os.path.join(data_dir, subdir, f"{date_str}.data.json")
-                
-                if os.path.exists(file_path):
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        self.send_response(200)
-                        self.send_header('Content-type', 'application/json; charset=utf-8')
-                        self.end_headers()
-                        self.wfile.write(json.dumps(data, ensure_ascii=False).encode('utf-8'))
-                        return
-                    except Exception as e:
-                        logging.exception("Error reading %s", file_path)
-                        self.send_response(500)
-                        self.send_header('Content-type', 'application/json; charset=utf-8')
-                        self.end_headers()
-                        self.wfile.write(json.dumps({"error": str(e)}, ensure_ascii=False).encode('utf-8'))
-                        return
-                else:
-                    # 日期不存在，返回空数据而不是错误
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json; charset=utf-8')
-                    self.end_headers()
-                    empty_data = {"sessions": [], "idle_seconds": 0, "apps": {}}
-                    self.wfile.write(json.dumps(empty_data, ensure_ascii=False).encode('utf-8'))
-                    return
-            
+                    logging.exception("Error in %s", path)
+                    self.send_json(500, {"error": str(e)})
+                return
+
             # 阻止直接访问 .data.json 文件
             if path.endswith('.data.json'):
-                self.send_response(403)
-                self.send_header('Content-type', 'application/json; charset=utf-8')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": "直接访问数据文件已被禁用，请使用 /api/data/YYYYMMDD 接口"}, ensure_ascii=False).encode('utf-8'))
+                self.send_json(403, {"error": "直接访问数据文件已被禁用，请使用 /api/data/YYYYMMDD 接口"})
                 return
-            
-            # 默认行为：提供静态文件 (HTML, JSON)
+
+            # 默认行为：只提供白名单中的静态页面
             # 处理根路径，重定向到 daily.html
             if path == '/' or path == '/index.html':
-                self.path = '/daily.html'
-            
+                path = '/daily.html'
+            if path not in STATIC_FILES:
+                self.send_json(404, {"error": "Not found"})
+                return
+            self.path = path
+
             # 调用父类方法处理静态文件
             super().do_GET()
             
@@ -149,6 +511,16 @@ class StatsHandler(http.server.SimpleHTTPRequestHandler):
             self.wfile.write(f"Internal Server Error: {str(e)}".encode('utf-8'))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="应用程序使用统计 - Web 服务器")
+    parser.add_argument("--bind", default=BIND_ADDRESS, help=f"监听地址（默认 {BIND_ADDRESS}，仅本机访问用 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS, help="同时处理的连接数上限")
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT_PER_SECOND,
+                        help="每个客户端地址每秒的平均请求数，0 表示不限制")
+    args = parser.parse_args()
+    PORT = args.port
+    RATE_LIMITER = RateLimiter(args.rate_limit, max(RATE_LIMIT_BURST, args.rate_limit)) if args.rate_limit > 0 else None
+
     # 切换到脚本所在目录
     script_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(script_dir)
@@ -166,24 +538,33 @@ if __name__ == "__main__":
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
     
-    # 允许复用端口，防止重启时报错
-    socketserver.TCPServer.allow_reuse_address = True
-    
     try:
-        # 使用 0.0.0.0 绑定所有网络接口，这样可以从局域网访问
-        with socketserver.TCPServer(("0.0.0.0", PORT), StatsHandler) as httpd:
+        # 默认绑定 0.0.0.0 所有网络接口，这样可以从局域网访问
+        with StatsServer((args.bind, PORT), StatsHandler, args.max_connections) as httpd:
             host = "localhost"
             logging.info("%s", "=" * 60)
             logging.info("服务器已启动！")
             logging.info("本地访问: http://localhost:%s", PORT)
             logging.info("      或: http://127.0.0.1:%s", PORT)
-            logging.info("局域网访问: http://%s:%s", socket.gethostbyname(socket.gethostname()), PORT)
+            if args.bind not in ("127.0.0.1", "localhost", "::1"):
+                logging.info("局域网访问: http://%s:%s", socket.gethostbyname(socket.gethostname()), PORT)
+            logging.info("连接上限 %s，读写超时 %ss，限流 %s 次/秒/地址", args.max_connections, SOCKET_TIMEOUT,
+                         args.rate_limit if args.rate_limit > 0 else "-")
             logging.info("访问页面:")
             logging.info("  - http://localhost:%s/daily.html", PORT)
-            logging.info("  - http://localhost:%s/week.html", PORT)
+            logging.info("  - http://localhost:%s/weekly.html", PORT)
             logging.info("API 接口:")
             logging.info("  - http://localhost:%s/api/dates", PORT)
-            logging.info("  - http://localhost:%s/api/data/YYYYMMDD", PORT)
+            logging.info("  - http://localhost:%s/api/data/YYYYMMDD[?host=NAME|all]", PORT)
+            logging.info("      筛选参数: top_apps, top_titles, app, min_seconds, fields")
+            logging.info("  - http://localhost:%s/api/focus/YYYYMMDD[?host=NAME|all]", PORT)
+            logging.info("  - http://localhost:%s/api/range?from=YYYYMMDD&to=YYYYMMDD[&host=NAME|all]", PORT)
+            logging.info("  - http://localhost:%s/api/summary?period=week|month&date=YYYYMMDD[&host=NAME|all]", PORT)
+            logging.info("  - http://localhost:%s/api/search?q=TEXT[&from=YYYYMMDD&to=YYYYMMDD&host=NAME|all&limit=N]", PORT)
+            logging.info("  - http://localhost:%s/api/hosts", PORT)
+            logging.info("  - http://localhost:%s/metrics", PORT)
+            logging.info("  - POST http://localhost:%s/api/ingest（%s）", PORT,
+                         "需要 ingestToken 令牌" if get_ingest_token() else "未配置 ingestToken，只接受本机上报")
             logging.info("%s", "=" * 60)
             httpd.serve_forever()
     except OSError as e:
@@ -0,0 +1,834 @@
+import os
+import sys
+import math
+import time
+import argparse
+import threading
+import datetime
+import atexit
+import importlib.util
+from collections import deque
+
+from probes import BACKENDS, create_probe
+from utils.archive import retention_days, start_background_archiver
+from utils.config import read_config as read_config_file
+from utils.hosts import LOCAL_HOST
+from utils import tracker_metrics as metrics
+from utils import idle_rules
+from utils import sampling
+from utils import tray
+from utils import aggregates
+from utils import schema
+from utils import search
+from utils import timeline
+from utils import focus
+from utils import categories
+from utils import report
+from utils import daybin
+from utils import journal as wal
+from utils.ranking import TopCounter
+
+# 托盘依赖可选：缺少时以无托盘方式运行。这里只检查是否已安装，真正显示托盘时才导入 pystray / PIL，
+# 保持无界面运行时的启动速度和内存占用
+TRAY_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ("pystray", "PIL"))
+STATUS_MIN_INTERVAL = 10.0  # 状态文件最短写出间隔（真实时间）
+QUICK_STATS_REFRESH = 5.0  # 托盘快速统计的刷新间隔（真实时间）
+QUICK_STATS_TOP_APPS = 5
+POWER_CHECK_INTERVAL = 60.0  # 供电状态的检查间隔（真实时间）
+
+# --- 配置路径 ---
+# BASE_DIR 设置为脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "Data")
+CONFIG_FILE = os.path.join(BASE_DIR, "statistics.configuration.json")
+
+# --- 全局变量 ---
+running = True
+probe = None  # 平台探测后端，见 probes/
+current_date_str = datetime.datetime.now().strftime("%Y%m%d")
+data_lock = threading.Lock()
+is_idle_status = False  # 记录当前是否处于闲置状态
+
+tray_icon = None  # 进程内托盘图标（--no-tray 或托盘客户端模式下为 None）
+last_status_write = None
+
+# 闲置判定：编译后的规则（配置文件变化时重新加载）与滞回状态机
+idle_config = None
+idle_config_mtime = None
+idle_detector = idle_rules.IdleDetector()
+sampler = sampling.AdaptiveSampler()  # 自适应采样间隔，见 utils/sampling.py
+power_state = None  # (检查时间, 是否使用电池)
+category_rules = None  # 编译后的分类规则，见 utils/categories.py
+category_config_mtime = None
+# 最近每秒记入应用的 (app, title, 时段桶)，进入闲置时把阈值内无输入的时长追溯改记为闲置；None 表示未记入或白名单
+recent_active = deque(maxlen=idle_rules.DEFAULT_IDLE_THRESHOLD + 1)
+# 闲置中检测到输入、等待确认退出期间记入闲置的采样 (app, title, 时段桶)，确认退出后改记为使用；
+# app 为 None 表示该秒没有可记入的窗口
+pending_idle = []
+last_active_app = None  # 上一次记入使用的前台应用，用于统计应用切换次数
+focus_run = None  # 尚未结束的连续使用段 [app, 开始时间戳, 秒数]，结束时计入 stats_data["focus"]
+last_window = None  # 上一次采样记入的前台窗口 (app, title)，采样间隔拉长期间切换窗口时用于拆分记账
+journal = None  # 预写日志，见 utils/journal.py；recover_journal() 之后打开
+binary_day_files = True  # 保存时是否同时写出二进制每日数据，见 utils/daybin.py
+
+
+def new_day_data():
+    """空的一天数据；时段桶大小取自配置，之后直到跨天都不变"""
+    return {
+        "sessions": [],  # 记录 [{"start": "...", "end": "..."}, ...]
+        "idle_seconds": 0,
+        "apps": {},  # { "exe_name": { "total": 0, "titles": { "title_name": seconds } } }
+        "timeline": timeline.empty_timeline(load_timeline_bucket_minutes()),  # 按时段的统计，见 utils/timeline.py
+        "focus": focus.empty_focus(),  # 连续使用段的统计，见 utils/focus.py
+        "categories": {}  # 各分类的使用时长，见 utils/categories.py
+    }
+
+# 数据结构初始化（导入时不读取配置，load_data 时再按配置的时段桶大小重建）
+stats_data = {
+    "sessions": [],
+    "idle_seconds": 0,
+    "apps": {},
+    "timeline": timeline.empty_timeline(),
+    "focus": focus.empty_focus(),
+    "categories": {}
+}
+
+# 当前Session开始时间
+current_session_start = time.time()
+
+# 今日使用总时长与前几名应用，随记账增量更新（托盘快速统计用，见 quick_stats()）
+app_ranking = TopCounter(lambda: ((name, info["total"]) for name, info in stats_data["apps"].items()),
+                         k=QUICK_STATS_TOP_APPS)
+quick_stats_cache = None
+
+
+def now():
+    """当前时间戳；回放时为虚拟时间"""
+    return probe.now() if probe else time.time()
+
+
+def format_timestamp(ts):
+    return datetime.datetime.fromtimestamp(ts).strftime(schema.TIMESTAMP_FORMAT)
+
+
+def configure(probe_backend, data_dir=None):
+    """设置探测后端和数据目录，并按探测后端的时钟初始化日期和 session"""
+    global probe, DATA_DIR, current_date_str, current_session_start
+    probe = probe_backend
+    if data_dir:
+        DATA_DIR = data_dir
+    os.makedirs(DATA_DIR, exist_ok=True)
+    current_session_start = now()
+    current_date_str = datetime.datetime.fromtimestamp(current_session_start).strftime("%Y%m%d")
+
+# --- 日志与文件操作 ---
+
+
+def get_file_paths(date_str=None):
+    if not date_str:
+        date_str = current_date_str
+
+    # 根据日期计算子目录：YYYYMMDD -> YYYY.mm
+    year = date_str[:4]
+    month = date_str[4:6]
+    subdir = f"{year}.{month}"
+    subdir_path = os.path.join(DATA_DIR, subdir)
+
+    # 确保子目录存在
+    if not os.path.exists(subdir_path):
+        os.makedirs(subdir_path)
+
+    return {
+        "json": os.path.join(subdir_path, f"{date_str}.data.json"),
+        "bin": os.path.join(subdir_path, f"{date_str}{daybin.BINARY_SUFFIX}"),
+        "report": os.path.join(subdir_path, f"{date_str}.report.txt"),
+        "log": os.path.join(subdir_path, f"{date_str}.log.txt")
+    }
+
+
+def write_log(message):
+    """写入日志"""
+    paths = get_file_paths()
+    timestamp = format_timestamp(now())
+    try:
+        with open(paths["log"], "a", encoding="utf-8") as f:
+            f.write(f"[{timestamp}] {message}\n")
+    except OSError:
+        # 例如磁盘已满（保存失败时正要记录原因）；日志写不进去不能让采样线程退出
+        pass
+
+
+def read_config():
+    """读取配置文件，不存在或解析失败时返回空配置"""
+    return read_config_file(CONFIG_FILE)
+
+
+def load_idle_rules():
+    """配置文件有变化时重新编译闲置规则，并重新读取采样间隔等配置（启动时及每次自动保存时检查）"""
+    global idle_config, idle_config_mtime, idle_detector, sampler, recent_active, binary_day_files
+    try:
+        mtime = os.path.getmtime(CONFIG_FILE)
+    except OSError:
+        mtime = None
+    if idle_config is not None and mtime == idle_config_mtime:
+        return
+    config = read_config()
+    # 格式不正确的配置项和规则被跳过（使用默认值）并写入日志，不影响其余配置
+    idle_config = idle_rules.IdleRules.from_config(
+        config, probe.default_exempt, fuzzy_apps=probe.fuzzy_app_match, log=write_log)
+    idle_config_mtime = mtime
+
+    detector = idle_rules.IdleDetector.from_config(config, log=write_log)
+    detector.idle = idle_detector.idle
+    detector.last_idle_duration = idle_detector.last_idle_duration
+    idle_detector = detector
+
+    adaptive = sampling.AdaptiveSampler.from_config(config, log=write_log)
+    adaptive.interval, adaptive.window, adaptive.window_since = sampler.interval, sampler.window, sampler.window_since
+    sampler = adaptive
+    binary_day_files = bool(config.get("binaryDayFiles", True))
+
+    maxlen = int(min(idle_config.max_threshold, 3600)) + 1
+    if recent_active.maxlen != maxlen:
+        with data_lock:
+            recent_active = deque(recent_active, maxlen=maxlen)
+
+
+def load_category_rules():
+    """配置文件有变化时重新编译分类规则，并按新规则重算当天的分类统计（启动时及每次自动保存时检查）"""
+    global category_rules, category_config_mtime
+    try:
+        mtime = os.path.getmtime(CONFIG_FILE)
+    except OSError:
+        mtime = None
+    if category_rules is not None and mtime == category_config_mtime:
+        return
+    rules = categories.CategoryRules.from_config(read_config(), fuzzy_apps=probe.fuzzy_app_match, log=write_log)
+    category_config_mtime = mtime
+    with data_lock:
+        category_rules = rules
+        stats_data["categories"] = rules.categorize(stats_data)
+
+
+def load_archive_retention_days():
+    """读取归档保留天数配置"""
+    return retention_days(read_config())
+
+
+def load_timeline_bucket_minutes():
+    """读取时段桶大小配置（分钟，须能整除 1440）"""
+    minutes = read_config().get("timelineBucketMinutes", timeline.DEFAULT_BUCKET_MINUTES)
+    return minutes if timeline.valid_bucket_minutes(minutes) else timeline.DEFAULT_BUCKET_MINUTES
+
+
+def load_data():
+    """程序启动时读取当天的JSON数据；返回快照对应的日志段号（没有时为 None）"""
+    global stats_data
+    paths = get_file_paths()
+    load_category_rules()
+    # 旧版本文件在这里迁移为当前格式；损坏的文件被隔离，当天从空数据开始
+    data = schema.load_day_file(paths["json"], log=write_log)
+    if data is not None:
+        data.pop(schema.SCHEMA_KEY)
+        snapshot_segment = data.pop(wal.SNAPSHOT_KEY, None)
+        # 没有时段统计的旧文件从现在开始记录；已有的沿用文件中的桶大小
+        if not timeline.is_timeline(data.get("timeline")):
+            data["timeline"] = timeline.empty_timeline(load_timeline_bucket_minutes())
+        if not focus.is_focus(data.get("focus")):
+            data["focus"] = focus.empty_focus()
+        # 分类统计沿用文件中的结果；旧文件或文件保存之后分类规则有变化时按当前规则重算
+        try:
+            rules_changed = category_config_mtime is not None and category_config_mtime > os.path.getmtime(paths["json"])
+        except OSError:
+            rules_changed = True
+        if rules_changed or not categories.is_categories(data.get("categories")):
+            data["categories"] = category_rules.categorize(data)
+        stats_data = data
+    else:
+        snapshot_segment = None
+        stats_data = new_day_data()
+    app_ranking.reset()
+    return snapshot_segment
+
+
+def recover_journal(snapshot_segment):
+    """重放上次异常退出时留下的预写日志，然后打开新的日志段（启动时在 load_data 之后调用）
+
+    当天的日志段在刚读取的快照上重放（只重放快照之后的段）；其他日期的（例如零点前崩溃、次日才启动）
+    直接写回那一天的数据文件。耗时只与日志长度（最后一次快照之后的采样数）有关。
+    """
+    global journal
+    directory = wal.journal_dir(DATA_DIR)
+    by_date = wal.pending_segments(directory)
+    last_segment = max([snapshot_segment or 0] + [s for segments in by_date.values() for s, _, _ in segments])
+    for date_str, segments in sorted(by_date.items()):
+        if date_str == current_date_str:
+            tail = [(header, records) for s, header, records in segments
+                    if snapshot_segment is None or s >= snapshot_segment]
+            if any(records for _, records in tail):
+                with data_lock:
+                    wal.replay(stats_data, tail, format_timestamp)
+                    app_ranking.reset()
+                write_log(f"Recovered {sum(len(r) for _, r in tail)} journal record(s) after unclean shutdown")
+        else:
+            recover_other_day(date_str, segments, last_segment + 1)
+
+    with data_lock:
+        journal = wal.Journal(directory)
+        journal.open(last_segment + 1, current_date_str, current_session_start)
+    if by_date:
+        # 立即保存：新快照之前的日志段随后被删除
+        save_data()
+
+
+def recover_other_day(date_str, segments, next_segment):
+    """把其他日期的日志段重放到那一天的数据文件"""
+    path = get_file_paths(date_str)["json"]
+    data = schema.load_day_file(path, log=write_log)
+    if data is None:
+        data = new_day_data()
+        snapshot_segment = None
+    else:
+        snapshot_segment = data.pop(wal.SNAPSHOT_KEY, None)
+        if not timeline.is_timeline(data.get("timeline")):
+            data["timeline"] = timeline.empty_timeline(load_timeline_bucket_minutes())
+        if not focus.is_focus(data.get("focus")):
+            data["focus"] = focus.empty_focus()
+        categories.ensure_categories(data, category_rules)
+    tail = [(header, records) for s, header, records in segments
+            if snapshot_segment is None or s >= snapshot_segment]
+    if not any(records for _, records in tail):
+        return
+    wal.replay(data, tail, format_timestamp)
+    # 记录已重放到的段号，重放中途再次崩溃时不会重复计入
+    data[wal.SNAPSHOT_KEY] = next_segment
+    try:
+        schema.write_atomic(path, schema.encode_day(data))
+        write_log(f"Recovered {sum(len(r) for _, r in tail)} journal record(s) into {date_str}")
+    except Exception as e:
+        write_log(f"Journal recovery for {date_str} failed: {e}")
+
+
+def save_data():
+    """保存数据到JSON，成功时返回 True"""
+    paths = get_file_paths()
+    save_started = time.perf_counter()
+    with data_lock:
+        lock_acquired = time.perf_counter()
+        # 更新当前session的结束时间为当前时间
+        # 转换为可读的日期时间字符串格式
+        current_session_entry = {
+            "start": format_timestamp(current_session_start),
+            "end": format_timestamp(now())
+        }
+
+        # 复制一份数据用于保存，避免修改原始结构（load_data 已把旧格式迁移为当前版本）
+        data_to_save = {schema.SCHEMA_KEY: schema.SCHEMA_VERSION, **stats_data}
+        data_to_save["sessions"] = stats_data["sessions"] + [current_session_entry]
+        if focus_run:
+            data_to_save["focus"] = focus.with_open_run(
+                stats_data["focus"], focus_run[0], focus_run[2], format_timestamp(focus_run[1]))
+        # 之后的记账写入新的日志段，快照记录从哪一段开始重放
+        segment = None
+        if journal is not None and journal.segment is not None:
+            segment = journal.rotate(current_date_str, current_session_start, stats_data["focus"], focus_run)
+            data_to_save[wal.SNAPSHOT_KEY] = segment
+
+        try:
+            content = schema.encode_day(data_to_save)
+        except Exception as e:
+            content = None
+            write_log(f"Save failed: {e}")
+        metrics.lock_hold_seconds.observe(time.perf_counter() - lock_acquired)
+
+    saved = False
+    if content is not None:
+        try:
+            schema.write_atomic(paths["json"], content)
+            metrics.snapshot_bytes.inc(len(content))
+            metrics.snapshot_last_bytes.set(len(content))
+            saved = True
+        except Exception as e:
+            write_log(f"Save failed: {e}")
+    if saved and segment is not None:
+        with data_lock:
+            journal.commit(segment)
+    if saved and binary_day_files:
+        # 二进制副本从刚写出的 JSON 内容生成，不占用 data_lock
+        try:
+            daybin.write(paths["bin"], daybin.encode(schema.loads(content)), paths["json"])
+        except (OSError, ValueError) as e:
+            # 例如 Windows 上 server 正好映射着旧文件；server 发现版本不一致时回退到 JSON，下次保存再写
+            write_log(f"Binary day file not written: {e}")
+    metrics.snapshot_seconds.observe(time.perf_counter() - save_started)
+    metrics.write_snapshot(DATA_DIR)
+    return saved
+
+
+def generate_report():
+    """生成汇总报告"""
+    paths = get_file_paths()
+
+    # 整合当前 session，转换为时间戳用于计算
+    all_sessions_ts = report.session_timestamps(stats_data)
+
+    # 添加当前正在进行的 session
+    all_sessions_ts.append([current_session_start, now()])
+
+    day_focus = stats_data.get("focus")
+    if focus_run:
+        day_focus = focus.with_open_run(day_focus, focus_run[0], focus_run[2], format_timestamp(focus_run[1]))
+
+    text = report.render(stats_data, all_sessions_ts, day_focus, format_timestamp)
+    if text is None:
+        return
+    try:
+        with open(paths["report"], "w", encoding="utf-8") as f:
+            f.write(text)
+    except Exception as e:
+        write_log(f"Error generating report: {e}")
+
+# --- 核心监控逻辑 ---
+
+
+def credit_idle(seconds, bucket):
+    """累计闲置时长到当天和所在时段（调用方持有 data_lock）"""
+    stats_data["idle_seconds"] += seconds
+    timeline.add_idle(stats_data["timeline"], bucket, seconds)
+    if journal is not None:
+        journal.record(("i", seconds, bucket))
+
+
+def credit_active(app_name, title, seconds, bucket):
+    """累计应用/标题的使用时长到当天和所在时段（调用方持有 data_lock）"""
+    if app_name not in stats_data["apps"]:
+        stats_data["apps"][app_name] = {"total": 0, "titles": {}}
+
+    if title not in stats_data["apps"][app_name]["titles"]:
+        stats_data["apps"][app_name]["titles"][title] = 0
+
+    stats_data["apps"][app_name]["titles"][title] += seconds
+    stats_data["apps"][app_name]["total"] += seconds
+    app_ranking.add(app_name, seconds, stats_data["apps"][app_name]["total"])
+    timeline.add_active(stats_data["timeline"], bucket, app_name, seconds)
+    category = category_rules.category(app_name, title)
+    categories.add(stats_data["categories"], category, seconds)
+    if journal is not None:
+        journal.record(("a", app_name, title, seconds, bucket, category))
+
+
+def uncredit_active(app_name, title, seconds, bucket):
+    """撤销已记入应用/标题的时长（调用方持有 data_lock）"""
+    app = stats_data["apps"].get(app_name)
+    if app is None or title not in app["titles"]:
+        return
+    seconds = min(seconds, app["titles"][title])
+    category = category_rules.category(app_name, title)
+    if journal is not None:
+        journal.record(("u", app_name, title, seconds, bucket, category))
+    app["titles"][title] -= seconds
+    app["total"] -= seconds
+    app_ranking.add(app_name, -seconds, app["total"])
+    timeline.remove_active(stats_data["timeline"], bucket, app_name, seconds)
+    categories.add(stats_data["categories"], category, -seconds)
+    if app["titles"][title] <= 0:
+        del app["titles"][title]
+    if not app["titles"]:
+        del stats_data["apps"][app_name]
+
+
+def rollover(now_date):
+    """跨天：保存旧一天的数据和报告，清空内存数据开始新的一天"""
+    global current_date_str, current_session_start, stats_data
+    # 跨越零点的连续使用段在旧的一天结束
+    with data_lock:
+        end_run()
+    save_data()
+    generate_report()
+    # 重置
+    closed_date = current_date_str
+    current_date_str = now_date
+    new_data = new_day_data()
+    session_start = now()
+    with data_lock:
+        stats_data = new_data
+        app_ranking.reset()
+        # 新的一天还没有快照，崩溃后重放这一天的全部日志段
+        if journal is not None and journal.segment is not None:
+            journal.open(journal.segment + 1, now_date, session_start)
+    # 追溯记录只针对当天的数据
+    recent_active.clear()
+    pending_idle.clear()
+    # 更新全局session start，防止跨天统计混乱
+    current_session_start = session_start
+    write_log(f"Date changed to {now_date}, resetting stats.")
+    # 后台归档超过保留期的月份目录
+    start_background_archiver(DATA_DIR, load_archive_retention_days(),
+                              today=datetime.date.fromtimestamp(now()), log=write_log)
+    # 后台增量更新标题检索索引（旧的一天的数据已在上面保存）
+    search.start_background_indexer(DATA_DIR, log=write_log)
+    # 物化刚结束的一天所在的周和月的汇总（周期结束时即为最终结果）
+    aggregates.start_background_update(DATA_DIR, [LOCAL_HOST], closed_date, log=write_log,
+                                       category_rules=category_rules)
+
+
+def count_switch(app_name, bucket):
+    """前台应用与上一次记入使用的应用不同时计一次切换（调用方持有 data_lock）"""
+    global last_active_app
+    if last_active_app is not None and app_name != last_active_app:
+        timeline.add_switch(stats_data["timeline"], bucket)
+        if journal is not None:
+            journal.record(("s", bucket))
+    last_active_app = app_name
+
+
+def extend_run(app_name, ts, seconds=1):
+    """截至 ts 的 seconds 秒记入了 app_name：延续同一应用的连续使用段，否则结束上一段并开始新的一段（调用方持有 data_lock）"""
+    global focus_run
+    if focus_run and focus_run[0] == app_name:
+        focus_run[2] += seconds
+        return
+    end_run()
+    focus_run = [app_name, ts - seconds + 1, seconds]
+
+
+def end_run(trim=0):
+    """结束当前连续使用段；trim 为末尾被追溯改记为闲置的秒数（调用方持有 data_lock）"""
+    global focus_run
+    if focus_run is None:
+        return
+    app_name, start_ts, seconds = focus_run
+    focus_run = None
+    seconds -= min(trim, seconds)
+    start = format_timestamp(start_ts)
+    focus.record_run(stats_data["focus"], app_name, seconds, start)
+    if journal is not None:
+        journal.record(("r", app_name, seconds, start))
+
+
+def credit_window(app_name, title, threshold, end_ts, spans):
+    """把 spans [(桶, 秒数), ...]（截至 end_ts）记入前台窗口；没有可记入的窗口时结束连续使用段（调用方持有 data_lock）"""
+    seconds = sum(n for _, n in spans)
+    if app_name and title:
+        for bucket, n in spans:
+            credit_active(app_name, title, n, bucket)
+            # 逐秒保留，进入闲置时按闲置时长精确追溯
+            entry = (app_name, title, bucket) if threshold != idle_rules.NEVER_IDLE else None
+            recent_active.extend([entry] * n)
+        count_switch(app_name, spans[0][0])
+        extend_run(app_name, end_ts, seconds)
+    else:
+        recent_active.extend([None] * seconds)
+        end_run()
+
+
+def process_sample(idle_duration, app_name, title, seconds=1):
+    """按一次采样结果记账，seconds 为距上一次采样经过的秒数（采样间隔拉长时大于 1）；返回闲置状态机的结果"""
+    global is_idle_status, last_window
+
+    # 判定逻辑：
+    # 1. 按当前窗口的规则取闲置阈值（白名单应用永不闲置）
+    # 2. 系统闲置超过阈值 -> 进入闲置，并把此前无输入期间记入应用的时长追溯改记为闲置
+    # 3. 闲置中需在时间窗口内检测到多次输入才退出，确认前的时长随后改记为使用
+    threshold = idle_config.threshold(app_name, title)
+    now_ts = now()
+    state = idle_detector.update(now_ts, idle_duration, threshold)
+
+    with data_lock:
+        minutes = stats_data["timeline"]["bucket_minutes"]
+        spans = timeline.split_seconds(now_ts, seconds, minutes)
+        if state == idle_rules.ENTER:
+            write_log("Idle Start")
+            is_idle_status = True
+            reclaimed = 0
+            for _ in range(min(int(idle_duration) - seconds, len(recent_active))):
+                entry = recent_active.pop()
+                if entry:
+                    uncredit_active(entry[0], entry[1], 1, entry[2])
+                    credit_idle(1, entry[2])
+                    reclaimed += 1
+            recent_active.clear()
+            # 改记的秒数都在最近一段的末尾（超出最近一段的部分所属的段已经结束，不再修正）
+            end_run(trim=reclaimed)
+            for bucket, n in spans:
+                credit_idle(n, bucket)
+            last_window = None
+        elif state in (idle_rules.IDLE, idle_rules.PENDING):
+            for bucket, n in spans:
+                credit_idle(n, bucket)
+            last_window = None
+            if state == idle_rules.PENDING:
+                # 只有最后一次输入之后的各秒等待确认（间隔拉长时，之前的部分确定是闲置）
+                entry_app = app_name if app_name and title else None
+                buckets = [bucket for bucket, n in spans for _ in range(n)]
+                for bucket in buckets[-min(seconds, int(idle_duration) + 1):]:
+                    pending_idle.append((entry_app, title, bucket))
+            else:
+                pending_idle.clear()
+        else:
+            if state == idle_rules.EXIT:
+                write_log("Idle End")
+                is_idle_status = False
+                for i, (entry_app, entry_title, entry_bucket) in enumerate(pending_idle):
+                    credit_idle(-1, entry_bucket)
+                    if entry_app:
+                        credit_active(entry_app, entry_title, 1, entry_bucket)
+                        extend_run(entry_app, now_ts - len(pending_idle) + i)
+                    else:
+                        end_run()
+                pending_idle.clear()
+                if seconds > 1:
+                    # 闲置期间拉长了采样间隔后直接退出（只需一次输入，或前台切换到白名单应用）：
+                    # 最后一次输入之前的各秒仍是闲置；没有输入时只有本次采样的一秒记入使用
+                    after = min(seconds, int(idle_duration) + 1 if idle_duration < seconds else 1)
+                    for bucket, n in timeline.split_seconds(now_ts - after, seconds - after, minutes):
+                        credit_idle(n, bucket)
+                    seconds = after
+                    spans = timeline.split_seconds(now_ts, after, minutes)
+
+            # 记录应用时长：采样间隔内切换了窗口时，切换按最后一次输入的时间计，之前的各秒仍属于上一个窗口
+            window = (app_name, title)
+            if seconds > 1 and last_window is not None and window != last_window:
+                before = seconds - min(seconds, int(idle_duration) + 1)
+                if before:
+                    after = seconds - before
+                    credit_window(last_window[0], last_window[1], idle_config.threshold(*last_window),
+                                  now_ts - after, timeline.split_seconds(now_ts - after, before, minutes))
+                    spans = timeline.split_seconds(now_ts, after, minutes)
+            credit_window(app_name, title, threshold, now_ts, spans)
+            last_window = window
+
+        # 本次采样的记账写入预写日志，同时作为心跳
+        if journal is not None:
+            journal.tick(now_ts, focus_run)
+    return state
+
+
+def on_battery():
+    """是否使用电池供电；最多每 POWER_CHECK_INTERVAL 秒查询一次"""
+    global power_state
+    wall = time.monotonic()
+    if power_state is None or wall - power_state[0] >= POWER_CHECK_INTERVAL:
+        power_state = (wall, probe.on_battery())
+    return power_state[1]
+
+
+def sleep_until_next_sample(interval, since):
+    """休眠到下一次采样。间隔长于输入检查间隔时，每个检查间隔只读取一次系统闲置时间（不读窗口、不记账），
+    发现 since 之后有过输入就提前采样，退出闲置最多晚一个检查间隔被观察到（见 utils/sampling.py）"""
+    step = sampler.input_check if probe.polls_input else interval
+    slept = 0
+    while interval - slept > step:
+        probe.sleep(step)
+        slept += step
+        if not running or probe.get_idle_duration() < now() - since:
+            return
+    probe.sleep(interval - slept)
+
+
+def seconds_until_midnight(ts):
+    tomorrow = datetime.date.fromtimestamp(ts) + datetime.timedelta(days=1)
+    return datetime.datetime.combine(tomorrow, datetime.time()).timestamp() - ts
+
+
+def monitor_loop():
+    write_log("Service Started")
+    load_idle_rules()
+    load_category_rules()
+    last_tick = now()
+    interval = 1
+
+    while running and not probe.finished:
+        tick_started = time.perf_counter()
+        # 两次采样间隔明显超过计划的休眠时间，说明有采样被跳过（系统繁忙、休眠唤醒等）
+        now_ts = now()
+        gap = now_ts - last_tick
+        if gap > interval + 0.5:
+            metrics.missed_ticks.inc(int(gap - interval))
+        # 按经过的秒数记账（采样间隔拉长时一次记入整个间隔）；休眠唤醒等跳过的时间不记入
+        seconds = max(1, min(int(now_ts) - int(last_tick), interval + 1))
+        previous_tick, last_tick = last_tick, now_ts
+
+        # 日期变更检查 (如果跨天了，需要重置数据或切换文件)
+        now_date = datetime.datetime.fromtimestamp(now_ts).strftime("%Y%m%d")
+        if now_date != current_date_str:
+            rollover(now_date)
+
+        # 检测闲置
+        probe_started = time.perf_counter()
+        idle_duration = probe.get_idle_duration()
+        probe_mid = time.perf_counter()
+        app_name, title = probe.get_active_window_info()
+        probe_done = time.perf_counter()
+        metrics.probe_seconds.labels("idle").observe(probe_mid - probe_started)
+        metrics.probe_seconds.labels("window").observe(probe_done - probe_mid)
+
+        state = process_sample(idle_duration, app_name, title, seconds)
+
+        # 每隔 30 秒自动保存一次数据，防止崩坏；顺便检查配置文件是否有变化
+        if int(now_ts) // 30 != int(previous_tick) // 30:
+            save_data()
+            load_idle_rules()
+            load_category_rules()
+            publish_status()
+
+        # 托盘客户端通过停止标记请求退出
+        if tray.consume_stop_request(DATA_DIR):
+            shutdown("Service Stopping (Stop Requested)")
+            if tray_icon is not None:
+                tray_icon.stop()
+            break
+
+        # 闲置或前台窗口长时间不变时拉长采样间隔；零点前的最后一秒照常采样，之后的一秒才记入新的一天
+        interval = sampler.next_interval(now_ts, state, (app_name, title), idle_duration < gap, on_battery())
+        if interval > 1:
+            interval = max(1, min(interval, math.ceil(seconds_until_midnight(now_ts)) - 1))
+        metrics.sampling_interval.set(interval)
+        metrics.tick_seconds.observe(time.perf_counter() - tick_started)
+        sleep_until_next_sample(interval, now_ts)
+
+
+def quick_stats():
+    """今日使用 / 闲置时长和前几名应用；直接读取增量维护的计数，最多每 QUICK_STATS_REFRESH 秒读取一次"""
+    global quick_stats_cache
+    wall = time.monotonic()
+    if quick_stats_cache is None or wall - quick_stats_cache[0] >= QUICK_STATS_REFRESH:
+        with data_lock:
+            stats = {
+                "active": app_ranking.sum,
+                "idle": stats_data["idle_seconds"],
+                "top_apps": app_ranking.top(),
+            }
+        quick_stats_cache = (wall, stats)
+    return quick_stats_cache[1]
+
+
+def publish_status(force=False):
+    """写出状态文件，供 tray_client.py 显示"""
+    global last_status_write
+    wall = time.monotonic()
+    if not force and last_status_write is not None and wall - last_status_write < STATUS_MIN_INTERVAL:
+        return
+    last_status_write = wall
+    tray.write_status(DATA_DIR, {
+        "pid": os.getpid(),
+        "probe": probe.name,
+        "date": current_date_str,
+        "updated": now(),
+        "idle": is_idle_status,
+        "today": quick_stats(),
+        "metrics": metrics.summary_lines(),
+    })
+
+# --- 托盘 GUI ---
+
+
+def create_image():
+    # 缩放后的图标缓存在 Data 目录，之后启动直接读取
+    return tray.load_icon(BASE_DIR, DATA_DIR)
+
+
+def shutdown(reason):
+    """停止采样并保存数据"""
+    global running
+    if not running:
+        return
+    running = False
+    write_log(reason)
+    with data_lock:
+        end_run()
+    saved = save_data()
+    if journal is not None:
+        # 最终快照写入成功后不再需要日志；写入失败时保留，下次启动时重放
+        with data_lock:
+            journal.close(remove=saved)
+    generate_report()
+    metrics.write_snapshot(DATA_DIR, force=True)
+    try:
+        os.remove(tray.status_path(DATA_DIR))
+    except OSError:
+        pass
+    probe.stop()
+
+
+def on_quit(icon, item):
+    icon.stop()
+
+    # 退出处理
+    shutdown("Service Stopping (User Quit)")
+    sys.exit(0)
+
+
+def setup_tray():
+    global tray_icon
+    import pystray
+
+    image = create_image()
+    menu = pystray.Menu(
+        pystray.MenuItem("Today", pystray.Menu(lambda: (
+            pystray.MenuItem(line, None, enabled=False) for line in tray.format_quick_stats(quick_stats())
+        ))),
+        pystray.MenuItem("Open Stats Folder", lambda: probe.open_folder(BASE_DIR)),
+        pystray.MenuItem("Tracker Metrics", pystray.Menu(lambda: (
+            pystray.MenuItem(line, None, enabled=False) for line in metrics.summary_lines()
+        ))),
+        pystray.MenuItem("Exit", on_quit)
+    )
+    tray_icon = pystray.Icon("AppTracker", image, "Usage Tracker", menu)
+    tray_icon.run()
+
+# --- 主入口 ---
+
+
+def run(probe_backend, data_dir=None, use_tray=True):
+    """启动 tracker：加载数据、启动监控线程、显示托盘（阻塞直到退出）"""
+    configure(probe_backend, data_dir)
+    probe.start(log=write_log)
+
+    # 加载已有数据，重放上次异常退出时留下的日志
+    recover_journal(load_data())
+    # 清理上次运行遗留的停止标记
+    tray.consume_stop_request(DATA_DIR)
+
+    # 注册退出钩子 (处理关机等情况)
+    atexit.register(lambda: shutdown("System Shutdown or Process Terminated"))
+
+    publish_status(force=True)
+
+    if use_tray and TRAY_AVAILABLE:
+        # 启动监控线程
+        monitor_thread = threading.Thread(target=monitor_loop, daemon=True)
+        monitor_thread.start()
+
+        # 启动托盘 (阻塞主线程)
+        setup_tray()
+    else:
+        # 无托盘（--no-tray 服务模式或回放）：在主线程中运行，可由 tray_client.py 显示托盘
+        try:
+            monitor_loop()
+        except KeyboardInterrupt:
+            pass
+        shutdown("Service Stopped")
+
+
+def main(default_probe=None):
+    parser = argparse.ArgumentParser(description="应用程序使用统计")
+    parser.add_argument("--probe", choices=BACKENDS, default=default_probe,
+                        help="平台探测后端（默认按当前系统选择）")
+    parser.add_argument("--replay", help="回放轨迹文件（JSON Lines 或 --record 录制的二进制轨迹）")
+    parser.add_argument("--record", help="把每次采样的原始探测结果追加写入二进制轨迹文件")
+    parser.add_argument("--data-dir", help="数据目录（默认为脚本目录下的 Data）")
+    parser.add_argument("--no-tray", action="store_true",
+                        help="无界面服务模式，不加载托盘；托盘可由 tray_client.py 单独显示")
+    args = parser.parse_args()
+
+    probe_name = "replay" if args.replay else args.probe
+    probe_backend = create_probe(probe_name, args.replay)
+    if args.record:
+        from probes.recording import RecordingProbe
+        probe_backend = RecordingProbe(probe_backend, args.record)
+    run(probe_backend, args.data_dir, use_tray=not args.no_tray and probe_name != "replay")
+
+
+if __name__ == "__main__":
+    main()
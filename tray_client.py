@@ -0,0 +1,57 @@
+# 托盘客户端：配合 `app_tracker.py --no-tray` 使用，单独显示托盘图标
+# tracker 只负责采样和保存；托盘进程读取 Data/tracker.status.json 显示状态，退出时写入停止标记
+import os
+import argparse
+
+import pystray
+
+from probes.base import Probe
+from utils import tray
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "Data")
+
+
+def status_items(data_dir):
+    status = tray.read_status(data_dir)
+    if status is None:
+        return [pystray.MenuItem("Tracker not running", None, enabled=False)]
+    state = "Idle" if status.get("idle") else "Tracking"
+    return [pystray.MenuItem(f"{state} ({status.get('probe')}, pid {status.get('pid')})", None, enabled=False)]
+
+
+def today_items(data_dir):
+    status = tray.read_status(data_dir) or {}
+    return [pystray.MenuItem(line, None, enabled=False) for line in tray.format_quick_stats(status.get("today"))]
+
+
+def metrics_items(data_dir):
+    status = tray.read_status(data_dir) or {}
+    lines = status.get("metrics") or ["No metrics available"]
+    return [pystray.MenuItem(line, None, enabled=False) for line in lines]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用程序使用统计 - 托盘客户端")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="tracker 的数据目录")
+    args = parser.parse_args()
+    data_dir = args.data_dir
+
+    def stop_tracker(icon, item):
+        tray.request_stop(data_dir)
+        icon.stop()
+
+    menu = pystray.Menu(
+        pystray.MenuItem("Status", pystray.Menu(lambda: status_items(data_dir))),
+        pystray.MenuItem("Today", pystray.Menu(lambda: today_items(data_dir))),
+        pystray.MenuItem("Open Stats Folder", lambda: Probe().open_folder(BASE_DIR)),
+        pystray.MenuItem("Tracker Metrics", pystray.Menu(lambda: metrics_items(data_dir))),
+        pystray.MenuItem("Close Tray", lambda icon, item: icon.stop()),
+        pystray.MenuItem("Exit", stop_tracker)
+    )
+    icon = pystray.Icon("AppTracker", tray.load_icon(BASE_DIR, data_dir), "Usage Tracker", menu)
+    icon.run()
+
+
+if __name__ == "__main__":
+    main()
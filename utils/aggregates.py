@@ -0,0 +1,211 @@
+import os
+import json
+import datetime
+import threading
+
+from utils import categories
+from utils import focus
+from utils import schema
+from utils import timeline
+from utils.datastore import day_fingerprint, fingerprint_key, read_day_bytes
+from utils.hosts import get_host_dir
+
+# 按周 / 按月物化的汇总，weekly.html 一次请求即可取得整个周期的数据
+#
+# 每个主机每个周期一个文件：<主机数据目录>/aggregates/week/2026-W03.json、aggregates/month/2026.01.json
+#   {
+#       "period": "week", "key": "2026-W03", "from": "YYYYMMDD", "to": "YYYYMMDD",
+#       "days": {"YYYYMMDD": {"fingerprint": "...", "run_seconds": 0, "idle_seconds": 0,
+#                              "apps": {"exe_name": 秒}, "categories": {"coding": 秒}, "timeline": {...}, "focus": {...}}}
+#   }
+# 文件中保存每一天的摘要及其数据文件的版本标识：读取时只对版本变化了的日期重新解析数据文件，
+# 其余日期直接使用摘要。已结束的周期在 tracker 跨天时生成一次，之后除非数据文件变化（例如远端补报）不再重算；
+# 当前周期随每天的数据增量更新。
+
+AGGREGATES_SUBDIR = "aggregates"
+PERIODS = ("week", "month")
+
+_update_lock = threading.Lock()
+
+
+def period_range(period, date_str):
+    """返回包含 date_str 的周期 (key, [YYYYMMDD, ...])；周从周一开始（ISO 周）"""
+    day = datetime.datetime.strptime(date_str, "%Y%m%d").date()
+    if period == "week":
+        start = day - datetime.timedelta(days=day.weekday())
+        count = 7
+        iso_year, iso_week, _ = day.isocalendar()
+        key = f"{iso_year}-W{iso_week:02d}"
+    elif period == "month":
+        start = day.replace(day=1)
+        next_month = (start + datetime.timedelta(days=32)).replace(day=1)
+        count = (next_month - start).days
+        key = start.strftime("%Y.%m")
+    else:
+        raise ValueError(f"Unknown period: {period!r} (use {' or '.join(PERIODS)})")
+    return key, [(start + datetime.timedelta(days=i)).strftime("%Y%m%d") for i in range(count)]
+
+
+def aggregate_path(data_dir, host, period, key):
+    return os.path.join(get_host_dir(data_dir, host), AGGREGATES_SUBDIR, period, f"{key}.json")
+
+
+def _run_seconds(sessions):
+    total = 0
+    for session in sessions:
+        try:
+            start = datetime.datetime.strptime(session["start"], schema.TIMESTAMP_FORMAT)
+            end = datetime.datetime.strptime(session["end"], schema.TIMESTAMP_FORMAT)
+        except (KeyError, TypeError, ValueError):
+            continue
+        total += max(0, int((end - start).total_seconds()))
+    return total
+
+
+def summarize_day(day, fingerprint, category_rules=None):
+    """一天数据的摘要（不含标题）；没有分类统计的旧数据按 category_rules 补算"""
+    derived = category_rules is not None and not categories.is_categories(day.get("categories"))
+    if derived:
+        categories.ensure_categories(day, category_rules)
+    entry = {
+        "fingerprint": fingerprint,
+        "run_seconds": _run_seconds(day.get("sessions", [])),
+        "idle_seconds": day.get("idle_seconds", 0),
+        "apps": {name: info.get("total", 0) for name, info in day.get("apps", {}).items()},
+    }
+    if categories.is_categories(day.get("categories")):
+        entry["categories"] = day["categories"]
+    if derived:
+        entry["categories_version"] = category_rules.version
+    if timeline.is_timeline(day.get("timeline")):
+        entry["timeline"] = day["timeline"]
+    if focus.is_focus(day.get("focus")):
+        entry["focus"] = day["focus"]
+    return entry
+
+
+def _load(path):
+    try:
+        with open(path, "rb") as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _categories_stale(entry, category_rules):
+    if category_rules is None:
+        return False
+    if "categories" not in entry:
+        return True
+    version = entry.get("categories_version")
+    return version is not None and version != category_rules.version
+
+
+def update_aggregate(data_dir, host, period, date_str, log=None, category_rules=None):
+    """返回某主机包含 date_str 的周期汇总，只重新读取数据版本变化了的日期，有变化时写回文件
+
+    给出 category_rules 时，还没有分类统计的摘要（此前生成的汇总）以及按其他版本的规则补算了分类的摘要
+    也会重新读取一次。
+    """
+    key, dates = period_range(period, date_str)
+    host_dir = get_host_dir(data_dir, host)
+    path = aggregate_path(data_dir, host, period, key)
+    with _update_lock:
+        stored = _load(path)
+        if not isinstance(stored, dict) or not isinstance(stored.get("days"), dict):
+            stored = {"period": period, "key": key, "from": dates[0], "to": dates[-1], "days": {}}
+        changed = False
+        for d in dates:
+            fp = day_fingerprint(host_dir, d)
+            old = stored["days"].get(d)
+            if fp is None:
+                if old is not None:
+                    del stored["days"][d]
+                    changed = True
+                continue
+            fp = fingerprint_key(fp)
+            if old is not None and old.get("fingerprint") == fp and not _categories_stale(old, category_rules):
+                continue
+            try:
+                raw = read_day_bytes(host_dir, d)
+                if raw is None:
+                    continue
+                stored["days"][d] = summarize_day(schema.decode_day(raw, check=False), fp, category_rules)
+            except (OSError, KeyError, schema.SchemaError) as e:
+                # 文件正在被归档或已损坏：本次不计入，下次读取时重试
+                if log:
+                    log(f"Aggregate skipped {host}/{d}: {e}")
+                continue
+            changed = True
+        if changed:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            schema.write_atomic(path, json.dumps(stored, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return stored
+
+
+def build_summary(period, date_str, stored_by_host):
+    """把一个或多个主机的周期汇总合并成 API 响应（按天的开机/使用/闲置、应用总时长、时段统计、专注统计）"""
+    key, dates = period_range(period, date_str)
+    days = []
+    apps = {}
+    timelines = []
+    focuses = []
+    category_totals = []
+    for d in dates:
+        entries = [stored["days"][d] for stored in stored_by_host.values() if d in stored["days"]]
+        run = sum(e["run_seconds"] for e in entries)
+        idle = sum(e["idle_seconds"] for e in entries)
+        days.append({"date": d, "has_data": bool(entries), "run_seconds": run, "idle_seconds": idle,
+                     "active_seconds": max(0, run - idle)})
+        for e in entries:
+            for name, seconds in e["apps"].items():
+                apps[name] = apps.get(name, 0) + seconds
+            if "timeline" in e:
+                timelines.append(e["timeline"])
+            if "focus" in e:
+                focuses.append(e["focus"])
+            if "categories" in e:
+                category_totals.append(e["categories"])
+
+    period_timeline = timeline.sum_timelines(timelines)
+    if period_timeline is not None:
+        # 各应用的时段数据较大，周期视图只返回总体的时段分布
+        period_timeline = {k: v for k, v in period_timeline.items() if k != "apps"}
+    return {
+        "period": period,
+        "key": key,
+        "from": dates[0],
+        "to": dates[-1],
+        "hosts": list(stored_by_host),
+        "run_seconds": sum(d["run_seconds"] for d in days),
+        "idle_seconds": sum(d["idle_seconds"] for d in days),
+        "active_seconds": sum(d["active_seconds"] for d in days),
+        "days": days,
+        "apps": dict(sorted(apps.items(), key=lambda item: item[1], reverse=True)),
+        "categories": categories.sum_categories(category_totals) or {},
+        "timeline": period_timeline,
+        "focus": focus.summarize(focus.sum_focus(focuses), period_timeline),
+    }
+
+
+def get_summary(data_dir, hosts, period, date_str, category_rules=None):
+    """API 入口：更新并合并各主机包含 date_str 的周期汇总"""
+    stored_by_host = {host: update_aggregate(data_dir, host, period, date_str, category_rules=category_rules)
+                      for host in hosts}
+    return build_summary(period, date_str, stored_by_host)
+
+
+def start_background_update(data_dir, hosts, date_str, log=None, category_rules=None):
+    """在后台线程中物化包含 date_str 的周和月（tracker 跨天时为刚结束的一天调用）"""
+    def run():
+        for host in hosts:
+            for period in PERIODS:
+                try:
+                    update_aggregate(data_dir, host, period, date_str, log=log, category_rules=category_rules)
+                except OSError as e:
+                    if log:
+                        log(f"Aggregate update failed for {host} {period} {date_str}: {e}")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,184 @@
+import os
+import re
+import shutil
+import datetime
+import threading
+import zipfile
+
+# 归档文件命名：Data/YYYY.mm.archive.zip
+# 每个成员单独压缩 (deflate)，zip 的中央目录即为索引，可随机读取单个成员
+ARCHIVE_SUFFIX = ".archive.zip"
+MONTH_DIR_PATTERN = re.compile(r"^\d{4}\.\d{2}$")
+ARCHIVE_PATTERN = re.compile(r"^(\d{4}\.\d{2})" + re.escape(ARCHIVE_SUFFIX) + r"$")
+MEMBER_PATTERN = re.compile(r"^\d{8}\.(data\.json|log\.txt|report\.txt)$")
+# 只为散文件生成的派生文件（二进制每日数据，见 utils/daybin.py），归档后不再使用，随散文件一起删除
+DERIVED_PATTERN = re.compile(r"^\d{8}\.data\.bin$")
+
+DEFAULT_RETENTION_DAYS = 31
+
+_archive_lock = threading.Lock()
+
+
+def retention_days(config):
+    """配置中的归档保留天数 archiveRetentionDays，缺省或无效时为 DEFAULT_RETENTION_DAYS"""
+    try:
+        return int(config.get("archiveRetentionDays", DEFAULT_RETENTION_DAYS))
+    except (TypeError, ValueError):
+        return DEFAULT_RETENTION_DAYS
+
+
+def get_archive_path(data_dir, month):
+    """返回某个 YYYY.mm 月份对应的归档文件路径"""
+    return os.path.join(data_dir, f"{month}{ARCHIVE_SUFFIX}")
+
+
+def list_archives(data_dir):
+    """列出 Data 目录下所有归档的月份 {YYYY.mm: path}"""
+    archives = {}
+    if not os.path.isdir(data_dir):
+        return archives
+    for item in os.listdir(data_dir):
+        m = ARCHIVE_PATTERN.match(item)
+        if m:
+            archives[m.group(1)] = os.path.join(data_dir, item)
+    return archives
+
+
+def month_end(month):
+    """YYYY.mm -> 该月最后一天的 date"""
+    year, mon = int(month[:4]), int(month[5:7])
+    if mon == 12:
+        first_of_next = datetime.date(year + 1, 1, 1)
+    else:
+        first_of_next = datetime.date(year, mon + 1, 1)
+    return first_of_next - datetime.timedelta(days=1)
+
+
+def find_archivable_months(data_dir, retention_days=DEFAULT_RETENTION_DAYS, today=None):
+    """查找已结束且超过保留期的月份目录"""
+    if today is None:
+        today = datetime.date.today()
+    months = []
+    if not os.path.isdir(data_dir):
+        return months
+    for item in sorted(os.listdir(data_dir)):
+        if not MONTH_DIR_PATTERN.match(item):
+            continue
+        if not os.path.isdir(os.path.join(data_dir, item)):
+            continue
+        if (today - month_end(item)).days > retention_days:
+            months.append(item)
+    return months
+
+
+def archive_month(data_dir, month):
+    """将一个 YYYY.mm 目录打包进归档，校验成功后删除原始文件
+
+    如果归档已存在（例如之前归档后又有补写的文件），会把旧成员与新文件合并，
+    新文件覆盖同名旧成员。返回写入的成员数量。
+    """
+    month_dir = os.path.join(data_dir, month)
+    archive_path = get_archive_path(data_dir, month)
+    tmp_path = archive_path + ".tmp"
+
+    with _archive_lock:
+        members = {}
+        derived = []
+        for f in sorted(os.listdir(month_dir)):
+            if MEMBER_PATTERN.match(f):
+                members[f] = os.path.join(month_dir, f)
+            elif DERIVED_PATTERN.match(f):
+                derived.append(os.path.join(month_dir, f))
+        if not members:
+            return 0
+
+        try:
+            with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+                # 保留旧归档中未被覆盖的成员
+                if os.path.exists(archive_path):
+                    with zipfile.ZipFile(archive_path, "r") as old:
+                        for info in old.infolist():
+                            if info.filename not in members:
+                                zf.writestr(info, old.read(info.filename))
+                for name, path in members.items():
+                    zf.write(path, arcname=name)
+
+            # 校验 CRC，确认无误后再替换和删除
+            with zipfile.ZipFile(tmp_path, "r") as zf:
+                bad = zf.testzip()
+                if bad is not None:
+                    raise IOError(f"Archive verification failed on {bad}")
+
+            os.replace(tmp_path, archive_path)
+        finally:
+            # 写入、校验或替换失败时不留下半成品
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        for path in list(members.values()) + derived:
+            os.remove(path)
+        # 目录中没有其他文件时移除目录，减少 inode 占用
+        if not os.listdir(month_dir):
+            shutil.rmtree(month_dir, ignore_errors=True)
+        return len(members)
+
+
+def archive_old_months(data_dir, retention_days=DEFAULT_RETENTION_DAYS, today=None, log=None):
+    """归档所有超过保留期的月份，返回 {month: 成员数}"""
+    result = {}
+    for month in find_archivable_months(data_dir, retention_days, today):
+        try:
+            result[month] = archive_month(data_dir, month)
+            if log:
+                log(f"Archived {month}: {result[month]} files")
+        except Exception as e:
+            if log:
+                log(f"Error archiving {month}: {e}")
+    return result
+
+
+def start_background_archiver(data_dir, retention_days=DEFAULT_RETENTION_DAYS, today=None, log=None):
+    """在后台线程中执行归档，不阻塞调用方"""
+    thread = threading.Thread(
+        target=archive_old_months,
+        args=(data_dir, retention_days, today),
+        kwargs={"log": log},
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+# --- 读取 ---
+
+
+class ArchiveReader:
+    """按归档版本（mtime 与大小）缓存成员列表，按成员名随机读取
+
+    不长期持有打开的 ZipFile：Windows 上打开着的文件无法被替换，会使归档程序重新归档同一月份时
+    os.replace 失败。每次读取单独打开（只解析中央目录，开销很小），读完立即关闭。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = {}  # path -> ((mtime_ns, size), [成员名])
+
+    def namelist(self, path):
+        st = os.stat(path)
+        fingerprint = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._names.get(path)
+            if cached and cached[0] == fingerprint:
+                return cached[1]
+        with zipfile.ZipFile(path, "r") as zf:
+            names = zf.namelist()
+        with self._lock:
+            self._names[path] = (fingerprint, names)
+        return names
+
+    def read(self, path, name):
+        """读取归档中的单个成员，不存在时返回 None"""
+        with zipfile.ZipFile(path, "r") as zf:
+            try:
+                return zf.read(name)
+            except KeyError:
+                return None
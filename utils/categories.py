@@ -0,0 +1,177 @@
+import re
+import json
+import hashlib
+
+# 应用 / 标题分类（编程、会议、浏览等），每天的各分类时长保存在每日数据文件的 "categories" 字段：
+#   {"coding": 秒, "meetings": 秒, ..., "other": 秒}
+#
+# 配置项（statistics.configuration.json）：
+#   categoryRules  分类规则，按顺序排列，例如
+#                    {"name": "meetings", "apps": ["zoom.exe"], "titles": ["Microsoft Teams", "Google Meet"]}
+#                    {"name": "browsing", "apps": ["chrome.exe", "msedge.exe"]}
+#                  应用名不区分大小写精确匹配，标题为不区分大小写的子串；标题规则优先于应用规则
+#                  （浏览器里开的会议记为 meetings），多条命中时取配置中靠前的一条。
+#                  没有该配置项时使用 DEFAULT_RULES，设为 [] 则全部记为 other。
+#
+# 与闲置规则一样，规则只在配置变化时编译一次：应用规则为 dict，标题规则合并为一个正则用于快速排除，
+# 结果按 (应用, 标题) 缓存。tracker 在记账时按分类增量累计，配置变化时只重算当天；
+# 历史数据使用文件中保存的分类，没有分类的旧文件在读取时计算一次（server 按文件版本缓存）。
+
+UNCATEGORIZED = "other"
+MAX_MEMO_ENTRIES = 16384
+
+DEFAULT_RULES = [
+    {"name": "meetings",
+     "apps": ["zoom.exe", "zoom.us", "Teams.exe", "ms-teams.exe", "wemeetapp.exe"],
+     "titles": ["Zoom Meeting", "Microsoft Teams", "Google Meet", "腾讯会议"]},
+    {"name": "coding",
+     "apps": ["Code.exe", "Code", "Cursor.exe", "Cursor", "Trae.exe", "devenv.exe", "pycharm64.exe", "PyCharm",
+              "idea64.exe", "IntelliJ IDEA", "Xcode", "Unity.exe", "Notepad--.exe", "Docker Desktop.exe",
+              "WindowsTerminal.exe", "mintty.exe", "Terminal", "iTerm2", "gnome-terminal-server", "kitty", "Alacritty"],
+     "titles": ["Visual Studio Code", "GitHub", "Stack Overflow"]},
+    {"name": "communication",
+     "apps": ["WeChat.exe", "Weixin.exe", "WeChat", "QQ.exe", "QQ", "DingTalk.exe", "Slack.exe", "Slack",
+              "Telegram.exe", "Telegram", "telegram-desktop", "OUTLOOK.EXE", "Mail", "thunderbird"]},
+    {"name": "office",
+     "apps": ["WINWORD.EXE", "EXCEL.EXE", "POWERPNT.EXE", "ONENOTE.EXE", "wps.exe", "et.exe", "wpp.exe",
+              "Microsoft Word", "Microsoft Excel", "Microsoft PowerPoint", "Pages", "Numbers", "Keynote",
+              "soffice.bin"]},
+    {"name": "media",
+     "apps": ["vlc.exe", "VLC", "QQMusic.exe", "cloudmusic.exe", "xmp.exe", "PotPlayerMini64.exe",
+              "Spotify.exe", "Spotify", "Music", "哔哩哔哩.exe", "mpv"],
+     "titles": ["YouTube", "bilibili", "哔哩哔哩", "Netflix"]},
+    {"name": "browsing",
+     "apps": ["chrome.exe", "msedge.exe", "firefox.exe", "360se.exe", "QQBrowser.exe", "Google Chrome",
+              "Microsoft Edge", "Safari", "Firefox", "google-chrome", "chromium", "quark.exe"]},
+    {"name": "games",
+     "apps": ["steam.exe", "steamwebhelper.exe", "Steam"]},
+    {"name": "system",
+     "apps": ["explorer.exe", "SearchHost.exe", "Everything.exe", "mmc.exe", "Taskmgr.exe", "Finder", "nautilus"]},
+]
+
+
+def _valid_rule(rule):
+    """规则须为对象，name 为非空字符串，apps / titles（如有）为字符串列表"""
+    if not isinstance(rule, dict) or not isinstance(rule.get("name"), str) or not rule["name"]:
+        return False
+    return all(rule.get(key) is None or (isinstance(rule[key], list) and all(isinstance(v, str) for v in rule[key]))
+               for key in ("apps", "titles"))
+
+
+class CategoryRules:
+    """编译后的分类规则"""
+
+    def __init__(self, rules=(), fuzzy_apps=False, log=None):
+        """格式不正确的规则被跳过，并通过 log 回调记录"""
+        valid = []
+        for rule in rules:
+            if _valid_rule(rule):
+                valid.append(rule)
+            elif log:
+                log(f"Ignoring invalid category rule: {rule!r}")
+        rules = valid
+        # 规则内容的摘要：补算出的分类随规则版本缓存，规则变化时失效
+        self.version = hashlib.sha1(json.dumps(list(rules), sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+        # macOS 的应用名与配置中的名称不完全一致，使用双向子串匹配（仅在缓存未命中时执行）
+        self.fuzzy_apps = fuzzy_apps
+        self.app_categories = {}
+        self.title_rules = []
+        for rule in rules:
+            name = rule["name"]
+            for app in rule.get("apps") or ():
+                self.app_categories.setdefault(app.lower(), name)
+            for title in rule.get("titles") or ():
+                if title:
+                    self.title_rules.append((title.lower(), name))
+        self.title_pattern = None
+        if self.title_rules:
+            self.title_pattern = re.compile("|".join(re.escape(p) for p, _ in self.title_rules))
+        self._memo = {}
+
+    @classmethod
+    def from_config(cls, config, fuzzy_apps=False, log=None):
+        rules = config.get("categoryRules")
+        if rules is not None and not isinstance(rules, list):
+            if log:
+                log(f"Ignoring invalid categoryRules: {rules!r}")
+            rules = None
+        return cls(DEFAULT_RULES if rules is None else rules, fuzzy_apps, log)
+
+    def category(self, app_name, title):
+        """返回该窗口的分类，没有规则命中时返回 UNCATEGORIZED"""
+        key = (app_name, title)
+        cached = self._memo.get(key)
+        if cached is None:
+            if len(self._memo) >= MAX_MEMO_ENTRIES:
+                self._memo.clear()
+            cached = self._memo[key] = self._evaluate(app_name, title)
+        return cached
+
+    def _evaluate(self, app_name, title):
+        if title and self.title_pattern is not None:
+            lower = title.lower()
+            if self.title_pattern.search(lower):
+                for pattern, name in self.title_rules:
+                    if pattern in lower:
+                        return name
+        if app_name:
+            lower = app_name.lower()
+            name = self.app_categories.get(lower)
+            if name is not None:
+                return name
+            if self.fuzzy_apps:
+                for app, name in self.app_categories.items():
+                    if app in lower or lower in app:
+                        return name
+        return UNCATEGORIZED
+
+    def categorize(self, day):
+        """按当前规则计算一天数据的各分类时长"""
+        totals = {}
+        for app_name, app_info in day.get("apps", {}).items():
+            for title, seconds in app_info.get("titles", {}).items():
+                name = self.category(app_name, title)
+                totals[name] = totals.get(name, 0) + seconds
+        return sort_categories(totals)
+
+
+def is_categories(categories):
+    return isinstance(categories, dict) and all(isinstance(v, (int, float)) for v in categories.values())
+
+
+def sort_categories(totals):
+    return dict(sorted(((k, v) for k, v in totals.items() if v > 0), key=lambda item: item[1], reverse=True))
+
+
+def ensure_categories(day, rules):
+    """没有分类统计的旧数据按 rules 补算（原地修改并返回）"""
+    if not is_categories(day.get("categories")):
+        day["categories"] = rules.categorize(day)
+    return day
+
+
+# --- 记账（tracker 持有 data_lock 时调用）---
+
+
+def add(categories, name, seconds):
+    total = categories.get(name, 0) + seconds
+    if total > 0:
+        categories[name] = total
+    else:
+        categories.pop(name, None)
+
+
+# --- 合并 ---
+
+
+def sum_categories(items):
+    """累加多份分类统计（不同主机或不同日期）；没有有效数据时返回 None"""
+    items = [c for c in items if is_categories(c)]
+    if not items:
+        return None
+    totals = {}
+    for categories in items:
+        for name, seconds in categories.items():
+            totals[name] = totals.get(name, 0) + seconds
+    return sort_categories(totals)
+
@@ -0,0 +1,24 @@
+import json
+import math
+
+# 配置文件 statistics.configuration.json 的读取，tracker、server 与各命令行工具共用
+
+
+def read_config(path):
+    """读取配置文件；不存在、解析失败或顶层不是对象时返回空配置"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return config if isinstance(config, dict) else {}
+
+
+def number_setting(config, key, default, log=None):
+    """读取数值配置项；缺省时返回 default，不是有限的非负数时记录日志（log 回调）并返回 default"""
+    value = config.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        if log:
+            log(f"Ignoring invalid {key}: {value!r}")
+        return default
+    return value
@@ -0,0 +1,76 @@
+import os
+import re
+
+from utils.archive import ArchiveReader, get_archive_path, list_archives, MONTH_DIR_PATTERN
+
+# 服务器读取每日数据的统一入口：优先读取月份目录中的散文件，其次读取归档
+
+DATE_FILE_PATTERN = re.compile(r"^(\d{8})\.data\.json$")
+
+_archive_reader = ArchiveReader()
+
+
+def month_of(date_str):
+    """YYYYMMDD -> YYYY.mm"""
+    return f"{date_str[:4]}.{date_str[4:6]}"
+
+
+def list_dates(data_dir):
+    """返回所有有数据的日期 YYYYMMDD（倒序，最新在前）"""
+    dates = set()
+    if not os.path.exists(data_dir):
+        return []
+    for item in os.listdir(data_dir):
+        item_path = os.path.join(data_dir, item)
+        if not (MONTH_DIR_PATTERN.match(item) and os.path.isdir(item_path)):
+            continue
+        try:
+            for f in os.listdir(item_path):
+                m = DATE_FILE_PATTERN.match(f)
+                if m:
+                    dates.add(m.group(1))
+        except OSError:
+            continue
+    for month, archive_path in list_archives(data_dir).items():
+        try:
+            for name in _archive_reader.namelist(archive_path):
+                m = DATE_FILE_PATTERN.match(name)
+                if m:
+                    dates.add(m.group(1))
+        except Exception:
+            continue
+    return sorted(dates, reverse=True)
+
+
+def read_day_bytes(data_dir, date_str):
+    """读取某天的原始 JSON 字节，不存在时返回 None"""
+    month = month_of(date_str)
+    file_path = os.path.join(data_dir, month, f"{date_str}.data.json")
+    # 直接打开而不先检查是否存在：归档程序可能在两步之间写好归档并删除散文件
+    try:
+        with open(file_path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    try:
+        return _archive_reader.read(get_archive_path(data_dir, month), f"{date_str}.data.json")
+    except FileNotFoundError:
+        return None
+
+
+def day_fingerprint(data_dir, date_str):
+    """某天数据的版本标识（文件或归档的 mtime 与大小），不存在时返回 None"""
+    month = month_of(date_str)
+    for path in (os.path.join(data_dir, month, f"{date_str}.data.json"), get_archive_path(data_dir, month)):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        return (path, st.st_mtime_ns, st.st_size)
+    return None
+
+
+def fingerprint_key(fingerprint):
+    """把 day_fingerprint 的结果转换为可持久化的字符串（检索索引、周期汇总记录数据版本用）"""
+    path, mtime_ns, size = fingerprint
+    return f"{os.path.basename(path)}:{mtime_ns}:{size}"
@@ -0,0 +1,314 @@
+import os
+import json
+import mmap
+import struct
+import itertools
+from operator import itemgetter
+from collections.abc import Mapping, Sequence
+
+from utils import schema
+
+# 每日数据的紧凑二进制格式 (YYYYMMDD.data.bin)，与 YYYYMMDD.data.json 放在同一个月份目录。
+# JSON 仍是唯一的数据源和导出格式；二进制文件是 tracker 每次快照（以及跨天）时顺带写出的只读副本，
+# server 用 mmap 打开后直接在缓冲区上回答 /api/data/ 的 top_apps / top_titles / app / min_seconds / fields 查询
+# 和 /api/focus/，不需要解析整个格式化的 JSON、也不需要为每个应用和标题构建 dict。
+#
+# 布局（小端）：
+#   文件头   HEADER：魔数、格式版本、对应 JSON 文件的 mtime_ns 与大小、各表的条目数
+#   字段表   FIELD × 字段数：除 apps 外的顶层字段（按原顺序），字段名、在字段区中的偏移和长度
+#   应用表   APP × 应用数：应用名、总时长、第一条标题记录、标题数；按总时长倒序
+#   标题表   TITLE × 标题数：标题、时长；每个应用的标题连续存放，按时长倒序
+#   字符串表 (字符串数 + 1) 个 u32 偏移，之后是 UTF-8 字符串区；应用名、标题和字段名都以序号引用
+#   字段区   各顶层字段的紧凑 JSON（sessions、idle_seconds、timeline、focus、categories 等，按需单独解析）
+# 排序规则与 utils/views.DayView 相同（稳定排序），因此查询结果与从 JSON 构建的视图逐字节一致。
+#
+# 文件头记录写出时 JSON 文件的 mtime_ns 与大小，与当前 JSON 文件不一致（例如 JSON 被迁移、补算、
+# 崩溃恢复或远端上报改写过）时视为过期，读取方回退到 JSON。时长必须是整数，否则不写出二进制文件。
+
+BINARY_SUFFIX = ".data.bin"
+JSON_SUFFIX = ".data.json"
+MAGIC = b"SDAY"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<4sHHqqIIII")  # 魔数, 版本, 保留, JSON mtime_ns, JSON 大小, 字符串数, 字段数, 应用数, 标题数
+FIELD = struct.Struct("<III")  # 字段名, 偏移, 长度
+APP = struct.Struct("<IqII")  # 应用名, 总时长, 第一条标题记录, 标题数
+TITLE = struct.Struct("<Iq")  # 标题, 时长
+OFFSET = struct.Struct("<I")
+SPAN = struct.Struct("<II")
+
+
+def binary_path(json_path):
+    """YYYYMMDD.data.json 对应的二进制文件路径"""
+    return json_path[:-len(JSON_SUFFIX)] + BINARY_SUFFIX
+
+
+def _encode_string(text):
+    return text.encode("utf-8", "surrogatepass")
+
+
+def _dump_field(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# --- 写出 ---
+
+
+def encode(day):
+    """把一天的数据编码为二进制格式（JSON 版本标识留空，由 write 填入）；时长不是整数时抛出 ValueError"""
+    strings = {}  # 字符串 -> 序号（按首次出现的顺序）
+    fields = []
+    field_blob = bytearray()
+    for key, value in day.items():
+        if key == "apps":
+            continue
+        raw = _dump_field(value)
+        fields.append(FIELD.pack(strings.setdefault(key, len(strings)), len(field_blob), len(raw)))
+        field_blob += raw
+
+    # 各记录的字段先收集到一个列表，最后一次打包
+    app_values = []
+    title_values = []
+    apps = sorted(day.get("apps", {}).items(), key=lambda item: item[1].get("total", 0), reverse=True)
+    for app_name, app_info in apps:
+        titles = sorted(app_info.get("titles", {}).items(), key=itemgetter(1), reverse=True)
+        app_values += (strings.setdefault(app_name, len(strings)), app_info.get("total", 0),
+                       len(title_values) // 2, len(titles))
+        for title, seconds in titles:
+            title_values += (strings.setdefault(title, len(strings)), seconds)
+    try:
+        app_table = struct.pack("<" + APP.format[1:] * len(apps), *app_values)
+        title_table = struct.pack("<" + TITLE.format[1:] * (len(title_values) // 2), *title_values)
+    except struct.error as e:
+        raise ValueError(f"Binary day files only hold integer seconds: {e}")
+
+    encoded = [_encode_string(text) for text in strings]
+    offsets = list(itertools.accumulate(map(len, encoded), initial=0))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0, 0, len(strings), len(fields), len(apps),
+                         len(title_values) // 2)
+    return bytearray().join([header, *fields, app_table, title_table,
+                             struct.pack(f"<{len(offsets)}I", *offsets), *encoded, field_blob])
+
+
+def write(path, content, json_path):
+    """在 JSON 文件写入之后调用：记下 JSON 文件当前的 mtime_ns 与大小，原子写出二进制文件"""
+    st = os.stat(json_path)
+    struct.pack_into("<qq", content, 8, st.st_mtime_ns, st.st_size)
+    schema.write_atomic(path, content)
+
+
+def is_fresh(json_path):
+    """二进制文件存在且与当前的 JSON 文件一致"""
+    try:
+        st = os.stat(json_path)
+        with open(binary_path(json_path), "rb") as f:
+            head = f.read(HEADER.size)
+    except OSError:
+        return False
+    if len(head) < HEADER.size:
+        return False
+    magic, version, _, mtime_ns, size = HEADER.unpack(head)[:5]
+    return magic == MAGIC and version == FORMAT_VERSION and (mtime_ns, size) == (st.st_mtime_ns, st.st_size)
+
+
+# --- 读取 ---
+
+
+class _Records(Sequence):
+    """记录表中 [first, first + count) 的一段，按时长倒序；访问时才解码名字，切片返回同一缓冲区上的子区间，
+    时长之和与按时长截取（seconds / at_least）只读定长记录，不解码名字"""
+
+    record = None  # 记录格式，前两个字段为名字的字符串序号和时长
+
+    def __init__(self, day, table_at, first, count):
+        self._day = day
+        self._table_at = table_at
+        self._first = first
+        self._count = count
+
+    def _item(self, values):
+        raise NotImplementedError
+
+    def _start(self, i=0):
+        return self._table_at + (self._first + i) * self.record.size
+
+    def _records(self):
+        start = self._start()
+        return self.record.iter_unpack(self._day.buf[start:start + self._count * self.record.size])
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._count)
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            return type(self)(self._day, self._table_at, self._first + start, max(0, stop - start))
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return self._item(self.record.unpack_from(self._day.buf, self._start(i)))
+
+    def __iter__(self):
+        for values in self._records():
+            yield self._item(values)
+
+    def seconds(self):
+        """时长之和"""
+        return sum(values[1] for values in self._records())
+
+    def at_least(self, min_seconds):
+        """时长不小于 min_seconds 的前缀（二分查找）"""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.record.unpack_from(self._day.buf, self._start(mid))[1] >= min_seconds:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self[:lo]
+
+
+class _TitleList(_Records):
+    """一个应用的 [(标题, 时长), ...]"""
+
+    record = TITLE
+
+    def _item(self, values):
+        return self._day.string(values[0]), values[1]
+
+
+class _AppList(_Records):
+    """[(应用名, 总时长, 标题列表), ...]，与 DayView.apps 相同"""
+
+    record = APP
+
+    def _item(self, values):
+        index, total, first, count = values
+        return self._day.string(index), total, _TitleList(self._day, self._day.titles_at, first, count)
+
+
+class _AppIndex(Mapping):
+    """应用名 -> 应用，第一次按名字查找时才建立（只解码应用名）"""
+
+    def __init__(self, day):
+        self._day = day
+        self._positions = None
+
+    def _index(self):
+        if self._positions is None:
+            buf, apps_at = self._day.buf, self._day.apps_at
+            self._positions = {self._day.string(APP.unpack_from(buf, apps_at + i * APP.size)[0]): i
+                               for i in range(len(self._day.apps))}
+        return self._positions
+
+    def __getitem__(self, name):
+        return self._day.apps[self._index()[name]]
+
+    def __iter__(self):
+        return iter(self._index())
+
+    def __len__(self):
+        return len(self._day.apps)
+
+
+class _Fields(Mapping):
+    """除 apps 外的顶层字段，按原顺序；取值时才解析该字段的 JSON"""
+
+    def __init__(self, day, spans):
+        self._day = day
+        self._spans = spans  # 字段名 -> (偏移, 长度)
+
+    def __getitem__(self, key):
+        offset, length = self._spans[key]
+        start = self._day.fields_data_at + offset
+        return schema.loads(self._day.buf[start:start + length])
+
+    def __contains__(self, key):
+        # Mapping 默认通过 __getitem__ 判断，会解析整个字段
+        return key in self._spans
+
+    def __iter__(self):
+        return iter(self._spans)
+
+    def __len__(self):
+        return len(self._spans)
+
+
+class BinaryDay:
+    """二进制每日数据的只读视图，接口与 utils/views.DayView 相同（apps、app_index、data），可直接交给 query_view
+
+    buf 为 bytes 或 mmap；用 open_day 打开的文件在 close()（或 with 块结束）之后不能再访问，
+    因此查询结果需在关闭前生成。
+    """
+
+    def __init__(self, buf):
+        self.buf = buf
+        if len(buf) < HEADER.size:
+            raise ValueError("Binary day file is truncated")
+        (magic, version, _, self.json_mtime_ns, self.json_size,
+         string_count, field_count, app_count, title_count) = HEADER.unpack_from(buf)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a binary day file of a supported version")
+        self.string_count = string_count
+        fields_at = HEADER.size
+        self.apps_at = fields_at + field_count * FIELD.size
+        self.titles_at = self.apps_at + app_count * APP.size
+        self.offsets_at = self.titles_at + title_count * TITLE.size
+        self.strings_at = self.offsets_at + (string_count + 1) * OFFSET.size
+        if len(buf) < self.strings_at:
+            raise ValueError("Binary day file is truncated")
+        self.fields_data_at = self.strings_at + OFFSET.unpack_from(buf, self.strings_at - OFFSET.size)[0]
+        spans = {}
+        end = self.fields_data_at
+        for i in range(field_count):
+            index, offset, length = FIELD.unpack_from(buf, fields_at + i * FIELD.size)
+            spans[self.string(index)] = (offset, length)
+            end = max(end, self.fields_data_at + offset + length)
+        if len(buf) < end:
+            raise ValueError("Binary day file is truncated")
+        self.apps = _AppList(self, self.apps_at, 0, app_count)
+        self.app_index = _AppIndex(self)
+        self.data = _Fields(self, spans)
+
+    def string(self, index):
+        if not 0 <= index < self.string_count:
+            raise ValueError(f"String index {index} out of range")
+        start, end = SPAN.unpack_from(self.buf, self.offsets_at + index * OFFSET.size)
+        return self.buf[self.strings_at + start:self.strings_at + end].decode("utf-8", "surrogatepass")
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_day(fingerprint):
+    """按 datastore.day_fingerprint 的结果打开对应的二进制文件；没有、已过期或无法识别时返回 None
+
+    只有月份目录中的散文件才有二进制文件，已归档的日期返回 None。
+    """
+    json_path, mtime_ns, size = fingerprint
+    if not json_path.endswith(JSON_SUFFIX):
+        return None
+    try:
+        with open(binary_path(json_path), "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        day = BinaryDay(buf)
+    except (ValueError, struct.error):
+        buf.close()
+        return None
+    if (day.json_mtime_ns, day.json_size) != (mtime_ns, size):
+        day.close()
+        return None
+    return day
@@ -0,0 +1,159 @@
+import math
+
+# 专注统计：前台应用连续使用段（run）的流式统计，保存在每日数据文件的 "focus" 字段：
+#   {
+#       "runs": 0, "mean": 0.0, "m2": 0.0,       # 所有连续使用段的个数、平均时长与 Welford 平方差累计
+#       "histogram": [次数, ...],                # 按 RUN_BIN_EDGES 划分的时长分布
+#       "longest": {"app": "...", "seconds": 0, "start": "YYYY-mm-dd HH:MM:SS"} 或 null,
+#       "apps": {"exe_name": {"runs": 0, "mean": 0.0, "m2": 0.0, "longest": 0}}
+#   }
+# 一个连续使用段是同一个应用不间断被记入使用的一段时间，切换应用、进入闲置或没有前台窗口时结束。
+# 每结束一段只做 O(1) 的更新，内存只随应用数量增长；应用切换次数见 utils/timeline.py 的 switches。
+
+# 连续使用段时长分布的分界（秒）：<10s, 10-30s, 30s-1m, 1-2m, 2-5m, 5-15m, 15-30m, 30-60m, >=60m
+RUN_BIN_EDGES = (10, 30, 60, 120, 300, 900, 1800, 3600)
+SUMMARY_TOP_APPS = 10
+
+
+def empty_focus():
+    return {"runs": 0, "mean": 0.0, "m2": 0.0, "histogram": [0] * (len(RUN_BIN_EDGES) + 1),
+            "longest": None, "apps": {}}
+
+
+def is_focus(focus):
+    """检查结构"""
+    if not isinstance(focus, dict) or not isinstance(focus.get("apps"), dict):
+        return False
+    histogram = focus.get("histogram")
+    if not isinstance(histogram, list) or len(histogram) != len(RUN_BIN_EDGES) + 1:
+        return False
+    if not all(isinstance(focus.get(k), (int, float)) for k in ("runs", "mean", "m2")):
+        return False
+    longest = focus.get("longest")
+    if longest is not None and (not isinstance(longest, dict) or not isinstance(longest.get("seconds"), (int, float))):
+        return False
+    return all(isinstance(app, dict) and all(isinstance(app.get(k), (int, float))
+                                             for k in ("runs", "mean", "m2", "longest"))
+               for app in focus["apps"].values())
+
+
+def bin_index(seconds):
+    for i, edge in enumerate(RUN_BIN_EDGES):
+        if seconds < edge:
+            return i
+    return len(RUN_BIN_EDGES)
+
+
+def bin_label(i):
+    def fmt(s):
+        return f"{s // 60}m" if s >= 60 else f"{s}s"
+    if i == 0:
+        return f"<{fmt(RUN_BIN_EDGES[0])}"
+    if i == len(RUN_BIN_EDGES):
+        return f">={fmt(RUN_BIN_EDGES[-1])}"
+    return f"{fmt(RUN_BIN_EDGES[i - 1])}-{fmt(RUN_BIN_EDGES[i])}"
+
+
+def _welford(stats, value):
+    stats["runs"] += 1
+    delta = value - stats["mean"]
+    stats["mean"] += delta / stats["runs"]
+    stats["m2"] += delta * (value - stats["mean"])
+
+
+def record_run(focus, app_name, seconds, start):
+    """记录一个结束的连续使用段；start 为可读的开始时间"""
+    if seconds <= 0:
+        return
+    _welford(focus, seconds)
+    focus["histogram"][bin_index(seconds)] += 1
+    if focus["longest"] is None or seconds > focus["longest"]["seconds"]:
+        focus["longest"] = {"app": app_name, "seconds": seconds, "start": start}
+    app = focus["apps"].get(app_name)
+    if app is None:
+        app = focus["apps"][app_name] = {"runs": 0, "mean": 0.0, "m2": 0.0, "longest": 0}
+    _welford(app, seconds)
+    if seconds > app["longest"]:
+        app["longest"] = seconds
+
+
+def with_open_run(focus, app_name, seconds, start):
+    """返回把尚未结束的连续使用段也计入后的副本（保存和查询当天数据用），不修改 focus"""
+    if seconds <= 0:
+        return focus
+    copy = dict(focus, histogram=list(focus["histogram"]), apps=dict(focus["apps"]))
+    if app_name in copy["apps"]:
+        copy["apps"][app_name] = dict(copy["apps"][app_name])
+    record_run(copy, app_name, seconds, start)
+    return copy
+
+
+# --- 合并 ---
+
+
+def _combine_welford(a, b):
+    """合并两组 Welford 统计（Chan 等人的并行算法）"""
+    n = a["runs"] + b["runs"]
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = b["mean"] - a["mean"]
+    mean = a["mean"] + delta * b["runs"] / n
+    m2 = a["m2"] + b["m2"] + delta * delta * a["runs"] * b["runs"] / n
+    return n, mean, m2
+
+
+def sum_focus(items):
+    """合并多份专注统计（不同主机或不同日期）；没有有效数据时返回 None"""
+    items = [f for f in items if is_focus(f)]
+    if not items:
+        return None
+    merged = empty_focus()
+    for focus in items:
+        merged["runs"], merged["mean"], merged["m2"] = _combine_welford(merged, focus)
+        merged["histogram"] = [a + b for a, b in zip(merged["histogram"], focus["histogram"])]
+        longest = focus["longest"]
+        if longest and (merged["longest"] is None or longest["seconds"] > merged["longest"]["seconds"]):
+            merged["longest"] = longest
+        for app_name, app in focus["apps"].items():
+            target = merged["apps"].setdefault(app_name, {"runs": 0, "mean": 0.0, "m2": 0.0, "longest": 0})
+            target["runs"], target["mean"], target["m2"] = _combine_welford(target, app)
+            target["longest"] = max(target["longest"], app["longest"])
+    return merged
+
+
+# --- 汇总 ---
+
+
+def _stddev(stats):
+    return math.sqrt(stats["m2"] / stats["runs"]) if stats["runs"] > 1 else 0.0
+
+
+def summarize(focus, day_timeline=None):
+    """生成报告和 /api/focus/ 使用的汇总；day_timeline 提供每个时段的切换次数"""
+    focus = focus if is_focus(focus) else empty_focus()
+    result = {
+        "runs": focus["runs"],
+        "mean_seconds": round(focus["mean"], 1),
+        "stddev_seconds": round(_stddev(focus), 1),
+        "longest": focus["longest"],
+        "histogram": [{"range": bin_label(i), "runs": count} for i, count in enumerate(focus["histogram"])],
+    }
+    apps = sorted(focus["apps"].items(), key=lambda item: item[1]["longest"], reverse=True)
+    result["apps"] = [{
+        "app": app_name,
+        "runs": app["runs"],
+        "mean_seconds": round(app["mean"], 1),
+        "stddev_seconds": round(_stddev(app), 1),
+        "longest_seconds": app["longest"],
+    } for app_name, app in apps[:SUMMARY_TOP_APPS]]
+
+    if isinstance(day_timeline, dict) and "switches" in day_timeline:
+        switches = day_timeline["switches"]
+        active_hours = sum(day_timeline.get("active", [])) / 3600
+        result["switches"] = {
+            "total": sum(switches),
+            "per_active_hour": round(sum(switches) / active_hours, 1) if active_hours else 0.0,
+            "bucket_minutes": day_timeline["bucket_minutes"],
+            "by_bucket": switches,
+        }
+    return result
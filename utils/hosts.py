@@ -0,0 +1,242 @@
+import os
+import re
+import gzip
+import json
+import zlib
+import datetime
+import threading
+
+from utils import categories
+from utils import focus
+from utils import schema
+from utils import timeline
+from utils.datastore import day_fingerprint, list_dates, month_of, read_day_bytes
+from utils.journal import SNAPSHOT_KEY
+
+# 多机汇总：远端 tracker 上报的数据保存在 Data/hosts/<host>/YYYY.mm/YYYYMMDD.data.json
+# 目录结构与本机 Data 完全一致，因此可以复用 datastore 的读取和归档逻辑
+
+HOSTS_SUBDIR = "hosts"
+LOCAL_HOST = "local"  # 本机数据（Data 根目录）的名字
+ALL_HOSTS = "all"
+HOST_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+DATE_PATTERN = re.compile(r"^\d{8}$")
+MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024  # 上报请求体解压后的上限，防止很小的压缩包展开成数 GB
+
+_ingest_lock = threading.Lock()
+
+
+class PayloadTooLarge(ValueError):
+    """上报请求体解压后超过上限"""
+
+
+def empty_day():
+    return {"sessions": [], "idle_seconds": 0, "apps": {}}
+
+
+def get_host_dir(data_dir, host):
+    """返回某个主机的数据目录，本机即 Data 根目录"""
+    if host == LOCAL_HOST:
+        return data_dir
+    return os.path.join(data_dir, HOSTS_SUBDIR, host)
+
+
+def list_hosts(data_dir):
+    """列出所有主机名（本机在最前）"""
+    hosts = [LOCAL_HOST]
+    hosts_dir = os.path.join(data_dir, HOSTS_SUBDIR)
+    if os.path.isdir(hosts_dir):
+        for item in sorted(os.listdir(hosts_dir)):
+            if HOST_PATTERN.match(item) and item != LOCAL_HOST and os.path.isdir(os.path.join(hosts_dir, item)):
+                hosts.append(item)
+    return hosts
+
+
+def resolve_hosts(data_dir, host_param):
+    """解析 ?host= 参数：缺省为本机，all 为全部主机，也可以用逗号分隔多个主机"""
+    if not host_param:
+        return [LOCAL_HOST]
+    known = list_hosts(data_dir)
+    if host_param == ALL_HOSTS:
+        return known
+    hosts = []
+    for host in host_param.split(","):
+        host = host.strip()
+        if host not in known:
+            raise ValueError(f"Unknown host: {host}")
+        if host not in hosts:
+            hosts.append(host)
+    return hosts
+
+
+# --- 合并 ---
+
+
+def snapshot_key(day):
+    """同一主机同一天两份快照的新旧：最后一个 session 的结束时间，相同时比较记入的总时长（使用 + 闲置）
+
+    tracker 的计数并非只增不减（闲置追溯改记会把已记入应用的时长扣除并记为闲置），
+    因此同一主机同一天只保留最新的一份快照，不逐字段合并。
+    """
+    ends = [s["end"] for s in day.get("sessions", []) if isinstance(s, dict) and isinstance(s.get("end"), str)]
+    tracked = day.get("idle_seconds", 0) + sum(app.get("total", 0) for app in day.get("apps", {}).values())
+    return max(ends, default=""), tracked
+
+
+def sum_days(days):
+    """把多份每日数据（不同主机或不同日期）累加成一份"""
+    merged = empty_day()
+    timelines = []
+    focuses = []
+    category_totals = []
+    for day in days:
+        if "timeline" in day:
+            timelines.append(day["timeline"])
+        if "focus" in day:
+            focuses.append(day["focus"])
+        if "categories" in day:
+            category_totals.append(day["categories"])
+        merged["sessions"].extend(day.get("sessions", []))
+        merged["idle_seconds"] += day.get("idle_seconds", 0)
+        for app_name, app_info in day.get("apps", {}).items():
+            target = merged["apps"].setdefault(app_name, {"total": 0, "titles": {}})
+            target["total"] += app_info.get("total", 0)
+            titles = target["titles"]
+            for title, seconds in app_info.get("titles", {}).items():
+                titles[title] = titles.get(title, 0) + seconds
+    merged_timeline = timeline.sum_timelines(timelines)
+    if merged_timeline is not None:
+        merged["timeline"] = merged_timeline
+    merged_focus = focus.sum_focus(focuses)
+    if merged_focus is not None:
+        merged["focus"] = merged_focus
+    merged_categories = categories.sum_categories(category_totals)
+    if merged_categories is not None:
+        merged["categories"] = merged_categories
+    return merged
+
+
+# --- 读取 ---
+
+
+def read_host_day(data_dir, host, date_str):
+    """读取某主机某天的数据，不存在时返回 None"""
+    raw = read_day_bytes(get_host_dir(data_dir, host), date_str)
+    if raw is None:
+        return None
+    return schema.decode_day(raw, check=False)
+
+
+def read_merged_day(data_dir, hosts, date_str, category_rules=None):
+    """读取并合并多个主机同一天的数据；只有一个主机时原样返回
+
+    给出 category_rules 时，没有分类统计的旧数据在合并前按规则补算。
+    """
+    days = []
+    for host in hosts:
+        day = read_host_day(data_dir, host, date_str)
+        if day is not None:
+            if category_rules is not None:
+                categories.ensure_categories(day, category_rules)
+            days.append(day)
+    if not days:
+        return None
+    if len(days) == 1:
+        return days[0]
+    return sum_days(days)
+
+
+def merged_day_fingerprint(data_dir, hosts, date_str):
+    """多个主机同一天数据的版本标识，用作缓存键"""
+    return tuple(day_fingerprint(get_host_dir(data_dir, host), date_str) for host in hosts)
+
+
+def list_host_dates(data_dir, hosts):
+    """多个主机的日期并集（倒序）"""
+    dates = set()
+    for host in hosts:
+        dates.update(list_dates(get_host_dir(data_dir, host)))
+    return sorted(dates, reverse=True)
+
+
+def iter_date_range(from_str, to_str, max_days=None):
+    """生成 [from, to] 闭区间内的 YYYYMMDD"""
+    start = datetime.datetime.strptime(from_str, "%Y%m%d").date()
+    end = datetime.datetime.strptime(to_str, "%Y%m%d").date()
+    if end < start:
+        raise ValueError("'to' is earlier than 'from'")
+    count = (end - start).days + 1
+    if max_days is not None and count > max_days:
+        raise ValueError(f"Range too large (max {max_days} days)")
+    for i in range(count):
+        yield (start + datetime.timedelta(days=i)).strftime("%Y%m%d")
+
+
+# --- 上报 ---
+
+
+def encode_payload(host, days):
+    """客户端：把 {YYYYMMDD: day_data} 打包成 gzip 压缩的上报请求体"""
+    body = json.dumps({"host": host, "days": days}, ensure_ascii=False, separators=(",", ":"))
+    return gzip.compress(body.encode("utf-8"))
+
+
+def _gunzip(body, max_bytes):
+    """流式解压 gzip，输出超过 max_bytes 时停止并抛出 PayloadTooLarge"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, max_bytes + 1)
+    except zlib.error as e:
+        raise ValueError(f"Invalid gzip body: {e}")
+    if len(data) > max_bytes or decompressor.unconsumed_tail:
+        raise PayloadTooLarge(f"Decompressed body exceeds {max_bytes} bytes")
+    if not decompressor.eof:
+        raise ValueError("Truncated gzip body")
+    if decompressor.unused_data:
+        raise ValueError("Unexpected data after the gzip stream")
+    return data
+
+
+def decode_payload(body, content_encoding=None, max_bytes=MAX_DECOMPRESSED_BYTES):
+    """服务端：解析上报请求体（支持 gzip 或未压缩 JSON）"""
+    if content_encoding == "gzip" or body[:2] == b"\x1f\x8b":
+        body = _gunzip(body, max_bytes)
+    payload = json.loads(body)
+    host = payload.get("host")
+    days = payload.get("days")
+    if not isinstance(host, str) or not HOST_PATTERN.match(host) or host in (LOCAL_HOST, ALL_HOSTS):
+        raise ValueError(f"Invalid host name: {host!r}")
+    if not isinstance(days, dict):
+        raise ValueError("'days' must be an object keyed by YYYYMMDD")
+    result = {}
+    for date_str, day in days.items():
+        if not DATE_PATTERN.match(date_str) or not isinstance(day, dict):
+            raise ValueError(f"Invalid day entry: {date_str!r}")
+        # 旧版本客户端上报的数据先迁移为当前格式；结构不正确（例如标题时长不是数字）时拒绝整个请求
+        try:
+            day = schema.migrate(day)
+            schema.validate(day)
+        except schema.SchemaError as e:
+            raise ValueError(f"Invalid day entry {date_str}: {e}")
+        result[date_str] = day
+    return host, result
+
+
+def apply_ingest(data_dir, body, content_encoding=None):
+    """把一次上报按 (host, date) 幂等地写入 Data/hosts：比已保存的快照更新时整天替换，否则忽略；返回写入的日期列表"""
+    host, days = decode_payload(body, content_encoding)
+    host_dir = get_host_dir(data_dir, host)
+    written = []
+    with _ingest_lock:
+        for date_str in sorted(days):
+            incoming = days[date_str]
+            # 预写日志的段号只对上报方本机有意义
+            incoming.pop(SNAPSHOT_KEY, None)
+            existing = read_host_day(data_dir, host, date_str)
+            if existing is not None and snapshot_key(existing) >= snapshot_key(incoming):
+                continue
+            month_dir = os.path.join(host_dir, month_of(date_str))
+            os.makedirs(month_dir, exist_ok=True)
+            schema.write_atomic(os.path.join(month_dir, f"{date_str}.data.json"), schema.encode_day(incoming))
+            written.append(date_str)
+    return {"host": host, "received": len(days), "written": written}
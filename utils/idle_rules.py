@@ -0,0 +1,180 @@
+import re
+import math
+from collections import deque
+
+from utils.config import number_setting
+
+# 闲置判定规则与状态机
+#
+# 配置项（statistics.configuration.json）：
+#   idleThresholdSeconds   默认闲置阈值（秒），系统闲置超过该值进入闲置，默认 60
+#   idleExempt             白名单应用，永不判定为闲置
+#   idleRules              按应用或标题的阈值，例如
+#                            {"app": "zoom.exe", "threshold": 1800}
+#                            {"title": "YouTube", "exempt": true}
+#                          标题规则按不区分大小写的子串匹配，优先于应用规则；多条命中时取配置中靠前的一条
+#   idleExitInputs         退出闲置需要检测到的输入次数，默认 2（设为 1 即恢复为有输入立即退出）
+#   idleExitWindowSeconds  上述输入需要落在的时间窗口，默认 30 秒
+#
+# 规则只在配置变化时编译一次：应用规则为 dict，标题规则合并为一个正则用于快速排除，
+# 结果按 (应用, 标题) 缓存，每次采样只需一次 dict 查询。
+
+DEFAULT_IDLE_THRESHOLD = 60
+DEFAULT_EXIT_INPUTS = 2
+DEFAULT_EXIT_WINDOW = 30
+NEVER_IDLE = math.inf
+MAX_MEMO_ENTRIES = 4096
+
+# IdleDetector.update() 的结果
+ACTIVE = "active"
+ENTER = "enter"      # 本次采样进入闲置
+IDLE = "idle"
+PENDING = "pending"  # 闲置中检测到输入，等待确认退出
+EXIT = "exit"        # 确认退出闲置
+
+
+class IdleRules:
+    """编译后的闲置阈值规则"""
+
+    def __init__(self, default_threshold=DEFAULT_IDLE_THRESHOLD, exempt_apps=(), rules=(), fuzzy_apps=False,
+                 log=None):
+        """格式不正确的白名单项和规则被跳过，并通过 log 回调记录"""
+        self.default_threshold = float(default_threshold)
+        # macOS 的应用名与配置中的名称不完全一致，使用双向子串匹配（仅在缓存未命中时执行）
+        self.fuzzy_apps = fuzzy_apps
+        self.app_thresholds = {}
+        for app in exempt_apps:
+            if isinstance(app, str):
+                self.app_thresholds[app.lower()] = NEVER_IDLE
+            elif log:
+                log(f"Ignoring invalid idleExempt entry: {app!r}")
+        self.title_rules = []
+        for rule in rules:
+            if not _valid_rule(rule):
+                if log:
+                    log(f"Ignoring invalid idle rule: {rule!r}")
+                continue
+            threshold = NEVER_IDLE if rule.get("exempt") else float(rule.get("threshold", default_threshold))
+            if rule.get("title"):
+                self.title_rules.append((rule["title"].lower(), threshold))
+            elif rule.get("app"):
+                self.app_thresholds[rule["app"].lower()] = threshold
+        self.title_pattern = None
+        if self.title_rules:
+            self.title_pattern = re.compile("|".join(re.escape(p) for p, _ in self.title_rules))
+        self._memo = {}
+
+    @classmethod
+    def from_config(cls, config, default_exempt=(), fuzzy_apps=False, log=None):
+        exempt = config.get("idleExempt") or default_exempt
+        if not isinstance(exempt, list):
+            if log:
+                log(f"Ignoring invalid idleExempt: {exempt!r}")
+            exempt = default_exempt
+        rules = config.get("idleRules") or ()
+        if not isinstance(rules, list):
+            if log:
+                log(f"Ignoring invalid idleRules: {rules!r}")
+            rules = ()
+        return cls(
+            number_setting(config, "idleThresholdSeconds", DEFAULT_IDLE_THRESHOLD, log),
+            exempt,
+            rules,
+            fuzzy_apps,
+            log
+        )
+
+    @property
+    def max_threshold(self):
+        """最大的有限阈值，决定需要保留多少秒的记账记录用于追溯"""
+        finite = [t for t in self.app_thresholds.values() if t != NEVER_IDLE]
+        finite += [t for _, t in self.title_rules if t != NEVER_IDLE]
+        return max([self.default_threshold] + finite)
+
+    def threshold(self, app_name, title):
+        """返回该窗口的闲置阈值（秒），白名单返回 NEVER_IDLE"""
+        key = (app_name, title)
+        cached = self._memo.get(key)
+        if cached is None:
+            if len(self._memo) >= MAX_MEMO_ENTRIES:
+                self._memo.clear()
+            cached = self._memo[key] = self._evaluate(app_name, title)
+        return cached
+
+    def _evaluate(self, app_name, title):
+        if title and self.title_pattern is not None:
+            lower = title.lower()
+            if self.title_pattern.search(lower):
+                for pattern, threshold in self.title_rules:
+                    if pattern in lower:
+                        return threshold
+        if app_name:
+            lower = app_name.lower()
+            threshold = self.app_thresholds.get(lower)
+            if threshold is not None:
+                return threshold
+            if self.fuzzy_apps:
+                for name, threshold in self.app_thresholds.items():
+                    if name in lower or lower in name:
+                        return threshold
+        return self.default_threshold
+
+
+def _valid_rule(rule):
+    """规则须为对象，按非空字符串的 title 或 app 匹配，threshold（如有）为非负数"""
+    if not isinstance(rule, dict):
+        return False
+    if any(key in rule and not isinstance(rule[key], str) for key in ("title", "app")):
+        return False
+    if not (rule.get("title") or rule.get("app")):
+        return False
+    return bool(rule.get("exempt")) or "threshold" not in rule or number_setting(rule, "threshold", None) is not None
+
+
+class IdleDetector:
+    """带滞回的闲置状态机
+
+    系统闲置时间超过阈值时进入闲置；闲置期间需要在 exit_window 秒内检测到 exit_inputs 次输入
+    （闲置时间归零或变小）才退出，避免一次误触就产生 Idle End / Idle Start 交替的日志。
+    前台切换到白名单应用时立即退出。
+    """
+
+    def __init__(self, exit_inputs=DEFAULT_EXIT_INPUTS, exit_window=DEFAULT_EXIT_WINDOW):
+        self.exit_inputs = max(1, int(exit_inputs))
+        self.exit_window = exit_window
+        self.idle = False
+        self.last_idle_duration = 0.0
+        self.inputs = deque()  # 闲置期间检测到输入的时间
+
+    def update(self, now_ts, idle_duration, threshold):
+        had_input = idle_duration < 1 or idle_duration < self.last_idle_duration
+        self.last_idle_duration = idle_duration
+
+        if not self.idle:
+            if idle_duration > threshold:
+                self.idle = True
+                self.inputs.clear()
+                return ENTER
+            return ACTIVE
+
+        if threshold == NEVER_IDLE:
+            return self._exit()
+        if had_input:
+            self.inputs.append(now_ts)
+        while self.inputs and now_ts - self.inputs[0] >= self.exit_window:
+            self.inputs.popleft()
+        if len(self.inputs) >= self.exit_inputs:
+            return self._exit()
+        return PENDING if self.inputs else IDLE
+
+    @classmethod
+    def from_config(cls, config, log=None):
+        return cls(
+            number_setting(config, "idleExitInputs", DEFAULT_EXIT_INPUTS, log),
+            number_setting(config, "idleExitWindowSeconds", DEFAULT_EXIT_WINDOW, log),
+        )
+
+    def _exit(self):
+        self.idle = False
+        self.inputs.clear()
+        return EXIT
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+
+from utils import categories
+from utils import focus
+from utils import timeline
+
+# 预写日志：两次快照（每 30 秒的 save_data）之间记入的数据先逐秒追加到日志，崩溃或断电后
+# 在最后一次快照的基础上重放日志尾部，并把上一个 session 结束在最后一次心跳而不是最后一次快照。
+#
+# 日志分段保存在 Data/journal/<段号>.jsonl，每次快照时切换到新的一段，快照文件的 "journal" 字段
+# 记录快照之后的第一段的段号；快照写入成功后删除更早的段，正常退出时删除全部日志。
+# 因此重放的只是最后一次快照之后的几十行，耗时与数据文件大小无关。
+#
+# 每段第一行为段头，之后每次采样一行（同时作为心跳）：
+#   {"date": "YYYYMMDD", "session_start": 时间戳, "focus": {...}, "run": [...]}
+#       focus/run 仅在快照时有未结束的连续使用段时出现：快照中已计入该段，focus 为不含该段的专注统计，
+#       run 为该段当时的状态，重放时由日志继续这一段
+#   [时间戳, [操作, ...], 未结束的连续使用段 [app, 开始时间戳, 秒数] 或 null]
+# 操作与 tracker 的记账函数一一对应：
+#   ["a", app, title, 秒, 桶, 分类]   记入使用    ["u", app, title, 秒, 桶, 分类]   撤销使用（闲置追溯改记）
+#   ["i", 秒, 桶]               记入闲置        ["s", 桶]                   应用切换
+#   ["r", app, 秒, "开始时间"]   结束一个连续使用段
+# 写入时只 flush 到操作系统，每 SYNC_INTERVAL 秒（真实时间）fsync 一次；最后一行写了一半时重放会忽略它。
+
+JOURNAL_SUBDIR = "journal"
+SNAPSHOT_KEY = "journal"  # 快照文件中记录重放起点段号的字段
+SEGMENT_SUFFIX = ".jsonl"
+SYNC_INTERVAL = 5.0
+
+
+def journal_dir(data_dir):
+    return os.path.join(data_dir, JOURNAL_SUBDIR)
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def list_segments(directory):
+    """已有的段号（升序）"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    ids = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext == SEGMENT_SUFFIX and stem.isdigit():
+            ids.append(int(stem))
+    return sorted(ids)
+
+
+def read_segment(path):
+    """返回 (段头, [记录, ...])；段头缺失或损坏时返回 (None, [])，写了一半的行之后的内容被忽略"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+    except OSError:
+        return None, []
+    try:
+        header = json.loads(lines[0])
+    except ValueError:
+        return None, []
+    if not isinstance(header, dict) or "date" not in header:
+        return None, []
+    records = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            break
+        if not isinstance(record, list) or len(record) != 3:
+            break
+        records.append(record)
+    return header, records
+
+
+class Journal:
+    """tracker 的预写日志；所有方法由持有 data_lock 的调用方调用"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.segment = None
+        self.pending = []
+        self._file = None
+        self._last_sync = time.monotonic()
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"{segment}{SEGMENT_SUFFIX}")
+
+    def open(self, segment, date_str, session_start, closed_focus=None, run=None):
+        """开始新的一段（之前打开的段被关闭但保留，由 commit 删除）；返回段号"""
+        self._close_file()
+        os.makedirs(self.directory, exist_ok=True)
+        header = {"date": date_str, "session_start": session_start}
+        if run:
+            header["focus"] = closed_focus
+            header["run"] = list(run)
+        self._file = open(self._path(segment), "w", encoding="utf-8")
+        self._file.write(_dumps(header) + "\n")
+        self._file.flush()
+        self.segment = segment
+        return segment
+
+    def rotate(self, date_str, session_start, closed_focus=None, run=None):
+        """快照时调用：尚未写出的操作留在旧的一段（快照已包含它们），返回新一段的段号"""
+        if self.pending:
+            self.tick(None, None)
+        return self.open(self.segment + 1, date_str, session_start, closed_focus, run)
+
+    def record(self, op):
+        self.pending.append(op)
+
+    def tick(self, ts, run):
+        """写出一次采样的操作和心跳"""
+        if self._file is None:
+            self.pending.clear()
+            return
+        ops, self.pending = self.pending, []
+        try:
+            self._file.write(_dumps([ts, ops, run]) + "\n")
+            self._file.flush()
+            if time.monotonic() - self._last_sync >= SYNC_INTERVAL:
+                os.fsync(self._file.fileno())
+                self._last_sync = time.monotonic()
+        except (OSError, ValueError):
+            pass
+
+    def commit(self, segment):
+        """快照（其 journal 字段为 segment）已写入：删除更早的段"""
+        for old in list_segments(self.directory):
+            if old < segment:
+                try:
+                    os.remove(self._path(old))
+                except OSError:
+                    pass
+
+    def close(self, remove=True):
+        """正常退出：最终快照已写入，删除全部日志"""
+        self._close_file()
+        self.segment = None
+        self.pending.clear()
+        if remove:
+            self.commit(float("inf"))
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+
+# --- 重放 ---
+
+
+def _apply_op(day, op):
+    """对一天的数据重放一个操作，与 tracker 的记账函数保持一致"""
+    kind = op[0]
+    if kind == "a":
+        _, app_name, title, seconds, bucket, category = op
+        app = day["apps"].setdefault(app_name, {"total": 0, "titles": {}})
+        app["titles"][title] = app["titles"].get(title, 0) + seconds
+        app["total"] += seconds
+        timeline.add_active(day["timeline"], bucket, app_name, seconds)
+        categories.add(day["categories"], category, seconds)
+    elif kind == "u":
+        _, app_name, title, seconds, bucket, category = op
+        app = day["apps"].get(app_name)
+        if app is None or title not in app["titles"]:
+            return
+        seconds = min(seconds, app["titles"][title])
+        app["titles"][title] -= seconds
+        app["total"] -= seconds
+        timeline.remove_active(day["timeline"], bucket, app_name, seconds)
+        categories.add(day["categories"], category, -seconds)
+        if app["titles"][title] <= 0:
+            del app["titles"][title]
+        if not app["titles"]:
+            del day["apps"][app_name]
+    elif kind == "i":
+        _, seconds, bucket = op
+        day["idle_seconds"] += seconds
+        timeline.add_idle(day["timeline"], bucket, seconds)
+    elif kind == "s":
+        timeline.add_switch(day["timeline"], op[1])
+    elif kind == "r":
+        _, app_name, seconds, start = op
+        focus.record_run(day["focus"], app_name, seconds, start)
+
+
+def replay(day, segments, format_timestamp):
+    """在快照 day 上重放同一天的若干段 [(段头, 记录), ...]（按段号升序），原地修改并返回
+
+    最后一个未结束的连续使用段按最后一次心跳结束；每段的 session 结束在该段最后一次心跳，
+    与快照中开始时间相同的 session 被延长，否则追加。
+    """
+    run = None
+    for i, (header, records) in enumerate(segments):
+        if i == 0 and header.get("run"):
+            # 快照中的专注统计已计入当时未结束的一段，换成不含该段的版本，由日志继续该段
+            day["focus"] = header["focus"]
+            run = header["run"]
+        last_beat = None
+        for ts, ops, tick_run in records:
+            for op in ops:
+                _apply_op(day, op)
+            if ts is not None:
+                last_beat = ts
+                run = tick_run
+        if last_beat is not None:
+            _close_session(day, format_timestamp(header["session_start"]), format_timestamp(last_beat))
+    if run:
+        focus.record_run(day["focus"], run[0], run[2], format_timestamp(run[1]))
+    return day
+
+
+def _close_session(day, start, end):
+    for session in reversed(day["sessions"]):
+        if session["start"] == start:
+            session["end"] = max(session["end"], end)
+            return
+    day["sessions"].append({"start": start, "end": end})
+
+
+def pending_segments(directory):
+    """按日期分组的全部日志段：{date: [(段号, 段头, 记录), ...]}"""
+    by_date = {}
+    for segment in list_segments(directory):
+        header, records = read_segment(os.path.join(directory, f"{segment}{SEGMENT_SUFFIX}"))
+        if header is None:
+            continue
+        by_date.setdefault(header["date"], []).append((segment, header, records))
+    return by_date
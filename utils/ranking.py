@@ -0,0 +1,58 @@
+import heapq
+
+# 增量维护的排行，供托盘快速统计使用：读取时不需要对全部应用重新排序
+
+
+class TopCounter:
+    """维护所有条目总量之和与前 k 名
+
+    计数增加时在 O(k) 内更新前 k 名；前 k 名中的条目减少时（闲置追溯改记）只标记失效，
+    下次读取时再用 source() 重新计算。调用方负责加锁。
+    """
+
+    def __init__(self, source, k=5):
+        self.source = source  # 返回 (key, total) 可迭代对象
+        self.k = k
+        self.reset()
+
+    def reset(self):
+        """按 source() 的当前内容重建（启动加载数据、跨天清空后调用）"""
+        entries = list(self.source())
+        self.sum = sum(total for _, total in entries)
+        self._top = heapq.nlargest(self.k, entries, key=lambda e: e[1])
+        self._dirty = False
+
+    def add(self, key, delta, total):
+        """key 的计数变化了 delta，变化后的总量为 total"""
+        self.sum += delta
+        if self._dirty:
+            return
+        top = self._top
+        for i, (name, _) in enumerate(top):
+            if name == key:
+                if delta < 0:
+                    self._dirty = True
+                    return
+                top[i] = (key, total)
+                self._bubble(i)
+                return
+        if delta < 0:
+            return
+        if len(top) < self.k:
+            top.append((key, total))
+            self._bubble(len(top) - 1)
+        elif total > top[-1][1]:
+            top[-1] = (key, total)
+            self._bubble(len(top) - 1)
+
+    def _bubble(self, i):
+        top = self._top
+        while i > 0 and top[i - 1][1] < top[i][1]:
+            top[i - 1], top[i] = top[i], top[i - 1]
+            i -= 1
+
+    def top(self):
+        if self._dirty:
+            self._top = heapq.nlargest(self.k, self.source(), key=lambda e: e[1])
+            self._dirty = False
+        return list(self._top)
@@ -0,0 +1,97 @@
+import datetime
+
+from utils import categories
+from utils import focus
+from utils import schema
+
+# 每日汇总报告 (YYYYMMDD.report.txt) 的文本格式；tracker 每次保存时为当天生成，
+# backfill_data.py 为历史数据重新生成
+
+
+def format_duration(seconds):
+    """格式化时间 H:M:S"""
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h}:{m}:{s}"
+
+
+def session_timestamps(day):
+    """把 sessions 转换为 [[start_ts, end_ts], ...]，无法解析的条目被跳过"""
+    result = []
+    for session in day.get("sessions", []):
+        try:
+            start_ts = datetime.datetime.strptime(session["start"], schema.TIMESTAMP_FORMAT).timestamp()
+            end_ts = datetime.datetime.strptime(session["end"], schema.TIMESTAMP_FORMAT).timestamp()
+        except (KeyError, TypeError, ValueError):
+            continue
+        result.append([start_ts, end_ts])
+    return result
+
+
+def render(day, sessions_ts, day_focus, format_timestamp):
+    """生成报告文本；sessions_ts 为包含当前 session 的时间戳对，day_focus 为包含未结束连续使用段的专注统计"""
+    if not sessions_ts:
+        return None
+
+    # 1. 计算开机时间 (最早的 session start)
+    first_boot_str = format_timestamp(min(s[0] for s in sessions_ts))
+
+    # 2. 计算关机时间 (最晚的 session end)
+    last_shutdown_str = format_timestamp(max(s[1] for s in sessions_ts))
+
+    # 3. 共使用 (所有 session 差值之和)
+    total_used_sec = sum(s[1] - s[0] for s in sessions_ts)
+
+    # 4. 闲置
+    idle_sec = day["idle_seconds"]
+
+    lines = []
+    lines.append(f"开机时间:{first_boot_str}")
+    lines.append(f"关机时间:{last_shutdown_str}")
+    lines.append(f"共使用: {format_duration(total_used_sec)}")
+    lines.append(f"闲置: {format_duration(idle_sec)}")
+    lines.append("-" * 30)
+    lines.append("应用程序使用详情 (按时长倒序):")
+
+    # 5. 排序应用
+    apps_list = []
+    for app_name, app_info in day["apps"].items():
+        # 重新计算该APP总时长，确保数据一致性
+        total_time = sum(app_info["titles"].values())
+        apps_list.append((app_name, total_time, app_info["titles"]))
+
+    # 倒序排列
+    apps_list.sort(key=lambda x: x[1], reverse=True)
+
+    for app_name, total_time, titles in apps_list:
+        lines.append(f"{app_name} {format_duration(total_time)}")
+        # 排序子节点 (Title)
+        sorted_titles = sorted(titles.items(), key=lambda item: item[1], reverse=True)
+        for title, t_time in sorted_titles:
+            lines.append(f"    {title} {format_duration(t_time)}")
+
+    # 6. 分类统计
+    lines.append("-" * 30)
+    lines.append("分类统计:")
+    for name, seconds in categories.sort_categories(day.get("categories", {})).items():
+        lines.append(f"{name} {format_duration(seconds)}")
+
+    # 7. 专注统计（应用切换与连续使用段）
+    summary = focus.summarize(day_focus, day.get("timeline"))
+    lines.append("-" * 30)
+    lines.append("专注统计:")
+    if "switches" in summary:
+        lines.append(f"应用切换: {summary['switches']['total']} 次 (每使用小时 {summary['switches']['per_active_hour']} 次)")
+    lines.append(f"连续使用段: {summary['runs']} 段, 平均 {format_duration(summary['mean_seconds'])}, "
+                 f"标准差 {format_duration(summary['stddev_seconds'])}")
+    if summary["longest"]:
+        longest = summary["longest"]
+        lines.append(f"最长连续使用: {longest['app']} {format_duration(longest['seconds'])} (开始于 {longest['start']})")
+    lines.append("连续使用段时长分布:")
+    for item in summary["histogram"]:
+        lines.append(f"    {item['range']} {item['runs']}")
+    lines.append("各应用最长连续使用:")
+    for item in summary["apps"]:
+        lines.append(f"    {item['app']} {format_duration(item['longest_seconds'])} "
+                     f"({item['runs']} 段, 平均 {format_duration(item['mean_seconds'])})")
+    return "\n".join(lines)
@@ -0,0 +1,74 @@
+from utils import idle_rules
+from utils.config import number_setting
+
+# 自适应采样间隔：长时间闲置（锁屏、离开）或前台窗口长时间不变且没有输入（阅读、看视频）时
+# 逐步拉长两次采样之间的休眠，采样时发现有过输入或窗口变化时立即恢复每秒采样。
+#
+# 配置项（statistics.configuration.json）：
+#   samplingMaxIdleSeconds     闲置期间的最长采样间隔，默认 30
+#   samplingMaxActiveSeconds   前台窗口不变时的最长采样间隔，默认 4
+#   samplingStableSeconds      前台窗口保持不变多少秒后才开始拉长间隔，默认 60
+#   samplingInputCheckSeconds  间隔长于该值时，每隔这么多秒只读取一次系统闲置时间检查有没有输入，默认 5
+#   samplingBatteryFactor      使用电池时上述最长间隔与检查间隔乘以该系数，默认 2
+# 两个最长间隔都设为 1 即恢复为固定每秒采样。
+#
+# 间隔按 1、2、4… 秒翻倍增长到上限。tracker 按两次采样之间实际经过的秒数记账（见 tracker_core.process_sample），
+# 间隔拉长不影响各项时长之和。间隔内没有输入时，闲置期间每一秒都确定是闲置，窗口不变期间每一秒都确定属于该窗口；
+# 间隔内有输入时系统闲置时间给出最后一次输入的时刻，窗口切换和退出闲置的确认都按该时刻拆分记账。
+# 长间隔中途的输入检查（tracker_core.sleep_until_next_sample）只读取闲置时间、不读窗口也不记账，发现输入就提前采样，
+# 因此退出闲置最多晚一个检查间隔被观察到：这段时间内第一次输入到最后一次输入之间的几秒记为闲置，
+# 误差不超过检查间隔（默认 5 秒，使用电池时 10 秒）。使用期间的窗口切换按最后一次输入拆分，
+# 误差不超过 samplingMaxActiveSeconds - 1 秒；没有输入的来回切换（弹窗抢走焦点又很快关闭）以及退出时
+# 最后一个间隔内尚未记入的几秒无法观察到。benchmarks/run_benchmarks.py 的 monitor_loop[adaptive] 用例
+# 回放同一轨迹，检查与每秒采样的差异不超过上述范围，以及闲置期间和使用电池时唤醒次数确实减少。
+
+DEFAULT_MAX_IDLE_INTERVAL = 30
+DEFAULT_MAX_ACTIVE_INTERVAL = 4
+DEFAULT_STABLE_SECONDS = 60
+DEFAULT_INPUT_CHECK_SECONDS = 5
+DEFAULT_BATTERY_FACTOR = 2
+
+
+class AdaptiveSampler:
+    """根据闲置状态、前台窗口和供电状态决定下一次采样前的休眠秒数"""
+
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE_INTERVAL, max_active=DEFAULT_MAX_ACTIVE_INTERVAL,
+                 stable_seconds=DEFAULT_STABLE_SECONDS, battery_factor=DEFAULT_BATTERY_FACTOR,
+                 input_check=DEFAULT_INPUT_CHECK_SECONDS):
+        self.max_idle = max(1, int(max_idle))
+        self.max_active = max(1, int(max_active))
+        self.stable_seconds = max(0, stable_seconds)
+        self.battery_factor = max(1, int(battery_factor))
+        self.input_check_seconds = max(1, int(input_check))
+        self.interval = 1
+        self.input_check = self.input_check_seconds  # 本次间隔内检查输入的间隔（秒），随供电状态变化
+        self.window = None
+        self.window_since = None
+
+    @classmethod
+    def from_config(cls, config, log=None):
+        return cls(
+            number_setting(config, "samplingMaxIdleSeconds", DEFAULT_MAX_IDLE_INTERVAL, log),
+            number_setting(config, "samplingMaxActiveSeconds", DEFAULT_MAX_ACTIVE_INTERVAL, log),
+            number_setting(config, "samplingStableSeconds", DEFAULT_STABLE_SECONDS, log),
+            number_setting(config, "samplingBatteryFactor", DEFAULT_BATTERY_FACTOR, log),
+            number_setting(config, "samplingInputCheckSeconds", DEFAULT_INPUT_CHECK_SECONDS, log),
+        )
+
+    def next_interval(self, now_ts, state, window, had_input, on_battery=False):
+        """state 为本次采样 IdleDetector 的结果，window 为 (应用, 标题)，had_input 为距上一次采样期间是否有过输入；
+        返回下一次采样前的休眠秒数"""
+        if window != self.window or self.window_since is None:
+            self.window = window
+            self.window_since = now_ts
+        factor = self.battery_factor if on_battery else 1
+        if state == idle_rules.IDLE:
+            limit = self.max_idle * factor
+        elif state == idle_rules.ACTIVE and window[0] and not had_input \
+                and now_ts - self.window_since >= self.stable_seconds:
+            limit = self.max_active * factor
+        else:
+            limit = 1
+        self.interval = min(self.interval * 2, limit)
+        self.input_check = self.input_check_seconds * factor
+        return self.interval
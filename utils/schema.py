@@ -0,0 +1,229 @@
+import os
+import json
+import datetime
+import tempfile
+
+from utils import categories
+from utils import focus
+from utils import timeline
+
+# 每日数据文件 (YYYYMMDD.data.json) 的版本化格式
+#
+# 版本 2（当前）：
+#   {
+#       "schema": 2,                                   # 文件头，始终为第一个字段
+#       "sessions": [{"start": "YYYY-mm-dd HH:MM:SS", "end": "..."}, ...],
+#       "idle_seconds": 0,
+#       "apps": {"exe_name": {"total": 0, "titles": {"title": seconds}}},
+#       "timeline": {...},                             # 可选，按时段的统计，见 utils/timeline.py
+#       "focus": {...},                                # 可选，连续使用段的统计，见 utils/focus.py
+#       "categories": {"coding": 秒, ...},             # 可选，各分类的使用时长，见 utils/categories.py
+#       "journal": 0                                   # 可选，快照之后的预写日志段号，见 utils/journal.py
+#   }
+# 版本 1（没有 schema 字段的旧文件）：sessions 中可能混有 [start_ts, end_ts] 形式的时间戳对。
+#
+# 当前版本的文件直接使用，不再逐条判断旧格式；旧文件在读取时迁移到当前版本
+# （可用 migrate_data.py 一次性迁移整个 Data 目录）。无法解析或结构不正确的文件会被改名隔离，
+# 而不是被静默丢弃后覆盖。
+# 安装了 orjson 时自动使用它编解码，否则使用标准库 json。
+
+SCHEMA_KEY = "schema"
+SCHEMA_VERSION = 2
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+QUARANTINE_SUFFIX = ".corrupt"
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class SchemaError(ValueError):
+    """数据文件结构不正确或版本不受支持"""
+
+
+# --- 编解码 ---
+
+
+def _json_loads(raw):
+    return json.loads(raw)
+
+
+# 两种实现的输出逐字节相同（orjson 只支持 2 个空格的缩进），文件内容、大小及二进制每日数据的版本标识
+# 不取决于是否安装了 orjson。两者对 [1e-4, 1e16) 以外的浮点数格式不同；数据文件中的浮点数只有
+# 专注统计的 mean / m2，由整数秒计算，始终落在该范围内（或为 0.0）。
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+
+CODECS = {"json": (_json_loads, _json_dumps)}
+if ORJSON_AVAILABLE:
+    CODECS["orjson"] = (orjson.loads, _orjson_dumps)
+
+codec = "orjson" if ORJSON_AVAILABLE else "json"
+loads, dumps = CODECS[codec]
+
+
+def use_codec(name):
+    """切换编解码实现（基准测试对比用）"""
+    global codec, loads, dumps
+    loads, dumps = CODECS[name]
+    codec = name
+
+
+# --- 迁移与校验 ---
+
+
+def _format_timestamp(ts):
+    return datetime.datetime.fromtimestamp(ts).strftime(TIMESTAMP_FORMAT)
+
+
+def migrate(data):
+    """把旧版本的数据升级为当前版本（原地修改并返回）"""
+    if not isinstance(data, dict):
+        raise SchemaError("Day data must be a JSON object")
+    version = data.get(SCHEMA_KEY, 1)
+    if not isinstance(version, int) or version > SCHEMA_VERSION:
+        raise SchemaError(f"Unsupported schema version: {version!r}")
+
+    if version < 2:
+        sessions = []
+        legacy_sessions = data.get("sessions") or []
+        if not isinstance(legacy_sessions, list):
+            raise SchemaError("'sessions' must be a list")
+        for session in legacy_sessions:
+            if isinstance(session, list) and len(session) == 2:
+                if not all(isinstance(ts, (int, float)) and not isinstance(ts, bool) for ts in session):
+                    raise SchemaError(f"Invalid session: {session!r}")
+                try:
+                    sessions.append({"start": _format_timestamp(session[0]), "end": _format_timestamp(session[1])})
+                except (ValueError, OverflowError, OSError) as e:
+                    raise SchemaError(f"Invalid session: {session!r}") from e
+            elif isinstance(session, dict) and "start" in session and "end" in session:
+                sessions.append({"start": session["start"], "end": session["end"]})
+        data["sessions"] = sessions
+        data.setdefault("idle_seconds", 0)
+        apps = data.setdefault("apps", {})
+        if not isinstance(apps, dict):
+            raise SchemaError("'apps' must be an object")
+        for app_name, app_info in apps.items():
+            if not isinstance(app_info, dict) or not isinstance(app_info.setdefault("titles", {}), dict):
+                raise SchemaError(f"Invalid app entry: {app_name!r}")
+            titles = app_info["titles"]
+            if not all(isinstance(v, (int, float)) for v in titles.values()):
+                raise SchemaError(f"Invalid title seconds in {app_name!r}")
+            app_info["total"] = sum(titles.values())
+
+    # 文件头放在第一个字段
+    upgraded = {SCHEMA_KEY: SCHEMA_VERSION}
+    upgraded.update((k, v) for k, v in data.items() if k != SCHEMA_KEY)
+    return upgraded
+
+
+def validate(data):
+    """检查当前版本数据的结构，不正确时抛出 SchemaError"""
+    if data.get(SCHEMA_KEY) != SCHEMA_VERSION:
+        raise SchemaError(f"Expected schema {SCHEMA_VERSION}, got {data.get(SCHEMA_KEY)!r}")
+    sessions = data.get("sessions")
+    if not isinstance(sessions, list):
+        raise SchemaError("'sessions' must be a list")
+    for session in sessions:
+        if not isinstance(session, dict) or not isinstance(session.get("start"), str) \
+                or not isinstance(session.get("end"), str):
+            raise SchemaError(f"Invalid session: {session!r}")
+    if not isinstance(data.get("idle_seconds"), (int, float)):
+        raise SchemaError("'idle_seconds' must be a number")
+    apps = data.get("apps")
+    if not isinstance(apps, dict):
+        raise SchemaError("'apps' must be an object")
+    for app_name, app_info in apps.items():
+        if not isinstance(app_info, dict) or not isinstance(app_info.get("total"), (int, float)) \
+                or not isinstance(app_info.get("titles"), dict):
+            raise SchemaError(f"Invalid app entry: {app_name!r}")
+        for seconds in app_info["titles"].values():
+            if not isinstance(seconds, (int, float)):
+                raise SchemaError(f"Invalid title seconds in {app_name!r}")
+    if "timeline" in data and not timeline.is_timeline(data["timeline"]):
+        raise SchemaError("Invalid 'timeline'")
+    if "focus" in data and not focus.is_focus(data["focus"]):
+        raise SchemaError("Invalid 'focus'")
+    if "categories" in data and not categories.is_categories(data["categories"]):
+        raise SchemaError("Invalid 'categories'")
+    if "journal" in data and (not isinstance(data["journal"], int) or isinstance(data["journal"], bool)):
+        raise SchemaError("'journal' must be an integer")
+
+
+def decode_day(raw, check=True):
+    """解析一天的数据并返回当前版本的结构
+
+    当前版本的文件不经过迁移；check=False 时也跳过结构校验（只读展示的场景）。
+    """
+    try:
+        data = loads(raw)
+    except ValueError as e:
+        raise SchemaError(f"Invalid JSON: {e}") from e
+    if isinstance(data, dict) and data.get(SCHEMA_KEY) == SCHEMA_VERSION:
+        if check:
+            validate(data)
+        return data
+    data = migrate(data)
+    validate(data)
+    return data
+
+
+def encode_day(data):
+    """序列化为当前版本（文件头在第一个字段）"""
+    if next(iter(data), None) != SCHEMA_KEY or data[SCHEMA_KEY] != SCHEMA_VERSION:
+        data = {SCHEMA_KEY: SCHEMA_VERSION, **{k: v for k, v in data.items() if k != SCHEMA_KEY}}
+    return dumps(data)
+
+
+# --- 文件 ---
+
+
+def write_atomic(path, content):
+    """写入同目录下的临时文件后替换 path。临时文件名唯一：tracker 与 server 会改写同一个文件
+    （例如周期汇总），两个进程不能共用一个临时文件"""
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def quarantine(path):
+    """把损坏的文件改名隔离（YYYYMMDD.data.json.corrupt-时间戳），返回新路径"""
+    stamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    target = f"{path}{QUARANTINE_SUFFIX}-{stamp}"
+    os.replace(path, target)
+    return target
+
+
+def load_day_file(path, log=None):
+    """读取一天的数据文件；不存在时返回 None，损坏时隔离该文件并返回 None"""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        return decode_day(raw)
+    except SchemaError as e:
+        target = quarantine(path)
+        if log:
+            log(f"Quarantined corrupt data file {os.path.basename(path)} -> {os.path.basename(target)}: {e}")
+        return None
@@ -0,0 +1,238 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+
+from utils import schema
+from utils.datastore import day_fingerprint, fingerprint_key, list_dates, read_day_bytes
+from utils.hosts import LOCAL_HOST, get_host_dir, list_hosts
+
+# 窗口标题全文检索："某个文件是哪几天在处理的" 不再需要逐个解析 Data 下所有的数据文件
+#
+# 索引保存在 Data/search.index.sqlite：
+#   entries       每个 (主机, 日期, 应用, 标题) 一行及其时长
+#   entries_fts   entries 的 FTS5 外部内容索引（app, title），由触发器同步
+#   indexed_days  已索引的 (主机, 日期) 及其数据文件的版本标识
+# 索引按天增量更新：只重新索引版本标识变化了的日期（tracker 在跨天时后台更新，
+# server 在搜索前最多每 REFRESH_INTERVAL 秒检查一次，因此当天的数据也能搜到）。
+# 有 trigram 分词器（SQLite 3.34+）时按子串匹配，中文标题也能检索；不足 3 个字符的词退回 LIKE。
+
+INDEX_FILE_NAME = "search.index.sqlite"
+REFRESH_INTERVAL = 60.0
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+MIN_DATE = "00000000"
+MAX_DATE = "99999999"
+DATE_PATTERN = re.compile(r"^\d{8}$")
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL,
+    date TEXT NOT NULL,
+    app TEXT NOT NULL,
+    title TEXT NOT NULL,
+    seconds INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_host_date ON entries(host, date);
+CREATE INDEX IF NOT EXISTS entries_date ON entries(date);
+CREATE TABLE IF NOT EXISTS indexed_days (
+    host TEXT NOT NULL,
+    date TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (host, date)
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts(rowid, app, title) VALUES (new.id, new.app, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, app, title) VALUES ('delete', old.id, old.app, old.title);
+END;
+"""
+# 先由 FTS 取出命中的行号，再按日期和主机过滤（直接 JOIN 时 SQLite 可能按日期索引逐行做 MATCH）
+FTS_FILTER = "e.id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)"
+FTS_SQL = "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(app, title, content='entries', content_rowid='id', tokenize='{}')"
+
+
+def index_path(data_dir):
+    return os.path.join(data_dir, INDEX_FILE_NAME)
+
+
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SearchIndex:
+    """某个数据目录的全文索引；每次操作使用独立的连接，可在多个线程中使用"""
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.path = index_path(data_dir)
+        self.trigram = None
+        self._update_lock = threading.Lock()
+        self._last_refresh = None
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if self.trigram is None:
+            row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'entries_fts'").fetchone()
+            if row is None:
+                try:
+                    conn.execute(FTS_SQL.format("trigram"))
+                except sqlite3.OperationalError:
+                    conn.execute(FTS_SQL.format("unicode61"))
+                row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'entries_fts'").fetchone()
+            conn.executescript(SCHEMA_SQL)
+            self.trigram = "trigram" in row[0]
+        return conn
+
+    # --- 增量更新 ---
+
+    def update(self, hosts=None, log=None):
+        """重新索引版本标识有变化的日期，删除已不存在的日期；返回重新索引的天数"""
+        with self._update_lock:
+            conn = self.connect()
+            try:
+                return self._update(conn, hosts or list_hosts(self.data_dir), log)
+            finally:
+                conn.close()
+
+    def _update(self, conn, hosts, log):
+        updated = 0
+        for host in hosts:
+            host_dir = get_host_dir(self.data_dir, host)
+            known = dict(conn.execute("SELECT date, fingerprint FROM indexed_days WHERE host = ?", (host,)))
+            dates = list_dates(host_dir)
+            for date_str in dates:
+                fingerprint = day_fingerprint(host_dir, date_str)
+                if fingerprint is None:
+                    continue
+                key = fingerprint_key(fingerprint)
+                if known.get(date_str) == key:
+                    continue
+                try:
+                    raw = read_day_bytes(host_dir, date_str)
+                    day = schema.decode_day(raw, check=False) if raw is not None else None
+                except (OSError, KeyError, schema.SchemaError) as e:
+                    # 文件正在被归档或已损坏：跳过，下次更新时重试
+                    if log:
+                        log(f"Search index skipped {host}/{date_str}: {e}")
+                    continue
+                if day is None:
+                    continue
+                rows = [(host, date_str, app_name, title, int(seconds))
+                        for app_name, app_info in day.get("apps", {}).items()
+                        for title, seconds in app_info.get("titles", {}).items()]
+                with conn:
+                    conn.execute("DELETE FROM entries WHERE host = ? AND date = ?", (host, date_str))
+                    conn.executemany(
+                        "INSERT INTO entries(host, date, app, title, seconds) VALUES (?, ?, ?, ?, ?)", rows)
+                    conn.execute("INSERT OR REPLACE INTO indexed_days(host, date, fingerprint) VALUES (?, ?, ?)",
+                                 (host, date_str, key))
+                updated += 1
+            removed = set(known) - set(dates)
+            if removed:
+                with conn:
+                    for date_str in removed:
+                        conn.execute("DELETE FROM entries WHERE host = ? AND date = ?", (host, date_str))
+                        conn.execute("DELETE FROM indexed_days WHERE host = ? AND date = ?", (host, date_str))
+        return updated
+
+    def refresh(self):
+        """距上次检查超过 REFRESH_INTERVAL 秒时增量更新（server 在搜索前调用）"""
+        if self._last_refresh is not None and time.monotonic() - self._last_refresh < REFRESH_INTERVAL:
+            return
+        self.update()
+        self._last_refresh = time.monotonic()
+
+    # --- 查询 ---
+
+    def _match_clause(self, terms):
+        """返回 (WHERE 子句, 参数)；所有词都需命中应用名或标题
+
+        能用 FTS 的词合并为一个 MATCH，此时日期和主机条件加上一元 + 禁用索引，
+        让 SQLite 从 FTS 的结果出发，而不是按日期索引扫描全部行再逐行检查。
+        其余的词（trigram 下不足 3 个字符）用 LIKE 在 FTS 的结果上过滤。
+        """
+        if self.trigram:
+            fts_terms = [t for t in terms if len(t) >= 3]
+            fts_query = " AND ".join('"%s"' % t.replace('"', '""') for t in fts_terms)
+        else:
+            fts_terms = [t for t in terms if re.match(r"^\w+$", t)]
+            fts_query = " AND ".join('"%s"*' % t for t in fts_terms)
+        clauses = []
+        params = []
+        if fts_terms:
+            clauses.append(FTS_FILTER)
+            params.append(fts_query)
+        for term in terms:
+            if term in fts_terms:
+                continue
+            pattern = f"%{_escape_like(term)}%"
+            clauses.append("(e.title LIKE ? ESCAPE '\\' OR e.app LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+        column = "+e" if fts_terms else "e"
+        clauses.append(f"{column}.date BETWEEN ? AND ?")
+        return " AND ".join(clauses), params, f"{column}.host"
+
+    def search(self, query, from_str=None, to_str=None, hosts=None, limit=DEFAULT_LIMIT):
+        """按标题或应用名检索
+
+        返回按总时长排序的 (应用, 标题) 结果（附出现天数和首末日期），以及每天命中的总时长。
+        """
+        terms = query.split()
+        if not terms:
+            raise ValueError("'q' must not be empty")
+        for value in (from_str, to_str):
+            if value and not DATE_PATTERN.match(value):
+                raise ValueError("Invalid date format. Use YYYYMMDD")
+        hosts = hosts or [LOCAL_HOST]
+        limit = max(1, min(limit, MAX_LIMIT))
+
+        conn = self.connect()
+        try:
+            match, params, host_column = self._match_clause(terms)
+            where = f"{match} AND {host_column} IN ({','.join('?' * len(hosts))})"
+            params = params + [from_str or MIN_DATE, to_str or MAX_DATE] + list(hosts)
+
+            results = [{
+                "app": app, "title": title, "seconds": seconds,
+                "days": days, "first_date": first, "last_date": last,
+            } for app, title, seconds, days, first, last in conn.execute(
+                f"SELECT e.app, e.title, SUM(e.seconds), COUNT(DISTINCT e.date), MIN(e.date), MAX(e.date) "
+                f"FROM entries e WHERE {where} GROUP BY e.app, e.title ORDER BY 3 DESC LIMIT ?",
+                params + [limit + 1])]
+            by_day = dict(conn.execute(
+                f"SELECT e.date, SUM(e.seconds) FROM entries e WHERE {where} GROUP BY e.date ORDER BY e.date",
+                params))
+        finally:
+            conn.close()
+        return {
+            "q": query,
+            "from": from_str,
+            "to": to_str,
+            "hosts": hosts,
+            "results": results[:limit],
+            "truncated": len(results) > limit,
+            "total_seconds": sum(by_day.values()),
+            "days": by_day,
+        }
+
+
+def start_background_indexer(data_dir, log=None):
+    """在后台线程中增量更新索引（tracker 跨天时调用），不阻塞调用方"""
+    def run():
+        try:
+            count = SearchIndex(data_dir).update(log=log)
+            if log and count:
+                log(f"Search index updated: {count} day(s)")
+        except sqlite3.Error as e:
+            if log:
+                log(f"Search index update failed: {e}")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,155 @@
+import math
+import time
+
+# 按时段分桶的一天活动统计，与 stats_data 一起保存在每日数据文件的 "timeline" 字段：
+#   {
+#       "bucket_minutes": 60,            # 每个桶的分钟数，能整除 1440
+#       "active": [秒, ...],             # 每个桶记入应用的时长
+#       "idle": [秒, ...],               # 每个桶的闲置时长
+#       "switches": [次数, ...],         # 每个桶内前台应用切换的次数
+#       "apps": {"exe_name": [秒, ...]}  # 每个应用每个桶的时长
+#   }
+# 每个数组长度固定为 1440 / bucket_minutes，内存只随应用数量增长，而不是随事件数量增长。
+# 桶按本地时间划分（夏令时切换当天重复的一小时会合并到同一个桶）。
+
+DEFAULT_BUCKET_MINUTES = 60
+MINUTES_PER_DAY = 24 * 60
+SERIES = ("active", "idle", "switches")
+
+
+def valid_bucket_minutes(minutes):
+    return isinstance(minutes, int) and not isinstance(minutes, bool) \
+        and 0 < minutes <= MINUTES_PER_DAY and MINUTES_PER_DAY % minutes == 0
+
+
+def bucket_count(minutes):
+    return MINUTES_PER_DAY // minutes
+
+
+def bucket_index(ts, minutes):
+    """时间戳所在的桶（本地时间）"""
+    t = time.localtime(ts)
+    return (t.tm_hour * 60 + t.tm_min) // minutes
+
+
+def split_seconds(end_ts, seconds, minutes):
+    """截至 end_ts 的 seconds 秒（逐秒计，最后一秒为 end_ts）按所在的桶拆分，返回 [(桶, 秒数), ...]（按时间顺序）
+
+    采样间隔拉长时一次记入的多秒可能跨过桶的边界；没有跨过时只计算两次桶号。
+    """
+    last = bucket_index(end_ts, minutes)
+    if seconds <= 1 or bucket_index(end_ts - seconds + 1, minutes) == last:
+        return [(last, seconds)]
+    spans = []
+    for i in range(seconds - 1, -1, -1):
+        bucket = bucket_index(end_ts - i, minutes)
+        if spans and spans[-1][0] == bucket:
+            spans[-1] = (bucket, spans[-1][1] + 1)
+        else:
+            spans.append((bucket, 1))
+    return spans
+
+
+def empty_timeline(minutes=DEFAULT_BUCKET_MINUTES):
+    n = bucket_count(minutes)
+    return {"bucket_minutes": minutes, "active": [0] * n, "idle": [0] * n, "switches": [0] * n, "apps": {}}
+
+
+def is_timeline(timeline):
+    """检查结构：桶大小合法，所有数组长度一致且元素为数字"""
+    if not isinstance(timeline, dict) or not valid_bucket_minutes(timeline.get("bucket_minutes")):
+        return False
+    n = bucket_count(timeline["bucket_minutes"])
+    apps = timeline.get("apps")
+    if not isinstance(apps, dict):
+        return False
+    for series in [timeline.get(name) for name in SERIES] + list(apps.values()):
+        if not isinstance(series, list) or len(series) != n \
+                or not all(isinstance(v, (int, float)) for v in series):
+            return False
+    return True
+
+
+# --- 记账（tracker 持有 data_lock 时调用）---
+
+
+def add_active(timeline, bucket, app_name, seconds):
+    timeline["active"][bucket] += seconds
+    series = timeline["apps"].get(app_name)
+    if series is None:
+        series = timeline["apps"][app_name] = [0] * len(timeline["active"])
+    series[bucket] += seconds
+
+
+def remove_active(timeline, bucket, app_name, seconds):
+    """撤销 add_active（闲置追溯改记时），不会减到 0 以下"""
+    series = timeline["apps"].get(app_name)
+    if series is None:
+        return
+    seconds = min(seconds, series[bucket])
+    series[bucket] -= seconds
+    timeline["active"][bucket] -= seconds
+    if not any(series):
+        del timeline["apps"][app_name]
+
+
+def add_idle(timeline, bucket, seconds):
+    timeline["idle"][bucket] += seconds
+
+
+def add_switch(timeline, bucket):
+    timeline["switches"][bucket] += 1
+
+
+# --- 合并 ---
+
+
+def resample(timeline, minutes):
+    """把时间线聚合到更粗的桶（minutes 须为原桶大小的整数倍），返回新对象"""
+    source = timeline["bucket_minutes"]
+    if minutes == source:
+        return timeline
+    if minutes % source:
+        raise ValueError(f"Cannot resample {source}-minute buckets to {minutes} minutes")
+    factor = minutes // source
+
+    def fold(series):
+        return [sum(series[i:i + factor]) for i in range(0, len(series), factor)]
+
+    result = {"bucket_minutes": minutes}
+    for name in SERIES:
+        result[name] = fold(timeline[name])
+    result["apps"] = {app: fold(series) for app, series in timeline["apps"].items()}
+    return result
+
+
+def _common_minutes(timelines):
+    """所有时间线都能聚合到的最小桶大小（各桶大小的最小公倍数，必然整除 1440）"""
+    minutes = 1
+    for timeline in timelines:
+        m = timeline["bucket_minutes"]
+        minutes = minutes * m // math.gcd(minutes, m)
+    return minutes
+
+
+def _combine(timelines, op):
+    timelines = [t for t in timelines if is_timeline(t)]
+    if not timelines:
+        return None
+    minutes = _common_minutes(timelines)
+    timelines = [resample(t, minutes) for t in timelines]
+    n = bucket_count(minutes)
+    merged = empty_timeline(minutes)
+    for timeline in timelines:
+        for name in SERIES:
+            merged[name] = [op(a, b) for a, b in zip(merged[name], timeline[name])]
+        for app, series in timeline["apps"].items():
+            target = merged["apps"].get(app, [0] * n)
+            merged["apps"][app] = [op(a, b) for a, b in zip(target, series)]
+    return merged
+
+
+def sum_timelines(timelines):
+    """累加多份时间线（不同主机或不同日期）；没有有效时间线时返回 None"""
+    return _combine(timelines, lambda a, b: a + b)
+
@@ -0,0 +1,115 @@
+import os
+import struct
+
+# 二进制采样轨迹：记录 tracker 每次采样得到的原始探测结果，用于复现问题和回放压测
+#
+# 文件结构：
+#   文件头   MAGIC (8 字节)
+#   记录     1 字节类型 + 负载
+#     STRING  uint32 长度 + UTF-8 字节；按出现顺序分配编号 0, 1, 2 ...
+#     SAMPLE  float64 时间戳 + float32 闲置秒数 + uint32 exe 编号 + uint32 title 编号（NONE_ID 表示 None）
+# exe / title 只在第一次出现时写入字符串表，每个采样点固定 21 字节。
+# 进程崩溃时末尾可能留下不完整的记录，读取时忽略。
+
+MAGIC = b"STTRACE1"
+REC_STRING = 0
+REC_SAMPLE = 1
+NONE_ID = 0xFFFFFFFF
+
+_LENGTH = struct.Struct("<I")
+_SAMPLE = struct.Struct("<dfII")
+
+
+def is_binary_trace(path):
+    """根据文件头判断是否为二进制轨迹"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _parse(data):
+    """解析轨迹内容，返回 (events, strings, 最后一条完整记录的结束位置)"""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary trace file")
+    strings = []
+    events = []
+    pos = len(MAGIC)
+    end = len(data)
+    while pos < end:
+        kind = data[pos]
+        if kind == REC_STRING:
+            if pos + 1 + _LENGTH.size > end:
+                break
+            (length,) = _LENGTH.unpack_from(data, pos + 1)
+            start = pos + 1 + _LENGTH.size
+            if start + length > end:
+                break
+            strings.append(data[start:start + length].decode("utf-8", "replace"))
+            pos = start + length
+        elif kind == REC_SAMPLE:
+            if pos + 1 + _SAMPLE.size > end:
+                break
+            t, idle, exe_id, title_id = _SAMPLE.unpack_from(data, pos + 1)
+            exe = None if exe_id == NONE_ID else strings[exe_id]
+            title = None if title_id == NONE_ID else strings[title_id]
+            events.append((t, exe, title, idle))
+            pos += 1 + _SAMPLE.size
+        else:
+            raise ValueError(f"Corrupt trace record at offset {pos}")
+    return events, strings, pos
+
+
+def read_trace(path):
+    """读取二进制轨迹，返回 [(timestamp, exe, title, idle_seconds), ...]"""
+    with open(path, "rb") as f:
+        return _parse(f.read())[0]
+
+
+class TraceWriter:
+    """追加写入二进制轨迹；已存在的文件会先读取字符串表再继续追加"""
+
+    def __init__(self, path, flush_every=30):
+        self.path = path
+        self.flush_every = flush_every
+        self.ids = {}
+        self.pending = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                _, strings, valid_end = _parse(f.read())
+            self.ids = {s: i for i, s in enumerate(strings)}
+            self.file = open(path, "r+b")
+            # 截掉崩溃时留下的不完整记录
+            self.file.truncate(valid_end)
+            self.file.seek(valid_end)
+        else:
+            self.file = open(path, "wb")
+            self.file.write(MAGIC)
+
+    def _string_id(self, value):
+        if value is None:
+            return NONE_ID
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.ids)
+            self.ids[value] = string_id
+            raw = value.encode("utf-8")
+            self.file.write(bytes((REC_STRING,)) + _LENGTH.pack(len(raw)) + raw)
+        return string_id
+
+    def record(self, t, exe, title, idle):
+        exe_id = self._string_id(exe)
+        title_id = self._string_id(title)
+        self.file.write(bytes((REC_SAMPLE,)) + _SAMPLE.pack(t, idle, exe_id, title_id))
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.pending = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
@@ -0,0 +1,74 @@
+import os
+import time
+
+from utils.metrics import Registry
+
+# tracker 进程的自监控指标
+
+METRICS_FILE_NAME = "tracker.metrics.prom"
+# 快照文件最短写出间隔（真实时间）；正常运行每 30 秒保存一次不受影响，回放时避免每次保存都重写
+SNAPSHOT_MIN_INTERVAL = 10.0
+
+registry = Registry()
+
+tick_seconds = registry.histogram(
+    "tracker_tick_seconds", "Time spent in one monitor_loop iteration (excluding sleep)")
+probe_seconds = registry.histogram(
+    "tracker_probe_seconds", "Time spent in platform probes", ("probe",))
+missed_ticks = registry.counter(
+    "tracker_missed_ticks_total", "Sampling ticks skipped because an iteration woke up late")
+sampling_interval = registry.gauge(
+    "tracker_sampling_interval_seconds", "Current adaptive sampling interval")
+lock_hold_seconds = registry.histogram(
+    "tracker_data_lock_hold_seconds", "Time data_lock is held during save_data()")
+snapshot_seconds = registry.histogram(
+    "tracker_snapshot_seconds", "Total save_data() duration including file write",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+snapshot_bytes = registry.counter(
+    "tracker_snapshot_bytes_total", "Bytes written by save_data()")
+snapshot_last_bytes = registry.gauge(
+    "tracker_snapshot_last_bytes", "Size of the last snapshot written")
+cpu_seconds = registry.gauge(
+    "tracker_process_cpu_seconds", "CPU time consumed by the tracker process")
+uptime_seconds = registry.gauge(
+    "tracker_uptime_seconds", "Seconds since the tracker started")
+
+_started = time.time()
+_last_write = None
+
+
+def metrics_file(data_dir):
+    return os.path.join(data_dir, METRICS_FILE_NAME)
+
+
+def update_process_gauges():
+    cpu_seconds.set(round(time.process_time(), 3))
+    uptime_seconds.set(round(time.time() - _started, 1))
+
+
+def write_snapshot(data_dir, force=False):
+    """刷新进程级指标并写出快照文件，供 server.py 的 /metrics 读取"""
+    global _last_write
+    wall = time.monotonic()
+    if not force and _last_write is not None and wall - _last_write < SNAPSHOT_MIN_INTERVAL:
+        return
+    _last_write = wall
+    update_process_gauges()
+    try:
+        registry.write_textfile(metrics_file(data_dir))
+    except OSError:
+        pass
+
+
+def summary_lines():
+    """托盘菜单中显示的简要指标"""
+    update_process_gauges()
+    window_probe = probe_seconds.labels("window")
+    return [
+        f"Tick: avg {tick_seconds.mean() * 1000:.1f} ms, p99 {tick_seconds.quantile(0.99) * 1000:.1f} ms",
+        f"Window probe: avg {window_probe.mean() * 1000:.1f} ms",
+        f"Missed ticks: {int(missed_ticks.value)}, interval {int(sampling_interval.value)} s",
+        f"Snapshot: avg {snapshot_seconds.mean() * 1000:.1f} ms, lock {lock_hold_seconds.mean() * 1000:.2f} ms",
+        f"Written: {int(snapshot_bytes.value) // 1024} KB (last {int(snapshot_last_bytes.value) // 1024} KB)",
+        f"CPU: {cpu_seconds.value:.1f} s / {uptime_seconds.value / 3600:.1f} h",
+    ]
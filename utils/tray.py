@@ -0,0 +1,143 @@
+import os
+import json
+import time
+
+# 托盘相关的共享工具：图标缓存、状态文件和停止标记
+#
+# tracker 可以在进程内显示托盘，也可以以 --no-tray 无界面方式运行，由 tray_client.py 单独显示托盘。
+# 两者之间只通过 Data 目录下的两个文件通信：
+#   tracker.status.json  tracker 每次自动保存时写出的状态（托盘菜单显示用）
+#   tracker.stop         托盘客户端请求 tracker 退出时创建，tracker 在下一次采样时删除并退出
+# pystray / PIL 只在真正显示托盘时导入，无界面运行时不会加载。
+
+ICON_SIZE = 64
+ICON_CANDIDATES = ("statistics.ico", "statistics.png", "statistics.icns")  # .icns 为 macOS 图标格式
+ICON_CACHE_NAME = "tray.icon.png"
+STATUS_FILE_NAME = "tracker.status.json"
+STOP_FLAG_NAME = "tracker.stop"
+# 状态文件超过该时间未更新即认为 tracker 已停止（tracker 每 30 秒保存一次）
+STATUS_STALE_SECONDS = 90
+
+_icon = None
+
+
+def _render_icon(base_dir):
+    from PIL import Image, ImageDraw
+
+    for candidate in ICON_CANDIDATES:
+        icon_path = os.path.join(base_dir, candidate)
+        if not os.path.exists(icon_path):
+            continue
+        try:
+            loaded = Image.open(icon_path)
+            if loaded.mode != "RGBA":
+                loaded = loaded.convert("RGBA")
+            return loaded.resize((ICON_SIZE, ICON_SIZE), Image.LANCZOS)
+        except Exception:
+            continue
+
+    image = Image.new('RGBA', (ICON_SIZE, ICON_SIZE), (255, 255, 255, 0))
+    dc = ImageDraw.Draw(image)
+    dc.ellipse((8, 8, 56, 56), fill='#e74c3c', outline='white')
+    dc.rectangle((26, 20, 38, 30), fill='#2ecc71')  # 叶子
+    return image
+
+
+def load_icon(base_dir, cache_dir):
+    """返回托盘图标；缩放后的结果缓存为 PNG，源文件未变化时直接读取缓存"""
+    global _icon
+    if _icon is not None:
+        return _icon
+
+    from PIL import Image
+
+    cache_path = os.path.join(cache_dir, ICON_CACHE_NAME)
+    sources = [os.path.join(base_dir, c) for c in ICON_CANDIDATES if os.path.exists(os.path.join(base_dir, c))]
+    try:
+        cache_mtime = os.path.getmtime(cache_path)
+        if all(os.path.getmtime(s) <= cache_mtime for s in sources):
+            _icon = Image.open(cache_path)
+            _icon.load()
+            return _icon
+    except OSError:
+        pass
+
+    _icon = _render_icon(base_dir)
+    try:
+        _icon.save(cache_path, "PNG")
+    except OSError:
+        pass
+    return _icon
+
+
+# --- 快速统计 ---
+
+
+def format_hours(seconds):
+    h, m = divmod(int(seconds) // 60, 60)
+    return f"{h}h {m:02d}m"
+
+
+def format_quick_stats(stats):
+    """托盘 "Today" 子菜单的各行；stats 为 tracker_core.quick_stats() 的结果"""
+    if not stats:
+        return ["No data"]
+    lines = [
+        f"Active: {format_hours(stats['active'])}",
+        f"Idle: {format_hours(stats['idle'])}",
+    ]
+    for i, (name, seconds) in enumerate(stats["top_apps"], 1):
+        lines.append(f"{i}. {name}  {format_hours(seconds)}")
+    return lines
+
+
+# --- 状态文件与停止标记 ---
+
+
+def status_path(data_dir):
+    return os.path.join(data_dir, STATUS_FILE_NAME)
+
+
+def stop_flag_path(data_dir):
+    return os.path.join(data_dir, STOP_FLAG_NAME)
+
+
+def write_status(data_dir, status):
+    """原子写出状态文件"""
+    path = status_path(data_dir)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(status, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def read_status(data_dir):
+    """读取 tracker 状态；文件不存在或已过期时返回 None"""
+    path = status_path(data_dir)
+    try:
+        if time.time() - os.path.getmtime(path) > STATUS_STALE_SECONDS:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def request_stop(data_dir):
+    with open(stop_flag_path(data_dir), "w", encoding="utf-8") as f:
+        f.write(str(os.getpid()))
+
+
+def consume_stop_request(data_dir):
+    """存在停止标记时删除它并返回 True"""
+    path = stop_flag_path(data_dir)
+    if not os.path.exists(path):
+        return False
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return True
@@ -0,0 +1,160 @@
+import threading
+from collections import OrderedDict
+
+# /api/data/ 的服务端筛选：每天的数据解析后预先排好序并缓存，
+# 之后 top_apps / top_titles / app / min_seconds / fields 只需切片和过滤
+
+QUERY_PARAMS = ("top_apps", "top_titles", "app", "min_seconds", "fields")
+
+
+class DayView:
+    """一天数据的排序视图：应用按总时长倒序，每个应用的标题按时长倒序"""
+
+    def __init__(self, data):
+        self.data = data
+        self.apps = []  # [(app_name, total, [(title, seconds), ...]), ...]
+        for app_name, app_info in data.get("apps", {}).items():
+            titles = sorted(app_info.get("titles", {}).items(), key=lambda item: item[1], reverse=True)
+            self.apps.append((app_name, app_info.get("total", 0), titles))
+        self.apps.sort(key=lambda x: x[1], reverse=True)
+        self.app_index = {app[0]: app for app in self.apps}
+
+
+class ViewCache:
+    """按 (key, 版本标识) 缓存 DayView 的 LRU 缓存；hit_counter / miss_counter 为可选的指标计数器"""
+
+    def __init__(self, max_entries=64, hit_counter=None, miss_counter=None):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (fingerprint, DayView)
+        self.hits = 0
+        self.misses = 0
+        self._hit_counter = hit_counter
+        self._miss_counter = miss_counter
+
+    def get(self, key, fingerprint, loader):
+        """命中时直接返回；否则调用 loader() 取得数据并构建视图，loader 返回 None 时不缓存"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == fingerprint:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if self._hit_counter is not None:
+                    self._hit_counter.inc()
+                return entry[1]
+            self.misses += 1
+            if self._miss_counter is not None:
+                self._miss_counter.inc()
+        data = loader()
+        if data is None:
+            return None
+        view = DayView(data)
+        with self._lock:
+            self._entries[key] = (fingerprint, view)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return view
+
+
+def _int_param(query_params, name):
+    values = query_params.get(name)
+    if not values or values[0] == "":
+        return None
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer")
+    if value < 0:
+        raise ValueError(f"'{name}' must be >= 0")
+    return value
+
+
+def _list_param(query_params, name):
+    items = []
+    for value in query_params.get(name, []):
+        items.extend(v for v in value.split(",") if v)
+    return items
+
+
+def _at_least(items, min_seconds):
+    """按时长倒序的 [(名字, 时长, ...), ...] 中时长不小于 min_seconds 的部分"""
+    at_least = getattr(items, "at_least", None)
+    if at_least is not None:
+        return at_least(min_seconds)
+    return [item for item in items if item[1] >= min_seconds]
+
+
+def _seconds(items):
+    """[(名字, 时长, ...), ...] 的时长之和"""
+    seconds = getattr(items, "seconds", None)
+    if seconds is not None:
+        return seconds()
+    return sum(item[1] for item in items)
+
+
+def has_query(query_params):
+    """请求是否带有筛选参数"""
+    return any(name in query_params for name in QUERY_PARAMS)
+
+
+def query_view(view, query_params):
+    """按查询参数从排序视图中生成响应
+
+    - top_apps=N      只返回总时长前 N 的应用，其余汇总到 other_apps
+    - top_titles=N    每个应用只返回前 N 个标题，其余汇总到该应用的 other_titles
+    - app=A,B         只返回指定应用（可重复）
+    - min_seconds=S   丢弃时长小于 S 的应用和标题
+    - fields=...      顶层字段投影，例如 sessions,idle_seconds,apps.total（apps.total 表示不返回标题）
+
+    timeline 中的各应用时段数据与 apps 使用相同的应用筛选。
+    view 也可以是 utils/daybin.BinaryDay：只取被选中的字段，apps 只访问需要返回的部分。
+    """
+    top_apps = _int_param(query_params, "top_apps")
+    top_titles = _int_param(query_params, "top_titles")
+    min_seconds = _int_param(query_params, "min_seconds") or 0
+    app_filter = _list_param(query_params, "app")
+    fields = _list_param(query_params, "fields")
+
+    include_titles = not fields or "apps" in fields
+    include_apps = not fields or include_titles or "apps.total" in fields
+
+    if app_filter:
+        apps = [view.app_index[name] for name in app_filter if name in view.app_index]
+    else:
+        apps = view.apps
+    if min_seconds:
+        apps = _at_least(apps, min_seconds)
+
+    result = {}
+    for key in view.data:
+        if key == "apps":
+            continue
+        if not fields or key in fields:
+            result[key] = view.data[key]
+
+    shown = apps if top_apps is None else apps[:top_apps]
+    day_timeline = result.get("timeline")
+    if isinstance(day_timeline, dict) and len(shown) < len(view.apps):
+        app_series = day_timeline.get("apps", {})
+        result["timeline"] = dict(day_timeline, apps={app[0]: app_series[app[0]] for app in shown
+                                                       if app[0] in app_series})
+
+    if include_apps:
+        out_apps = {}
+        for app_name, total, titles in shown:
+            entry = {"total": total}
+            if include_titles:
+                if min_seconds:
+                    titles = _at_least(titles, min_seconds)
+                if top_titles is not None and len(titles) > top_titles:
+                    rest = titles[top_titles:]
+                    entry["other_titles"] = {"count": len(rest), "seconds": _seconds(rest)}
+                    titles = titles[:top_titles]
+                entry["titles"] = dict(titles)
+            out_apps[app_name] = entry
+        result["apps"] = out_apps
+        if len(shown) < len(apps):
+            rest = apps[len(shown):]
+            result["other_apps"] = {"count": len(rest), "seconds": _seconds(rest)}
+    return result